@@ -0,0 +1 @@
+"""Performance benchmarks for Pomodoro Study Buddy (run with ``python -m benchmarks``)."""
@@ -0,0 +1,117 @@
+"""Command line for the benchmark suite.
+
+    python -m benchmarks run [--sizes 10k,100k,1m] [--profiles 10k] [--only history,timer] [--save FILE]
+    python -m benchmarks compare BASELINE [CURRENT] [--threshold 0.25]
+
+``compare`` without CURRENT runs the suite first (with the sizes recorded in
+the baseline). It exits with status 1 when any benchmark regressed.
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.suite import DEFAULT_HISTORY_SIZES, DEFAULT_PROFILE_COUNT, compare, run_all
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+console = Console()
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower().replace("_", "")
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def print_results(document: dict) -> None:
+    table = Table(title="Benchmark Results (per operation)", show_header=True, header_style="bold magenta")
+    table.add_column("Benchmark", style="cyan")
+    table.add_column("Median", style="green", justify="right")
+    table.add_column("Min", justify="right")
+    table.add_column("Samples", justify="right")
+    for name, result in document["results"].items():
+        table.add_row(name, _format_seconds(result["median_s"]), _format_seconds(result["min_s"]), str(result["samples"]))
+    console.print(table)
+
+
+def print_comparison(rows: List[dict], threshold: float) -> None:
+    table = Table(title=f"Comparison with Baseline (threshold +{threshold:.0%})", show_header=True, header_style="bold magenta")
+    table.add_column("Benchmark", style="cyan")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Current", justify="right")
+    table.add_column("Change", justify="right")
+    for row in rows:
+        change = f"{row['ratio'] - 1:+.0%}"
+        style = "bold red" if row["regressed"] else ("green" if row["ratio"] < 1 else "")
+        table.add_row(row["name"], _format_seconds(row["baseline_s"]), _format_seconds(row["current_s"]), f"[{style}]{change}[/{style}]" if style else change)
+    console.print(table)
+
+
+def _run(sizes: List[int], profile_count: int, only: Optional[List[str]]) -> dict:
+    return run_all(sizes, profile_count, only, progress=lambda msg: console.print(f"[dim]Running {msg}...[/dim]"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Pomodoro Study Buddy benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmarks.")
+    run.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_HISTORY_SIZES), help="History sizes, e.g. 10k,100k,1m.")
+    run.add_argument("--profiles", default=str(DEFAULT_PROFILE_COUNT), help="Number of synthetic profiles.")
+    run.add_argument("--only", default=None, help="Comma-separated groups: history, profiles, prompt, timer, llm, rules, subjects, review.")
+    run.add_argument("--save", metavar="FILE", default=None, help=f"Write results as JSON (e.g. {DEFAULT_BASELINE}).")
+
+    cmp = sub.add_parser("compare", help="Compare results against a baseline and flag regressions.")
+    cmp.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    cmp.add_argument("current", nargs="?", default=None, help="Results file (default: run the suite now).")
+    cmp.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%).")
+    cmp.add_argument("--only", default=None, help="Comma-separated groups to run when CURRENT is omitted.")
+
+    args = parser.parse_args(argv)
+    only = [g.strip() for g in args.only.split(",")] if args.only else None
+
+    if args.command == "run":
+        document = _run([parse_size(s) for s in args.sizes.split(",")], parse_size(args.profiles), only)
+        print_results(document)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2)
+            console.print(f"[bold green]Saved results to {args.save}.[/bold green]")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        meta = baseline.get("meta", {})
+        current = _run(
+            meta.get("history_sizes") or list(DEFAULT_HISTORY_SIZES), meta.get("profile_count") or DEFAULT_PROFILE_COUNT, only
+        )
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows, args.threshold)
+    regressed = [row["name"] for row in rows if row["regressed"]]
+    if regressed:
+        console.print(f"[bold red]{len(regressed)} regression(s):[/bold red] {', '.join(regressed)}")
+        return 1
+    console.print("[bold green]No regressions.[/bold green]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
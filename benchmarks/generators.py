@@ -0,0 +1,60 @@
+"""Synthetic data for the benchmark suite.
+
+Generators are seeded, so the same size always produces the same data and
+runs on different machines (or before and after a change) are comparable.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+NAMES = ["Ana", "Ben", "Chloe", "Dev", "Emeka", "Fatima", "Gus", "Hana", "Ivan", "June", "Kofi", "Lena"]
+SUBJECTS = ["Calculus", "Biology", "World History", "Chemistry", "Geography", "Python", "Statistics", "Physics"]
+METHODS = ["Quiz", "Flashcards", "Summary"]
+STATES = ["tired", "focused", "overwhelmed", "exhausted"]
+START = datetime(2023, 1, 1, 8, 0, 0)
+
+
+def history_records(count: int, seed: int = 0, span_days: int = 730) -> Iterator[dict]:
+    """Yield `count` session records, oldest first, spread over `span_days`."""
+    rng = random.Random(seed)
+    step = timedelta(days=span_days) / max(count, 1)
+    for i in range(count):
+        name = rng.choice(NAMES)
+        subject = rng.choice(SUBJECTS)
+        method = rng.choice(METHODS)
+        yield {
+            "timestamp": (START + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+            "name": name,
+            "subject": subject,
+            "method": method,
+            "state": rng.choice(STATES),
+            "minutes": rng.choice((10, 25, 30, 45, 60, 90)),
+            "source": "Benchmark",
+            "material_preview": f"Hi {name}! Here is your {method.lower()} on {subject}. " * 3,
+        }
+
+
+def profiles(count: int, seed: int = 0) -> Dict[str, dict]:
+    """`count` profiles keyed the way the CLI keys them (name_method_subject)."""
+    rng = random.Random(seed)
+    result: Dict[str, dict] = {}
+    for i in range(count):
+        name = f"{rng.choice(NAMES)}{i}"
+        method = rng.choice(METHODS)
+        subject = rng.choice(SUBJECTS)
+        result[f"{name}_{method}_{subject}".replace(" ", "_")] = {
+            "name": name,
+            "state": rng.choice(STATES),
+            "method": method,
+            "subject": subject,
+            "source": "CLI/New",
+            "minutes": rng.choice((10, 25, 45)),
+        }
+    return result
+
+
+def prompt_inputs(count: int, seed: int = 0) -> List[tuple]:
+    """(name, method, subject) triples for prompt-building benchmarks."""
+    rng = random.Random(seed)
+    return [(rng.choice(NAMES), rng.choice(METHODS), rng.choice(SUBJECTS)) for _ in range(count)]
@@ -0,0 +1,296 @@
+"""Benchmark definitions and the runner.
+
+Each benchmark runs in a fresh temporary directory (every data file in the
+app is relative to the working directory), times one operation repeatedly
+with `time.perf_counter` and reports per-operation seconds. Results are
+plain dicts so they can be written to and compared against a JSON baseline.
+"""
+
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from benchmarks import generators
+
+DEFAULT_HISTORY_SIZES = (10_000, 100_000)
+DEFAULT_PROFILE_COUNT = 10_000
+CHUNK = 10_000
+
+
+def measure(fn: Callable[[], object], repeat: int, number: int = 1) -> List[float]:
+    """Per-call seconds for `repeat` samples of `number` calls each."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+def summarize(samples: Sequence[float], **extra) -> dict:
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "samples": len(samples),
+        **extra,
+    }
+
+
+@contextmanager
+def workdir() -> Iterator[str]:
+    """Run inside an empty scratch directory with fresh history/stats singletons."""
+    from src import history, stats
+
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="study-bench-") as path:
+        os.chdir(path)
+        history.set_backend(None)
+        stats.set_stats(None)
+        try:
+            yield path
+        finally:
+            history.set_backend(None)
+            stats.set_stats(None)
+            os.chdir(previous)
+
+
+@contextmanager
+def quiet() -> Iterator[None]:
+    """Silence the rich consoles the measured code prints to."""
+    from src import app, history, stats
+
+    consoles = [history.console, stats.console, app.console]
+    saved = [c.quiet for c in consoles]
+    for c in consoles:
+        c.quiet = True
+    try:
+        yield
+    finally:
+        for c, q in zip(consoles, saved):
+            c.quiet = q
+
+
+#-----------------------HISTORY-------------------------------#
+
+def bench_history(size: int) -> Dict[str, dict]:
+    from src import history, stats
+
+    results = {}
+    with workdir(), quiet():
+        backend = history.get_backend()
+        batch: List[dict] = []
+        for record in generators.history_records(size):
+            batch.append(record)
+            if len(batch) >= CHUNK:
+                backend.extend(batch)
+                batch = []
+        if batch:
+            backend.extend(batch)
+        stats.get_stats()  # build the rollups once, outside the timed region
+
+        repeat = 3 if size <= 100_000 else 1
+        results[f"load_history[{size}]"] = summarize(measure(history.load_history, repeat), size=size)
+        results[f"log_session[{size}]"] = summarize(
+            measure(lambda: history.log_session("Ana", "Quiz", "Calculus", "focused", 25, "Benchmark", response="# Q"), 20, 10),
+            size=size,
+        )
+        results[f"get_last_sessions[{size}]"] = summarize(
+            measure(lambda: history.get_last_sessions(limit=5), 20, 5), size=size
+        )
+    return results
+
+
+#-----------------------PROFILES-------------------------------#
+
+def bench_profiles(count: int) -> Dict[str, dict]:
+    from src import app
+    from src.profiles import ProfileStore
+
+    data = generators.profiles(count)
+    results = {}
+    with workdir(), quiet():
+        ProfileStore().replace_all(data)
+        results[f"load_profiles[{count}]"] = summarize(measure(app.load_profiles, 5), size=count)
+        store = app.load_profiles()
+        results[f"save_profiles[{count}]"] = summarize(measure(lambda: app.save_profiles(store), 5), size=count)
+        counter = iter(range(10**9))
+
+        def put_one() -> None:
+            i = next(counter)
+            store.put(f"bench_{i}", {"name": f"Bench{i}", "method": "Quiz", "subject": "Physics", "minutes": 25})
+
+        results[f"profile_put[{count}]"] = summarize(measure(put_one, 20, 10), size=count)
+    return results
+
+
+#-----------------------PROMPT AND TIMER-------------------------------#
+
+def bench_build_prompt() -> Dict[str, dict]:
+    from src.app import build_prompt
+
+    inputs = generators.prompt_inputs(1000)
+    cursor = iter(range(10**9))
+
+    def one() -> None:
+        build_prompt(*inputs[next(cursor) % len(inputs)])
+
+    return {"build_prompt": summarize(measure(one, 20, 1000))}
+
+
+def bench_render_materials(items: int = 10) -> Dict[str, dict]:
+    """Parse a JSON-mode quiz response into items and render it to Markdown."""
+    import json
+
+    from src.materials import to_markdown
+
+    text = json.dumps({
+        "greeting": "Hi!",
+        "questions": [
+            {"question": f"Question {i}?", "options": ["A", "B", "C", "D"], "answer": i % 4, "explanation": "Because."}
+            for i in range(items)
+        ],
+    })
+    return {f"render_materials[{items} questions]": summarize(measure(lambda: to_markdown(text), 20, 100))}
+
+
+def bench_timer() -> Dict[str, dict]:
+    from src.timer import PomodoroEngine, VirtualClock
+
+    def run() -> None:
+        engine = PomodoroEngine(45 * 60, 15 * 60, 4, clock=VirtualClock(), on_render=lambda _engine, _left: None)
+        engine.run()
+
+    return {"timer_virtual_run[4x45/15]": summarize(measure(run, 20))}
+
+
+def bench_llm_replay(prompts: int = 200, concurrency: int = 16, latency_ms: float = 20.0) -> Dict[str, dict]:
+    """Concurrent generation against the offline replay backend (no network)."""
+    import asyncio
+
+    from src.generation import generate_many
+    from src.llm import LatencyModel, ReplayBackend
+
+    inputs = generators.prompt_inputs(prompts)
+    entries = [{"prompt": f"Method: {m}\nSubject: {s}", "response": f"{m} on {s}"} for _n, m, s in inputs]
+    backend = ReplayBackend(entries, latency=LatencyModel(kind="fixed", median_ms=latency_ms), seed=0)
+    batch = [f"Name: {n}\nMethod: {m}\nSubject: {s}" for n, m, s in inputs]
+
+    def run() -> None:
+        asyncio.run(generate_many(backend, batch, "replay", concurrency=concurrency))
+
+    return {f"generate_many_replay[{prompts}x{concurrency}]": summarize(measure(run, 3), size=prompts)}
+
+
+def bench_rules(size: int = 100_000) -> Dict[str, dict]:
+    """Re-score a synthetic history with the compiled study-mode rules."""
+    from src.rules import RuleSet
+
+    records = list(generators.history_records(size))
+    rules = RuleSet.load()
+    return {f"classify_many[{size}]": summarize(measure(lambda: rules.classify_many(records), 5), size=size)}
+
+
+def bench_subjects(count: int = 10_000) -> Dict[str, dict]:
+    """Autocomplete and fuzzy lookups against an index of `count` distinct subjects."""
+    from src.subjects import SubjectIndex
+
+    index = SubjectIndex()
+    index.add_many((f"{s} {i}", 1 + i % 5) for i, (_n, _m, s) in enumerate(generators.prompt_inputs(count)))
+    return {
+        f"subject_complete[{count}]": summarize(measure(lambda: index.complete("ma"), 20, 1000), size=count),
+        f"subject_canonical[{count}]": summarize(measure(lambda: index.canonical(" world HISTORY 7 "), 20, 1000), size=count),
+        f"subject_suggest[{count}]": summarize(measure(lambda: index.suggest("photosynthesys"), 5, 10), size=count),
+    }
+
+
+def bench_review(count: int = 20_000) -> Dict[str, dict]:
+    """Due-card lookups and graded reviews against a deck of `count` cards."""
+    from src.review import ReviewDeck
+
+    results = {}
+    with workdir():
+        deck = ReviewDeck("Ana", clock=lambda: 1_700_000_000)
+        deck.add(((f"{s} {i}?", "Answer.") for i, (_n, _m, s) in enumerate(generators.prompt_inputs(count))), "Bench", "Flashcards")
+        results[f"review_load[{count}]"] = summarize(measure(lambda: len(ReviewDeck("Ana")), 3), size=count)
+        results[f"review_next_due[{count}]"] = summarize(measure(deck.next_due, 20, 1000), size=count)
+        results[f"review_grade[{count}]"] = summarize(measure(lambda: deck.review(deck.next_due().id, 4), 20, 10), size=count)
+    return results
+
+
+#-----------------------RUNNER-------------------------------#
+
+def run_all(
+    history_sizes: Sequence[int] = DEFAULT_HISTORY_SIZES,
+    profile_count: int = DEFAULT_PROFILE_COUNT,
+    only: Optional[Sequence[str]] = None,
+    progress: Callable[[str], None] = lambda _msg: None,
+) -> dict:
+    """Run the selected groups (history, profiles, prompt, timer, llm, rules, subjects, review) and return a results document."""
+    groups = set(only or ("history", "profiles", "prompt", "timer", "llm", "rules", "subjects", "review"))
+    results: Dict[str, dict] = {}
+    if "history" in groups:
+        for size in history_sizes:
+            progress(f"history ({size:,} records)")
+            results.update(bench_history(size))
+    if "profiles" in groups:
+        progress(f"profiles ({profile_count:,})")
+        results.update(bench_profiles(profile_count))
+    if "prompt" in groups:
+        progress("build_prompt")
+        results.update(bench_build_prompt())
+        results.update(bench_render_materials())
+    if "timer" in groups:
+        progress("timer")
+        results.update(bench_timer())
+    if "llm" in groups:
+        progress("replay generation")
+        results.update(bench_llm_replay())
+    if "rules" in groups:
+        progress("rules")
+        results.update(bench_rules())
+    if "subjects" in groups:
+        progress("subjects")
+        results.update(bench_subjects())
+    if "review" in groups:
+        progress("review")
+        results.update(bench_review())
+    return {
+        "meta": {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "history_backend": os.getenv("STUDY_BUDDY_HISTORY_BACKEND") or "default",
+            "history_sizes": list(history_sizes),
+            "profile_count": profile_count,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25) -> List[dict]:
+    """Compare median timings; a row regresses when it is slower than baseline by more than `threshold`."""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if base is None:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        rows.append(
+            {
+                "name": name,
+                "baseline_s": base["median_s"],
+                "current_s": result["median_s"],
+                "ratio": ratio,
+                "regressed": ratio > 1 + threshold,
+            }
+        )
+    return rows
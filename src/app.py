@@ -1,150 +1,235 @@
 # ============================IMPORTS==================================
+# Heavy dependencies (google-genai, python-dotenv, rich.markdown, rich.live,
+# asyncio via src.generation) are imported on first use, not here, so that
+# --help, reviewing history and managing profiles start instantly and work
+# without an API key. See get_client() and --startup-profile.
+
+import time
+_IMPORT_STARTED = time.perf_counter()
 
 import argparse
-import json
+import atexit
 import os
 import sys
 
-from dotenv import load_dotenv
-from typing import Dict, Optional, Tuple
-
-from google import genai
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
 
 #-------------------------LOCAL IMPORTS --------------------------------
 
-from src.history import get_last_sessions, log_session
-from src.rules import study_mode
+from src import metrics, startup
+from src.batch import DEFAULT_OUTPUT_FILE, DEFAULT_WORKERS
+from src.cache import ResponseCache
+from src.history import group_commit, log_session
+from src.history_browser import browse_history
+from src.materials import profile_for, single_line
+from src.profiles import PROFILES_FILE, ProfileStore
+from src.rules import classify, current_hour
+from src.stats import print_stats
+from src.subjects import get_subjects
 from src.timer import pomodoro_arg_func
 
 #-------------------------RICH IMPORTS --------------------------------------
 
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.prompt import Confirm, IntPrompt, Prompt
 from rich.table import Table
 
+if TYPE_CHECKING:
+	from src.generation import GenerationResult
+	from src.prefetch import Prefetcher
+	from src.review import ReviewDeck
+	from src.subjects import SubjectIndex
+
 #============================END OF IMPORTS==========================
 
 #-------------------------GLOBAL CONSTANTS-------------------------------#
 
-MAX_PROFILES = 3
-PROFILES_FILE = "profiles.json"
+MAX_PROFILES = 10000
+PROFILE_PAGE_SIZE = 10
 VALID_METHODS = ["Quiz", "Flashcards", "Summary"]
+MODEL_NAME = "gemini-2.5-flash"
+GENERATION_TIMEOUT_SECONDS = 60.0
+STREAM_FPS = 8  # max re-renders per second while streaming
+DEFAULT_PROFILE_FILE = "study_buddy.prof"
+UNAVAILABLE_MESSAGE = "I apologize, but the AI service is currently unavailable. Please try again later."
 
-#---------------load .env variables, initialize rich console and Gemini client----------------#
-load_dotenv()
+#---------------initialize rich console; the Gemini client is built lazily----------------#
 console = Console()
-api_key = os.getenv("GEMINI_API_KEY")
-
-if not api_key:
-    console.print(Panel("[bold red]⚠️  Missing API Key[/bold red]\n\n"
-                        "To use the AI features, you need a Google Gemini API key.\n"
-                        "1. Create a file named [cyan].env[/cyan] in this folder.\n"
-                        "2. Add this line: [green]GEMINI_API_KEY=your_key_here[/green]",
-                        title="Configuration Error", border_style="red"))
-    sys.exit(1)
-
-client = genai.Client(api_key=api_key)
+client = None  # set by get_client() on first use (tests may patch it directly)
+llm_backend = None  # set by get_llm() on first use
+response_cache = ResponseCache()
+_dotenv_loaded = False
+startup.record("import src.app (eager modules)", _IMPORT_STARTED)
 
 #============================FUNCTIONS========================================
 #=============================================================================
 
+#============================API KEY AND CLIENT===============================
+
+def get_api_key() -> Optional[str]:
+	"""Return GEMINI_API_KEY, loading the .env file the first time it is needed."""
+	global _dotenv_loaded
+	if not _dotenv_loaded:
+		with startup.stage("python-dotenv import + .env load"):
+			from dotenv import load_dotenv
+			load_dotenv()
+		_dotenv_loaded = True
+	return os.getenv("GEMINI_API_KEY")
+
+def ensure_api_key() -> None:
+	"""Exit with setup instructions when no API key is configured (replay needs none)."""
+	if client is not None or get_api_key() or llm_backend_name() == "replay":
+		return
+	console.print(Panel("[bold red]⚠️  Missing API Key[/bold red]\n\n"
+						"To use the AI features, you need a Google Gemini API key.\n"
+						"1. Create a file named [cyan].env[/cyan] in this folder.\n"
+						"2. Add this line: [green]GEMINI_API_KEY=your_key_here[/green]",
+						title="Configuration Error", border_style="red"))
+	sys.exit(1)
+
+def get_client():
+	"""Return the shared Gemini client, constructing it on first use.
+
+	Returns None when no API key is configured.
+	"""
+	global client
+	if client is None:
+		api_key = get_api_key()
+		if not api_key:
+			return None
+		with startup.stage("google.genai import"):
+			from google import genai
+		with startup.stage("genai.Client construction"):
+			client = genai.Client(api_key=api_key)
+	return client
+
+def llm_backend_name() -> str:
+	"""The configured LLM backend: gemini (default), record or replay."""
+	from src.llm import DEFAULT_LLM_BACKEND, LLM_BACKEND_ENV_VAR
+
+	return (os.getenv(LLM_BACKEND_ENV_VAR) or DEFAULT_LLM_BACKEND).strip().lower()
+
+def get_llm():
+	"""Return the configured LLM backend, or None when it needs a Gemini client and there is no API key.
+
+	STUDY_BUDDY_LLM_BACKEND=record saves every exchange to a cassette;
+	=replay answers offline from that cassette (or from study_log.json).
+	"""
+	global llm_backend
+	if llm_backend is None:
+		from src.llm import open_llm_backend
+
+		llm_backend = open_llm_backend(llm_backend_name(), client_factory=get_client, build_prompt=build_prompt)
+	if llm_backend.name != "replay" and not get_client():
+		return None
+	return llm_backend
+
 #============================PROFILE MANAGEMENT===============================
 
 #--------- Profile Load/Save/Delete Functions-------------
 
-def load_profiles() -> Dict[str, dict]:
-	"""Load profiles from the JSON file."""
-
-	# does the file exist?
-	if not os.path.exists(PROFILES_FILE):
-		return {}
-	try:
-		with open(PROFILES_FILE, "r") as f:
-			return json.load(f)
-	except json.JSONDecodeError:
+def load_profiles() -> ProfileStore:
+	"""Load profiles (profiles.json plus any journaled changes)."""
+	with metrics.span("profiles.load"):
+		store = ProfileStore(PROFILES_FILE)
+	if store.load_error:
 		console.print("[bold yellow]Warning:[/bold yellow] Profile file is not readable. Starting fresh.")
-		return {}
+	return store
 
-def save_profiles(profiles: Dict[str, dict]) -> None:
-	"""Save profiles to the JSON file."""
-	with open(PROFILES_FILE, "w") as f:
-		json.dump(profiles, f, indent=4)
+def save_profiles(profiles: Union[ProfileStore, Dict[str, dict]]) -> None:
+	"""Persist profiles.
 
-def delete_profile(profiles: Dict[str, dict]) -> Dict[str, dict]:
-	"""Delete a profile from the profiles dictionary."""
-	if not profiles:
-		console.print("[bold yellow]No profiles to delete.[/bold yellow]")
-		return profiles
-
-	console.print("\n[bold red]==== Select a Profile to delete ====[/bold red]")
-	keys = list(profiles.keys())
-	table = Table(title="Available Profiles", show_header=True, header_style="bold magenta")
-	table.add_column("#", style="dim", width=3)
-	table.add_column("Name", style="cyan")
-	table.add_column("Subject", style="green")
-	table.add_column("Method", style="yellow")
-
-	for i, k in enumerate(keys, 1):
-		p = profiles[k]
-		table.add_row(str(i), p.get("name", "N/A"), p.get("subject", "N/A"), p.get("method", "N/A"))
+	A ProfileStore already persists each change as it happens, so saving one
+	just folds its journal into profiles.json. A plain dict replaces the
+	stored profiles wholesale (the original behaviour).
+	"""
+	if isinstance(profiles, ProfileStore):
+		profiles.compact()
+	else:
+		ProfileStore(PROFILES_FILE).replace_all(profiles)
 
-	console.print(table)
+def choose_profile(profiles: ProfileStore, action: str) -> Optional[str]:
+	"""Show profiles one page at a time and return the chosen key (None if cancelled).
 
+	Only the visible page is rendered; 'n'/'p' page through the list and
+	'/text' filters by name prefix.
+	"""
+	page = 0
+	prefix = ""
 	while True:
-		choice = Prompt.ask("Enter the number of the profile to delete (or 'c' to cancel): ")
+		rows, total = profiles.page(page, PROFILE_PAGE_SIZE, prefix)
+		pages = max(1, -(-total // PROFILE_PAGE_SIZE))
+		title = f"Available Profiles (page {page + 1} of {pages}, {total} total)"
+		if prefix:
+			title += f" matching '{prefix}'"
+		table = Table(title=title, show_header=True, header_style="bold magenta")
+		table.add_column("#", style="dim", width=3)
+		table.add_column("Name", style="cyan")
+		table.add_column("Subject", style="green")
+		table.add_column("Method", style="yellow")
+
+		for i, (_key, p) in enumerate(rows, 1):
+			table.add_row(str(i), p.get("name", "N/A"), p.get("subject", "N/A"), p.get("method", "N/A"))
+
+		console.print(table)
+		if pages > 1 or prefix:
+			console.print("[dim]'n' next page, 'p' previous page, '/name' search by name, '/' clear search[/dim]")
+
+		choice = Prompt.ask(f"Enter the number of the profile to {action} (or 'c' to cancel): ").strip()
 		if choice.lower() == "c":
-			console.print("Deletion cancelled.")
-			return profiles
+			return None
+		if choice.lower() == "n":
+			page = min(page + 1, pages - 1)
+			continue
+		if choice.lower() == "p":
+			page = max(page - 1, 0)
+			continue
+		if choice.startswith("/"):
+			prefix = choice[1:].strip()
+			page = 0
+			continue
 		try:
 			idx = int(choice) - 1
-			if 0 <= idx < len(keys):
-				name = keys[idx]
-				del profiles[name]
-				save_profiles(profiles)
-				console.print(f"[bold green]Profile '{name}' deleted successfully.[/bold green]")
-				return profiles
+			if 0 <= idx < len(rows):
+				return rows[idx][0]
 		except ValueError:
 			console.print("[bold red]Invalid input.[/bold red] Please enter a number or 'c'.")
 
-def select_profile_to_load(profiles: Dict[str, dict]) -> Optional[dict]:
+def delete_profile(profiles: ProfileStore) -> ProfileStore:
+	"""Delete a profile from the profile store."""
+	if not profiles:
+		console.print("[bold yellow]No profiles to delete.[/bold yellow]")
+		return profiles
+
+	console.print("\n[bold red]==== Select a Profile to delete ====[/bold red]")
+	name = choose_profile(profiles, "delete")
+	if name is None:
+		console.print("Deletion cancelled.")
+		return profiles
+
+	profiles.delete(name)
+	console.print(f"[bold green]Profile '{name}' deleted successfully.[/bold green]")
+	return profiles
+
+def select_profile_to_load(profiles: ProfileStore) -> Optional[dict]:
 	"""Allow user to select and load a profile."""
 	if not profiles:
 		console.print("[bold yellow]No saved profiles found.[/bold yellow] Starting new session.")
 		return None
 
 	console.print("\n[bold blue]===== Select a Profile to load ===[/bold blue]")
-	keys = list(profiles.keys())
-	table = Table(title="Available Profiles", show_header=True, header_style="bold magenta")
-	table.add_column("#", style="dim", width=3)
-	table.add_column("Name", style="cyan")
-	table.add_column("Subject", style="green")
-	table.add_column("Method", style="yellow")
-
-	for i, k in enumerate(keys, 1):
-		p = profiles[k]
-		table.add_row(str(i), p.get("name", "N/A"), p.get("subject", "N/A"), p.get("method", "N/A"))
-
-	console.print(table)
+	key = choose_profile(profiles, "load")
+	if key is None:
+		console.print("Loading cancelled. Starting new session.")
+		return None
 
-	while True:
-		choice = Prompt.ask("Enter the number of the profile to load (or 'c' to cancel): ")
-		if choice.lower() == "c":
-			console.print("Loading cancelled. Starting new session.")
-			return None
-		try:
-			idx = int(choice) - 1
-			if 0 <= idx < len(keys):
-				key = keys[idx]
-				console.print(f"[bold green]Profile '{key}' loaded successfully.[/bold green]")
-				return profiles[key]
-		except ValueError:
-			console.print("[bold red]Invalid input.[/bold red] Please enter a number or 'c'.")
+	console.print(f"[bold green]Profile '{key}' loaded successfully.[/bold green]")
+	return profiles[key]
 			
 #----------------------- Profile Creation-------------------------------
 
-def load_or_create_profile(profiles: Dict[str, dict]) -> Optional[dict]:
+def load_or_create_profile(profiles: ProfileStore) -> Optional[dict]:
 	"""Load an existing profile or create a new one."""
 	options = {"1": "Start new session", "2": "Load existing profile", "3": "Review Past Sessions"}
 	if profiles:
@@ -161,7 +246,7 @@ def load_or_create_profile(profiles: Dict[str, dict]) -> Optional[dict]:
 		if selected == "Load existing profile":
 			return select_profile_to_load(profiles)
 		if selected == "Review Past Sessions":
-			get_last_sessions(limit=3)
+			browse_history(show_materials=print_materials)
 			return load_or_create_profile(profiles)
 		if selected == "Delete existing profile":
 			delete_profile(profiles)
@@ -169,10 +254,72 @@ def load_or_create_profile(profiles: Dict[str, dict]) -> Optional[dict]:
 		if selected == "Start new session":
 			return None
 
+#------------------------- SUBJECT ENTRY -------------------------------#
+
+def subject_completer(index: "SubjectIndex"):
+	"""readline completer offering known subjects for the text typed so far."""
+	matches = []
+
+	def complete(text: str, state: int) -> Optional[str]:
+		if state == 0:
+			import readline
+
+			matches[:] = index.complete(readline.get_line_buffer(), limit=10)
+		return matches[state] if state < len(matches) else None
+
+	return complete
+
+def resolve_subject(subject: str, index: Optional["SubjectIndex"] = None, ask: bool = True) -> str:
+	"""Map `subject` to the canonical spelling of an equivalent known subject.
+
+	When there is none but a close match exists (a typo, say), offer it if
+	`ask` is set. Reusing one spelling keeps cache hits, profiles and
+	statistics together.
+	"""
+	index = index or get_subjects()
+	resolved, suggestions = index.resolve(subject)
+	if resolved != subject.strip() and not suggestions:
+		console.print(f"[dim]Using the subject '{resolved}'.[/dim]")
+	if ask and suggestions and Confirm.ask(f"Did you mean [bold]{suggestions[0]}[/bold]?", default=True):
+		return suggestions[0]
+	return resolved
+
+def ask_subject() -> str:
+	"""Prompt for the subject with Tab completion from past sessions and profiles (where readline exists)."""
+	index = get_subjects()
+	try:
+		import readline
+	except ImportError:  # e.g. Windows without pyreadline
+		readline = None
+	if readline is not None:
+		previous = readline.get_completer()
+		readline.set_completer(subject_completer(index))
+		readline.set_completer_delims("")
+		readline.parse_and_bind("tab: complete")
+	try:
+		popular = index.complete("", limit=5)
+		if popular:
+			console.print(f"[dim]Known subjects (Tab completes): {', '.join(popular)}[/dim]")
+		subject = Prompt.ask("What [bold]subject[/bold] are you studying? ")
+	finally:
+		if readline is not None:
+			readline.set_completer(previous)
+	return resolve_subject(subject, index)
+
 #------------------------- BUILD PROMPT FOR THE LLM -------------------------------#
 
-def build_prompt(name: str, method: str, subject: str) -> str:
-	"""Build the prompt for the LLM based on user inputs."""
+def build_prompt(name: str, method: str, subject: str, minutes: Optional[int] = None) -> str:
+	"""Build the prompt for the LLM based on user inputs.
+
+	Quiz, Flashcards and Summary use their compact, JSON-mode templates with
+	as many items as `minutes` allows (see src.materials); any other method
+	gets the free-form prompt.
+	"""
+	profile = profile_for(method)
+	if profile is not None:
+		return profile.prompt(name, subject, minutes)
+	# One line each, so user input cannot add lines of its own to the prompt.
+	name, method, subject = single_line(name), single_line(method), single_line(subject)
 	prompt = f"""
 Your role is to act as a friendly tutor or instructor. For the following user,
 studying the specified subject who is studying using a specified method, generate appropriate study materials.
@@ -184,30 +331,272 @@ Subject: {subject}
 1. Confirm the user's name and method in a friendly way.
 2. Generate the requested study materials for the user.
 3. If unsure about the subject, say you are unsure.
-4. If method is "Quiz", generate 5 multiple-choice questions with 4 options.
-5. If method is "Flashcards", generate 5 flashcards.
-6. If method is "Summary", provide a concise summary of the key concepts of some aspect of the subject.
 """
 	return prompt.strip()
 
 #-----------------------GENERATE STUDY MATERIALS VIA LLM-------------------------------#
 
-def get_study_materials(prompt: str) -> str:
-    """Call Gemini to generate study materials."""
-    # Safety check: if client failed to load above
-    if not client:
+async def generate_study_materials_async(
+    prompt: str, use_cache: bool = True, timeout: float = GENERATION_TIMEOUT_SECONDS, priority: Optional[int] = None
+) -> "GenerationResult":
+    """Coroutine form of `generate_study_materials` (used by the prefetcher and the service)."""
+    from src.generation import GenerationResult
+
+    if use_cache:
+        cached = response_cache.get(prompt, MODEL_NAME)
+        if cached is not None:
+            return GenerationResult("ok", text=cached)
+    return await _generate_uncached(prompt, use_cache, timeout, priority)
+
+async def _generate_uncached(prompt: str, use_cache: bool, timeout: float, priority: Optional[int]) -> "GenerationResult":
+    """Ask the LLM (the caller has already checked the cache) and store a successful answer."""
+    from src.generation import GenerationResult, generate_async
+
+    # Safety check: no API key means no client
+    from src.materials import generation_config
+
+    backend = get_llm()
+    if not backend:
+        return GenerationResult("error", error="API Client not initialized. Check API Key.")
+
+    result = await generate_async(backend, prompt, MODEL_NAME, timeout=timeout, priority=priority, config=generation_config(prompt))
+    if result.ok and use_cache:
+        response_cache.put(prompt, MODEL_NAME, result.text)
+    return result
+
+def generate_study_materials(
+    prompt: str, use_cache: bool = True, timeout: float = GENERATION_TIMEOUT_SECONDS, priority: Optional[int] = None
+) -> "GenerationResult":
+    """Generate study materials and report success, timeout or failure.
+
+    Cache hits are returned as successful results without a network call
+    (or a trip through the background event loop). `priority` orders the
+    request in the shared rate limiter's queue (`src.ratelimit`; None means
+    interactive).
+    """
+    from src.generation import GenerationResult, run_sync
+
+    if use_cache:
+        cached = response_cache.get(prompt, MODEL_NAME)
+        if cached is not None:
+            return GenerationResult("ok", text=cached)
+
+    return run_sync(_generate_uncached(prompt, use_cache, timeout, priority))
+
+def get_study_materials(prompt: str, use_cache: bool = True) -> str:
+    """Call Gemini to generate study materials.
+
+    Thin synchronous wrapper over the async generation path. Responses are
+    served from `response_cache` when the same prompt was answered before;
+    only successful responses are ever stored.
+    """
+    if not get_llm():
         return "Error: API Client not initialized. Check API Key."
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", 
-            contents=prompt
-        )
-        return response.text
-        
-    except Exception as e:
-        console.print(f"[bold red]Error generating study materials: {e}[/bold red]")
-        return "I apologize, but the AI service is currently unavailable. Please try again later."
+    result = generate_study_materials(prompt, use_cache=use_cache)
+    if result.ok:
+        return result.text
+
+    console.print(f"[bold red]Error generating study materials ({result.status}): {result.error}[/bold red]")
+    return UNAVAILABLE_MESSAGE
+
+#-----------------------RENDER STUDY MATERIALS-------------------------------#
+
+def materials_panel(text: str, subject: str) -> Panel:
+	"""Wrap generated materials in the study-materials panel (JSON-mode responses are rendered from their items)."""
+	from rich.markdown import Markdown  # pulls in markdown-it and pygments; deferred
+
+	from src.materials import to_markdown
+
+	return Panel(Markdown(to_markdown(text)), title=f"[bold green]Your Study Materials for {subject}[/bold green]", border_style="blue")
+
+def print_materials(text: str, subject: str) -> None:
+	"""Render study materials (timed as the render.materials span)."""
+	with metrics.span("render.materials"):
+		console.print(materials_panel(text, subject))
+
+def stream_study_materials(prompt: str, subject: str, use_cache: bool = True, timeout: float = GENERATION_TIMEOUT_SECONDS) -> "GenerationResult":
+	"""Generate study materials and render them live as chunks arrive.
+
+	Re-renders are throttled to STREAM_FPS so long responses do not spend
+	their time re-parsing Markdown. The time to the first chunk is recorded
+	on the returned result and reported once the stream finishes.
+	"""
+	import asyncio
+
+	from rich.live import Live
+
+	from src.generation import GenerationResult, iter_sync, stream_async
+	from src.materials import generation_config, streaming_preview
+
+	if use_cache:
+		cached = response_cache.get(prompt, MODEL_NAME)
+		if cached is not None:
+			print_materials(cached, subject)
+			return GenerationResult("ok", text=cached, first_chunk_latency=0.0)
+
+	backend = get_llm()
+	if not backend:
+		return GenerationResult("error", error="API Client not initialized. Check API Key.")
+
+	config = generation_config(prompt)
+	started = time.perf_counter()
+	first_chunk_latency = None
+	parts = []
+	min_interval = 1 / STREAM_FPS
+	last_render = 0.0
+	try:
+		with Live(materials_panel("*Generating...*", subject), console=console, auto_refresh=False, vertical_overflow="visible") as live:
+			for chunk in iter_sync(lambda: stream_async(backend, prompt, MODEL_NAME, timeout=timeout, config=config)):
+				now = time.perf_counter()
+				if first_chunk_latency is None:
+					first_chunk_latency = now - started
+				parts.append(chunk)
+				if now - last_render >= min_interval:
+					live.update(materials_panel(streaming_preview("".join(parts)), subject), refresh=True)
+					last_render = now
+			live.update(materials_panel("".join(parts) or UNAVAILABLE_MESSAGE, subject), refresh=True)
+	except asyncio.TimeoutError:
+		return GenerationResult("timeout", error=f"stream stalled for more than {timeout:.0f}s", elapsed=time.perf_counter() - started, first_chunk_latency=first_chunk_latency)
+	except Exception as e:
+		return GenerationResult("error", error=str(e), elapsed=time.perf_counter() - started, first_chunk_latency=first_chunk_latency)
+
+	text = "".join(parts)
+	elapsed = time.perf_counter() - started
+	if first_chunk_latency is not None:
+		console.print(f"[dim]First content after {first_chunk_latency:.2f}s, complete after {elapsed:.2f}s.[/dim]")
+	if use_cache:
+		response_cache.put(prompt, MODEL_NAME, text)
+	return GenerationResult("ok" if text else "error", text=text or None, error=None if text else "empty response", attempts=1, elapsed=elapsed, first_chunk_latency=first_chunk_latency)
+
+#-----------------------PREFETCH NEXT-CYCLE MATERIALS-------------------------------#
+
+def build_followup_prompt(name: str, method: str, subject: str, cycle: int, minutes: Optional[int] = None) -> str:
+	"""Prompt for a later cycle of the same session, asking for fresh material."""
+	return build_prompt(name, method, subject, minutes) + (
+		f"\nThis is round {cycle} of the study session: use different questions, cards or key points than earlier rounds."
+	)
+
+def start_prefetcher(name: str, method: str, subject: str, minutes: Optional[int] = None) -> "Prefetcher":
+	"""Create a Prefetcher that generates each later cycle's materials while the timer runs.
+
+	Later rounds always bypass the response cache: their prompt is the same
+	in every session, so a cached answer would repeat the same "fresh"
+	materials each time.
+	"""
+	from src.prefetch import Prefetcher
+	from src.ratelimit import PREFETCH
+
+	return Prefetcher(
+		lambda cycle: generate_study_materials_async(
+			build_followup_prompt(name, method, subject, cycle, minutes), use_cache=False, priority=PREFETCH
+		)
+	)
+
+def show_prefetched_materials(prefetcher: "Prefetcher", engine, subject: str, deck: Optional["ReviewDeck"] = None) -> None:
+	"""Show the materials prefetched for the cycle about to start, waiting only if still generating."""
+	cycle = engine.cycle + 1
+	if prefetcher.ready(cycle):
+		result = prefetcher.result(cycle)
+	else:
+		with console.status(f"[bold green]Finishing materials for cycle {cycle}...[/bold green]", spinner="dots"):
+			result = prefetcher.result(cycle, timeout=GENERATION_TIMEOUT_SECONDS)
+	if result is None or not result.ok:
+		console.print("[dim]Fresh materials for this cycle are unavailable; keep going with the current ones.[/dim]")
+		return
+	print_materials(result.text, f"{subject} (cycle {cycle})")
+	if deck is not None:
+		add_review_cards(deck, result.text, subject)
+
+#-----------------------SPACED-REPETITION REVIEW-------------------------------#
+
+def open_review_deck(name: str) -> "ReviewDeck":
+	from src.review import ReviewDeck
+
+	return ReviewDeck(name)
+
+def add_review_cards(deck: "ReviewDeck", text: str, subject: str) -> None:
+	"""Keep the flashcards or quiz questions of a response for later review."""
+	added = deck.add_materials(text, subject)
+	if added:
+		console.print(f"[dim]{added} card(s) added to your review deck (review them offline with --review).[/dim]")
+
+def run_review_mode(name: Optional[str]) -> None:
+	"""Review the cards that are due, without a timer or an API key (--review)."""
+	from src.review import run_review
+
+	name = name or Prompt.ask("What is your [bold]name[/bold]? ")
+	deck = open_review_deck(name)
+	console.print(f"[bold green]{len(deck)} card(s) in {name}'s review deck.[/bold green]")
+	run_review(deck)
+
+def review_during_work(deck: "ReviewDeck") -> Optional[Callable]:
+	"""Offer to review due cards during work phases; returns the timer's `on_work_start` hook (or None)."""
+	from src.review import run_review
+
+	due = deck.due_count(limit=100)
+	if not due or not Confirm.ask(f"You have {due}{'+' if due >= 100 else ''} card(s) due for review. Review them during work phases?"):
+		return None
+	return lambda engine: run_review(deck, until=lambda: engine.remaining() > 0)
+
+#-----------------------BATCH (HEADLESS) MODE-------------------------------#
+
+def run_batch_mode(path: str, output_path: str, workers: int, use_cache: bool = True) -> None:
+	"""Generate study materials for every row of a CSV/JSONL roster without prompting."""
+	from src.batch import print_report, read_rows, run_batch
+	from src.ratelimit import BATCH
+
+	ensure_api_key()
+
+	def generate(prompt: str) -> str:
+		result = generate_study_materials(prompt, use_cache=use_cache, priority=BATCH)
+		if not result.ok:
+			raise RuntimeError(f"{result.status}: {result.error}")
+		return result.text
+
+	console.print(f"[bold green]Running batch generation for {path} with {workers} workers...[/bold green]")
+	# Group commit turns a burst of per-row history writes into a few batched fsyncs.
+	with group_commit():
+		report = run_batch(read_rows(path), build_prompt, generate, VALID_METHODS, output_path=output_path, workers=workers)
+	print_report(report, output_path)
+
+#-----------------------STARTUP PROFILE-------------------------------#
+
+def print_startup_profile() -> None:
+	"""Report how long each deferred startup stage takes (--startup-profile)."""
+	with startup.stage("rich.markdown + rich.live import"):
+		import rich.live  # noqa: F401
+		import rich.markdown  # noqa: F401
+	with startup.stage("src.generation (asyncio) import"):
+		import src.generation  # noqa: F401
+	get_api_key()
+	if get_api_key():
+		get_client()
+	else:
+		with startup.stage("google.genai import"):
+			from google import genai  # noqa: F401
+
+	table = Table(title="Startup Stages (this process)", show_header=True, header_style="bold magenta")
+	table.add_column("Stage", style="cyan")
+	table.add_column("Time", style="green", justify="right")
+	for name, seconds in startup.STAGES:
+		table.add_row(name, f"{seconds * 1000:.1f} ms")
+	console.print(table)
+
+	with console.status("[bold green]Measuring cold imports in a fresh interpreter...[/bold green]", spinner="dots"):
+		cold = startup.import_breakdown("import src.app")
+		deferred = startup.import_breakdown("import src.app, src.generation, rich.markdown, rich.live, dotenv; from google import genai")
+
+	breakdown = Table(title="Cold Import Time by Top-Level Package", show_header=True, header_style="bold magenta")
+	breakdown.add_column("Package", style="cyan")
+	breakdown.add_column("Startup (eager)", style="green", justify="right")
+	breakdown.add_column("After first AI use", style="yellow", justify="right")
+	cold_times = dict(cold)
+	for package, seconds in deferred:
+		breakdown.add_row(package, f"{cold_times.get(package, 0.0) * 1000:.1f} ms", f"{seconds * 1000:.1f} ms")
+	console.print(breakdown)
+	console.print(f"[dim]Eager import total: {sum(cold_times.values()) * 1000:.1f} ms; "
+				  f"with deferred modules: {sum(t for _, t in deferred) * 1000:.1f} ms (top packages only).[/dim]")
 
 def parse_args():
 	"""Parse command-line arguments."""
@@ -215,15 +604,80 @@ def parse_args():
 	parser.add_argument("--name", help="Your name (optional).", default=None)
 	parser.add_argument("--method", help="Study method: Quiz, Flashcards, or Summary (optional).", default=None)
 	parser.add_argument("--subject", help="Subject you are studying (optional).", default=None)
+	parser.add_argument("--no-cache", action="store_true", help="Always ask the LLM instead of reusing cached study materials.")
+	parser.add_argument("--startup-profile", action="store_true", help="Show an import-time breakdown of CLI startup and exit.")
+	parser.add_argument("--stats", action="store_true", help="Show study statistics (minutes per user/subject/method, streaks, energy states) and exit.")
+	parser.add_argument("--history", action="store_true", help="Browse past sessions page by page (with filters) and exit.")
+	parser.add_argument("--review", action="store_true", help="Review the flashcards and quiz questions that are due (spaced repetition, works offline) and exit.")
+	parser.add_argument("--stream", action="store_true", help="Show study materials as they are generated instead of waiting for the full response.")
+	parser.add_argument("--batch", metavar="FILE", help="Generate materials for every (name, method, subject) row in a CSV or JSONL file, without prompting.", default=None)
+	parser.add_argument("--workers", type=int, help=f"Concurrent generations in --batch mode (default {DEFAULT_WORKERS}).", default=DEFAULT_WORKERS)
+	parser.add_argument("--output", help=f"NDJSON results file for --batch mode (default {DEFAULT_OUTPUT_FILE}).", default=DEFAULT_OUTPUT_FILE)
+	parser.add_argument("--serve", metavar="HOST:PORT", nargs="?", const="", default=None, help="Serve profiles, generation, history and timers to many students over a local HTTP API (default 127.0.0.1:8765).")
+	parser.add_argument("--metrics-json", metavar="FILE", help="Write a JSON summary of timings and counters to FILE at exit.", default=None)
+	parser.add_argument("--metrics-prom", metavar="FILE", help="Write metrics in Prometheus text format to FILE at exit (for node_exporter's textfile collector).", default=None)
+	parser.add_argument("--profile", metavar="FILE", nargs="?", const=DEFAULT_PROFILE_FILE, default=None, help=f"Run under cProfile and dump pstats to FILE (default {DEFAULT_PROFILE_FILE}).")
 	parser.epilog = "Typical run command: python -m src.app"
 	return parser.parse_args()
 
 #-------------------------MAIN FUNCTION-------------------------------#
 
+def export_metrics(json_path: Optional[str], prometheus_path: Optional[str]) -> None:
+	"""Write the collected metrics (registered with atexit by main())."""
+	try:
+		metrics.export(json_path, prometheus_path)
+	except OSError as e:
+		console.print(f"[bold red]Error writing metrics:[/bold red] {e}")
+
+def run_profiled(args, path: str) -> None:
+	"""Run a session under cProfile, dump the pstats file and show the top entries."""
+	import cProfile
+	import pstats
+
+	profiler = cProfile.Profile()
+	try:
+		profiler.runcall(run_session, args)
+	finally:
+		profiler.dump_stats(path)
+		pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+		console.print(f"[dim]Profile written to {path} (explore it with: python -m pstats {path}).[/dim]")
+
 def main():
 	"""provides user interface for the Pomodoro Study Buddy application."""
 
 	args = parse_args()
+	if args.metrics_json or args.metrics_prom:
+		# atexit also covers the sys.exit() calls inside a session.
+		atexit.register(export_metrics, args.metrics_json, args.metrics_prom)
+	if args.profile:
+		run_profiled(args, args.profile)
+	else:
+		run_session(args)
+
+def run_session(args):
+	"""Run one CLI session for the parsed command-line `args`."""
+	if args.startup_profile:
+		print_startup_profile()
+		return
+	if args.stats:
+		print_stats()
+		return
+	if args.history:
+		browse_history(show_materials=print_materials)
+		return
+	if args.review:
+		run_review_mode(args.name)
+		return
+	if args.serve is not None:
+		from src.server import run_server
+
+		ensure_api_key()
+		run_server(args.serve)
+		return
+	if args.batch:
+		run_batch_mode(args.batch, args.output, args.workers, use_cache=not args.no_cache)
+		return
+
 	profiles = load_profiles()
 	session_data = None
 
@@ -231,6 +685,8 @@ def main():
 	console.print(Panel.fit("[bold green]==== 🍅 WELCOME TO THE POMODORO STUDY BUDDY 🍅 ====[/bold green]\n[italic]Study smarter with AI-powered suggestions.[/italic]", border_style="green"))
 
 	session_data = load_or_create_profile(profiles)
+	# Reviewing and deleting profiles work offline; generating materials needs the key.
+	ensure_api_key()
 
 	name = None
 	method = None
@@ -255,7 +711,7 @@ def main():
 			method = method.capitalize()
 		else:
 			method = Prompt.ask("Choose your study method", choices=VALID_METHODS, case_sensitive=False).capitalize()
-		subject = args.subject or Prompt.ask("What [bold]subject[/bold] are you studying? ")
+		subject = resolve_subject(args.subject, ask=False) if args.subject else ask_subject()
 
 	if not state:
 		state = Prompt.ask("What is your current state of energy today?", choices=["Tired", "Focused", "Overwhelmed", "Exhausted"], case_sensitive=False).lower()
@@ -273,23 +729,27 @@ def main():
 	# Convert state to our rules input expectations (lowercase)
 	state_label = state.strip().lower() if isinstance(state, str) else state
 
-	# study_mode now returns a simple label; map it back to a mode description and durations
-	label = study_mode(state_label)
-	mapping: Dict[str, Tuple[str, int, int]] = {
-		"deep study": ("Deep study (45 min work/ 15 min break, 2 cycles)", 45, 15),
-		"light review": ("Light review (10 min work / 2 min break, 1 cycle)", 10, 2),
-		"basic check-in": ("Standard check-in (25 min work/ 5 min break, 1 cycle)", 25, 5),
-	}
-
-	mode_desc, work_min, break_min = mapping.get(label, mapping["basic check-in"])
+	# The rules weigh energy, available minutes and the time of day.
+	plan = classify(state_label, minutes, current_hour())
+	mode_desc, work_min, break_min = plan.description, plan.work, plan.break_
 
 	console.print(f"\n[bold blue]Suggested Study Mode:[/bold blue] {mode_desc}\n")
 
-	prompt = build_prompt(name, method, subject)
-	with console.status("[bold green]Generating study materials...[/bold green]", spinner="dots"):
-		response = get_study_materials(prompt)
+	prompt = build_prompt(name, method, subject, minutes)
+	if args.stream:
+		result = stream_study_materials(prompt, subject, use_cache=not args.no_cache)
+		response = result.text if result.ok else UNAVAILABLE_MESSAGE
+		if not result.ok:
+			console.print(f"[bold red]Error generating study materials ({result.status}): {result.error}[/bold red]")
+			print_materials(response, subject)
+	else:
+		with console.status("[bold green]Generating study materials...[/bold green]", spinner="dots"):
+			response = get_study_materials(prompt, use_cache=not args.no_cache)
+
+		print_materials(response, subject)
 
-	console.print(Panel(Markdown(response), title=f"[bold green]Your Study Materials for {subject}[/bold green]", border_style="blue"))
+	deck = open_review_deck(name)
+	add_review_cards(deck, response, subject)
 
 	# Log session including the AI response preview
 	log_session(name, method, subject, state_label, minutes, source_type, response=response)
@@ -299,15 +759,14 @@ def main():
 	current_profile_key = f"{name}_{method}_{subject}".replace(" ", "_")
 	if current_profile_key not in profiles and len(profiles) < MAX_PROFILES:
 		if Confirm.ask("Do you want to save this session as a profile?"):
-			profiles[current_profile_key] = {
+			profiles.put(current_profile_key, {
 				"name": name,
 				"state": state_label,
 				"method": method,
 				"subject": subject,
 				"source": source_type,
 				"minutes": minutes,
-			}
-			save_profiles(profiles)
+			})
 			console.print(f"[bold green]Profile '{current_profile_key}' saved successfully.[/bold green]")
 	elif len(profiles) >= MAX_PROFILES and current_profile_key not in profiles:
 		console.print(f"\n[bold red]Sorry but we couldn't save the new profile. The maximum number of profiles has been reached. To add a new profile, please re-start the program and delete an existing profile.[/bold red]")
@@ -317,11 +776,26 @@ def main():
 	# Pomodoro Timer Logic
 	if work_min > 0:
 		if Confirm.ask(f"\n[bold green]Do you want to start the Pomodoro timer now (Work: {work_min} min, Break: {break_min} min)?[/bold green]"):
-			pomodoro_arg_func(work_min, break_min)
+			# Later cycles get fresh materials, generated in the background during each work phase.
+			on_work_start = review_during_work(deck)
+			prefetcher = start_prefetcher(name, method, subject, minutes=minutes)
+			try:
+				pomodoro_arg_func(
+					work_min,
+					break_min,
+					mode_desc,
+					on_phase_change=prefetcher.on_phase_change,
+					on_cycle_start=lambda engine: show_prefetched_materials(prefetcher, engine, subject, deck),
+					on_work_start=on_work_start,
+				)
+			finally:
+				prefetcher.cancel()
 		else:
 			console.print("[dim]Skipping timer...[/dim]")
 			console.print("\n[bold green]Happy Studying! No timer initiated. 🍅[/bold green]")
 			sys.exit(0)
+	else:
+		console.print("\n[bold yellow]Rest first - no timer this time. Come back when you have more energy. 🍅[/bold yellow]")
 
 if __name__ == "__main__":
 	try:
@@ -0,0 +1,208 @@
+"""Headless batch generation for Pomodoro Study Buddy.
+
+Reads (name, method, subject) rows from a CSV or JSONL file, generates study
+materials for every row through a bounded worker pool, writes one NDJSON
+result per row and logs each successful row to the session history.
+
+Typical run command: python -m src.app --batch roster.csv --workers 8
+"""
+
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from rich.console import Console
+from rich.table import Table
+
+from src.history import log_session
+from src.rules import classify
+from src.subjects import canonical_subject
+
+console = Console()
+
+DEFAULT_WORKERS = 4
+DEFAULT_OUTPUT_FILE = "batch_results.ndjson"
+BATCH_SOURCE = "Batch"
+
+
+class BatchRowError(Exception):
+    """Raised for a row that cannot be generated (bad input or failed call)."""
+
+
+@dataclass
+class BatchReport:
+    """Summary of a batch run: counts, throughput and latency percentiles."""
+
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile of the per-row latencies, in seconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+#----------------------------- INPUT ---------------------------------------
+
+def read_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Yield rows from a CSV (with a header) or JSONL/NDJSON file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            for row in csv.DictReader(f):
+                yield {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            return
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_error": f"line {line_no}: invalid JSON ({e.msg})"}
+                continue
+            yield row if isinstance(row, dict) else {"_error": f"line {line_no}: expected an object"}
+
+
+def normalize_row(row: Dict[str, str], valid_methods: Sequence[str]) -> Dict[str, str]:
+    """Validate one input row and return the cleaned (name, method, subject, ...) fields."""
+    if "_error" in row:
+        raise BatchRowError(row["_error"])
+    name = str(row.get("name") or "").strip()
+    subject = canonical_subject(row.get("subject"))
+    method = str(row.get("method") or "").strip().capitalize()
+    if not name or not subject:
+        raise BatchRowError("row needs both 'name' and 'subject'")
+    if method not in valid_methods:
+        raise BatchRowError(f"method must be one of {', '.join(valid_methods)}")
+    try:
+        minutes = int(row.get("minutes") or 0)
+    except (TypeError, ValueError):
+        minutes = 0
+    return {
+        "name": name,
+        "method": method,
+        "subject": subject,
+        "state": str(row.get("state") or "batch").strip().lower(),
+        "minutes": minutes,
+    }
+
+
+#----------------------------- EXECUTION -----------------------------------
+
+def _process(
+    index: int,
+    row: Dict[str, str],
+    build_prompt: Callable[[str, str, str, int], str],
+    generate: Callable[[str], str],
+    valid_methods: Sequence[str],
+) -> dict:
+    started = time.perf_counter()
+    result = {"row": index}
+    try:
+        fields = normalize_row(row, valid_methods)
+        result.update(fields)
+        result["mode"] = classify(fields["state"], fields["minutes"]).label
+        result["materials"] = generate(build_prompt(fields["name"], fields["method"], fields["subject"], fields["minutes"]))
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def run_batch(
+    rows: Iterable[Dict[str, str]],
+    build_prompt: Callable[[str, str, str, int], str],
+    generate: Callable[[str], str],
+    valid_methods: Sequence[str],
+    output_path: str = DEFAULT_OUTPUT_FILE,
+    workers: int = DEFAULT_WORKERS,
+    log_results: bool = True,
+) -> BatchReport:
+    """Generate materials for every row using at most `workers` concurrent calls.
+
+    Rows are pulled lazily and at most ``2 * workers`` are in flight, so
+    arbitrarily large rosters run in bounded memory. Results are written as
+    they complete (not in input order); each carries its input `row` number.
+    """
+    workers = max(1, workers)
+    report = BatchReport()
+    started = time.perf_counter()
+    row_iter = enumerate(rows, 1)
+    pending = set()
+
+    def submit_next(pool) -> bool:
+        try:
+            index, row = next(row_iter)
+        except StopIteration:
+            return False
+        pending.add(pool.submit(_process, index, row, build_prompt, generate, valid_methods))
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(output_path, "w", encoding="utf-8") as out:
+        while len(pending) < 2 * workers and submit_next(pool):
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                result = future.result()
+                _record(result, report, log_results)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                submit_next(pool)
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _record(result: dict, report: BatchReport, log_results: bool) -> None:
+    report.total += 1
+    report.latencies.append(result["latency_ms"] / 1000)
+    if result["status"] != "ok":
+        report.failed += 1
+        return
+    report.succeeded += 1
+    if log_results:
+        log_session(
+            result["name"],
+            result["method"],
+            result["subject"],
+            result["state"],
+            result["minutes"],
+            BATCH_SOURCE,
+            response=result["materials"],
+        )
+
+
+def print_report(report: BatchReport, output_path: Optional[str] = None) -> None:
+    """Render the batch summary table."""
+    table = Table(title="Batch Generation Summary", show_header=True, header_style="bold magenta")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    table.add_row("Rows", str(report.total))
+    table.add_row("Succeeded", str(report.succeeded))
+    table.add_row("Failed", str(report.failed))
+    table.add_row("Elapsed", f"{report.elapsed:.2f} s")
+    table.add_row("Throughput", f"{report.throughput:.2f} rows/s")
+    for pct in (50, 90, 99):
+        table.add_row(f"Latency p{pct}", f"{report.percentile(pct) * 1000:.0f} ms")
+    console.print(table)
+    if output_path:
+        console.print(f"[dim]Results written to {output_path}[/dim]")
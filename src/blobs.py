@@ -0,0 +1,149 @@
+"""Content-addressed store for full generated study materials.
+
+History records keep only a short preview; the complete text is stored
+here, zlib-compressed, under the SHA-256 of its UTF-8 bytes, and the record
+references it by that ``material_hash``. Identical materials (the same quiz
+served to a whole class from the response cache, say) are therefore stored
+once, and a past session's materials can be re-opened without calling the
+LLM again.
+
+Layout: ``.study_blobs/<first 2 hex chars>/<remaining 62>.z``. Blobs are
+immutable and written with an atomic rename, so concurrent writers of the
+same content are harmless.
+
+Typical run commands:
+    python -m src.blobs stats
+    python -m src.blobs gc      # delete blobs no history record references
+"""
+
+import argparse
+import hashlib
+import os
+import zlib
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from rich.console import Console
+
+from src import metrics
+from src.durable import atomic_write_bytes
+
+BLOB_DIR = ".study_blobs"
+BLOB_SUFFIX = ".z"
+COMPRESSION_LEVEL = 6
+
+console = Console()
+
+
+def content_hash(text: str) -> str:
+    """The key a text is stored under."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """Compressed, deduplicated blobs keyed by content hash."""
+
+    def __init__(self, directory: str = BLOB_DIR) -> None:
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest[2:] + BLOB_SUFFIX)
+
+    def __contains__(self, digest: str) -> bool:
+        return _is_digest(digest) and os.path.exists(self._path(digest))
+
+    def put(self, text: str) -> str:
+        """Store `text` (once) and return its hash."""
+        digest = content_hash(text)
+        path = self._path(digest)
+        if os.path.exists(path):
+            metrics.incr("blob_dedup_hits")
+            return digest
+        data = zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_bytes(path, data)
+        metrics.incr("blob_bytes_written", len(data))
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """The stored text, or None if it is missing or fails its hash check."""
+        if not _is_digest(digest):
+            return None
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            metrics.incr("blob_corrupt")
+            return None
+        return data.decode("utf-8")
+
+    def iter_digests(self) -> Iterator[str]:
+        if not os.path.isdir(self.directory):
+            return
+        for prefix in sorted(os.listdir(self.directory)):
+            folder = os.path.join(self.directory, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(BLOB_SUFFIX) and _is_digest(prefix + name[: -len(BLOB_SUFFIX)]):
+                    yield prefix + name[: -len(BLOB_SUFFIX)]
+
+    def usage(self) -> Tuple[int, int]:
+        """(number of blobs, bytes on disk)."""
+        count = size = 0
+        for digest in self.iter_digests():
+            count += 1
+            size += os.path.getsize(self._path(digest))
+        return count, size
+
+    def gc(self, referenced: Iterable[str]) -> int:
+        """Delete every blob not in `referenced`. Returns how many were removed."""
+        keep = set(referenced)
+        removed = 0
+        for digest in list(self.iter_digests()):
+            if digest not in keep:
+                os.remove(self._path(digest))
+                removed += 1
+        return removed
+
+
+def _is_digest(value: object) -> bool:
+    return isinstance(value, str) and len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+_blobs: Optional[BlobStore] = None
+
+
+def get_blobs() -> BlobStore:
+    global _blobs
+    if _blobs is None:
+        _blobs = BlobStore()
+    return _blobs
+
+
+def set_blobs(blobs: Optional[BlobStore]) -> None:
+    """Replace the shared store (None goes back to the default directory)."""
+    global _blobs
+    _blobs = blobs
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stored study materials.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show how many materials are stored and their size on disk.")
+    sub.add_parser("gc", help="Delete materials no history record references.")
+    args = parser.parse_args(argv)
+    store = get_blobs()
+    if args.command == "gc":
+        from src.history import get_backend
+
+        removed = store.gc(r["material_hash"] for r in get_backend().iter_newest() if r.get("material_hash"))
+        console.print(f"[bold green]Removed {removed} unreferenced materials.[/bold green]")
+        return
+    count, size = store.usage()
+    console.print(f"{count} stored materials, {size / 1024:.1f} KiB on disk in {store.directory}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Response cache for generated study materials.
+
+Sits in front of the LLM call so that repeat requests (same subject, method
+and student) are answered locally instead of paying for another round trip.
+
+Two tiers are used:
+
+* an in-memory LRU tier that lives for the duration of the process, and
+* an on-disk tier shared between runs, with a TTL and a total-size budget.
+
+Entries are keyed on a hash of the model name and a normalized copy of the
+prompt, so whitespace or casing differences do not cause misses.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from src import metrics
+
+CACHE_DIR = ".study_cache"
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_MEMORY_ENTRIES = 128
+DEFAULT_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+# Responses containing any of these are error/fallback text and must never be cached.
+UNCACHEABLE_MARKERS = (
+    "AI service is currently unavailable",
+    "API Client not initialized",
+)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and casing so equivalent prompts share a key."""
+    return " ".join(prompt.split()).casefold()
+
+
+def cache_key(prompt: str, model: str) -> str:
+    """Return the content-addressed key for a prompt/model pair."""
+    payload = f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def is_cacheable(text: Optional[str]) -> bool:
+    """Only real model output is worth keeping; never the fallback strings."""
+    if not text or not text.strip():
+        return False
+    return not any(marker in text for marker in UNCACHEABLE_MARKERS)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + disk) cache for LLM responses."""
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_entries: int = DEFAULT_MAX_MEMORY_ENTRIES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------ public
+
+    def get(self, prompt: str, model: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry."""
+        key = cache_key(prompt, model)
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, text = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    metrics.incr("cache_hits")
+                    return text
+                del self._memory[key]
+
+            record = self._read_disk(key)
+            if record is not None and now - record.get("created", 0) <= self.ttl_seconds:
+                self._remember(key, record["created"], record["text"])
+                self.hits += 1
+                self.disk_hits += 1
+                metrics.incr("cache_hits")
+                return record["text"]
+            if record is not None:
+                self._remove_disk(key)
+
+            self.misses += 1
+            metrics.incr("cache_misses")
+            return None
+
+    def put(self, prompt: str, model: str, text: str) -> bool:
+        """Store a response in both tiers. Returns False if it was refused."""
+        if not is_cacheable(text):
+            return False
+        key = cache_key(prompt, model)
+        created = self._clock()
+        with self._lock:
+            self._remember(key, created, text)
+            try:
+                self._write_disk(key, {"model": model, "created": created, "text": text})
+            except OSError:
+                # The memory tier still works; disk problems should never break a session.
+                return True
+            self.stores += 1
+            self._enforce_disk_budget()
+        return True
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if os.path.isdir(self.directory):
+                for path, _size, _mtime in self._scan_disk():
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for reporting."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+
+    # ----------------------------------------------------------------- helpers
+
+    def _remember(self, key: str, created: float, text: str) -> None:
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        path = self._path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            # Touch the entry so size-based eviction drops the least recently used first.
+            os.utime(path, None)
+            return record
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write_disk(self, key: str, record: dict) -> None:
+        path = self._path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        metrics.incr("cache_bytes_written", size)
+        if self._disk_bytes is not None:
+            self._disk_bytes += size - previous
+
+    def _remove_disk(self, key: str) -> None:
+        path = self._path_for(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._disk_bytes is not None:
+            self._disk_bytes -= size
+
+    def _scan_disk(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for filename in files:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _enforce_disk_budget(self) -> None:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _path, size, _mtime in self._scan_disk())
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted(self._scan_disk(), key=lambda item: item[2])
+        total = sum(size for _path, size, _mtime in entries)
+        for path, size, _mtime in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+            key = os.path.basename(path)[: -len(".json")]
+            self._memory.pop(key, None)
+        self._disk_bytes = total
@@ -0,0 +1,242 @@
+"""Crash-safe and multi-process-safe file writes.
+
+Shared by the session history and the profile store:
+
+* `file_lock` takes an advisory, exclusive lock on ``<path>.lock`` so two
+  CLI instances on the same machine serialize their read-modify-write cycles
+  instead of silently overwriting each other.
+* `atomic_write_bytes`/`atomic_write_text`/`atomic_write_json` write to a temp file in the same
+  directory, fsync it and atomically rename it over the target, so a crash
+  mid-write leaves either the old file or the new one, never a truncated one.
+  `atomic_writer` does the same for output streamed in pieces.
+* `append_durable` appends and fsyncs under the lock.
+* `GroupCommitter` batches records submitted by many callers into one
+  durable write, so a burst of session logs costs one fsync instead of one each.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterator, List, Optional
+
+from src import metrics
+
+try:  # POSIX
+    import fcntl
+
+    def _lock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+except ImportError:  # pragma: no cover - Windows
+    import msvcrt
+
+    def _lock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+LOCK_SUFFIX = ".lock"
+
+# flock is per open file description, so re-entrant use within one process
+# is tracked here to avoid deadlocking on our own lock.
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock for `path` (via ``path + '.lock'``)."""
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = {}
+    key = os.path.abspath(path)
+    if held.get(key):
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    fd = os.open(key + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock(fd)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            held.pop(key, None)
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(directory: str) -> None:
+    """Persist a rename by syncing its directory (no-op where unsupported)."""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_writer(path: str) -> Iterator[IO[bytes]]:
+    """Yield a binary temp file that atomically replaces `path` when the block exits cleanly.
+
+    If the block raises, the temp file is removed and `path` is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(tmp_path, path)
+        metrics.incr("file_bytes_written", written)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Replace `path` with `data` via temp file + fsync + atomic rename."""
+    with atomic_writer(path) as f:
+        f.write(data)
+
+
+def atomic_write_text(path: str, text: str, encoding: str = "utf-8") -> None:
+    """Replace `path` with `text` atomically (see `atomic_write_bytes`)."""
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 4) -> None:
+    """Serialize `data` and atomically replace `path` with it."""
+    atomic_write_text(path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+
+def append_durable(path: str, data: bytes) -> int:
+    """Append `data` under the file lock and fsync. Returns the offset written at."""
+    with file_lock(path), open(path, "ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    metrics.incr("file_bytes_written", len(data))
+    return offset
+
+
+#============================GROUP COMMIT====================================
+
+class _Pending:
+    __slots__ = ("record", "done", "error")
+
+    def __init__(self, record: Any) -> None:
+        self.record = record
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    """Coalesce records from many callers into batched durable writes.
+
+    `write_batch(records)` must make the whole batch durable in one go (one
+    lock, one write, one fsync). Records submitted within `max_delay`
+    seconds of each other, up to `max_batch`, share a single call.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Any]], None],
+        max_delay: float = 0.05,
+        max_batch: int = 256,
+    ) -> None:
+        self._write_batch = write_batch
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue: List[_Pending] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        self.batches = 0
+        self.records = 0
+        self.last_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Any, wait: bool = False) -> None:
+        """Queue a record; with `wait`, block until it is durable (re-raising write errors)."""
+        pending = _Pending(record)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GroupCommitter is closed")
+            self._queue.append(pending)
+            self._cond.notify_all()
+        if wait:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+
+    def flush(self) -> None:
+        """Block until everything submitted so far has been written."""
+        with self._cond:
+            last = self._queue[-1] if self._queue else None
+            self._flush_requested = True
+            self._cond.notify_all()
+        if last is not None:
+            last.done.wait()
+
+    def close(self) -> None:
+        """Flush outstanding records and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue and self._closed:
+                    return
+                # Give concurrent callers a short window to join this batch.
+                window_ends = time.monotonic() + self.max_delay
+                while len(self._queue) < self.max_batch and not (self._closed or self._flush_requested):
+                    remaining = window_ends - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._queue = self._queue[: self.max_batch], self._queue[self.max_batch:]
+                if not self._queue:
+                    self._flush_requested = False
+            error = None
+            try:
+                self._write_batch([p.record for p in batch])
+                self.batches += 1
+                self.records += len(batch)
+            except BaseException as e:  # reported to waiting submitters
+                error = self.last_error = e
+            for pending in batch:
+                pending.error = error
+                pending.done.set()
@@ -0,0 +1,322 @@
+"""Asynchronous study-material generation.
+
+Wraps an LLM backend (`src.llm`; a raw genai client is wrapped in
+`GeminiBackend`) with per-call deadlines,
+bounded retries with exponential backoff and full jitter, and a structured
+`GenerationResult` so callers can tell success, timeout and failure apart
+instead of receiving an apology string. `generate_many` fans out many
+prompts concurrently; `run_sync` lets synchronous code (the CLI, batch
+worker threads) drive the coroutines on a shared background event loop.
+`stream_async`/`iter_sync` expose the streaming API chunk by chunk.
+`SingleFlight` coalesces identical concurrent requests onto one call.
+Requests wait for the backend's rate limiter (`src.ratelimit`) outside
+their per-attempt timeout.
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from src import metrics
+from src.llm import as_backend
+from src.ratelimit import request_priority
+
+DEFAULT_TIMEOUT_SECONDS = 60.0
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+T = TypeVar("T")
+
+_transient_errors: Optional[tuple] = None
+
+
+def _transient_error_types() -> tuple:
+    """Exception types that mean "network hiccup", resolved on first use.
+
+    httpx ships with google-genai but is slow to import, so it is only
+    loaded once an error actually needs classifying.
+    """
+    global _transient_errors
+    if _transient_errors is None:
+        try:
+            import httpx
+
+            _transient_errors = (ConnectionError, TimeoutError, httpx.TransportError)
+        except ImportError:  # pragma: no cover - depends on the installed SDK
+            _transient_errors = (ConnectionError, TimeoutError)
+    return _transient_errors
+
+
+@dataclass
+class GenerationResult:
+    """Outcome of one generation request."""
+
+    status: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    first_chunk_latency: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+@dataclass
+class RetryPolicy:
+    """Bounded retries with capped exponential backoff and full jitter."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def backoff(self, attempt: int, rng: Callable[[float, float], float] = random.uniform) -> float:
+        """Delay before retry number `attempt` (1-based)."""
+        return rng(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for timeouts, transport errors and retryable HTTP status codes."""
+    if isinstance(exc, (asyncio.TimeoutError,) + _transient_error_types()):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+
+async def generate_async(
+    client: Any,
+    prompt: str,
+    model: str,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    retry: RetryPolicy = DEFAULT_RETRY_POLICY,
+    deadline: Optional[float] = None,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    priority: Optional[int] = None,
+    config: Optional[dict] = None,
+) -> GenerationResult:
+    """Generate study materials for `prompt` with an LLM backend or genai client.
+
+    `timeout` bounds each attempt; `deadline` (seconds, optional) bounds the
+    whole call including retries, backoff and time queued for the rate
+    limiter. `priority` (`src.ratelimit.INTERACTIVE`, `PREFETCH` or `BATCH`)
+    orders this call in the rate limiter's queue. `config` is passed to the
+    backend (JSON mode and output limits, see `src.materials`). Cancellation
+    is not swallowed: cancelling the awaiting task cancels the in-flight request.
+    """
+    if priority is not None:
+        token = request_priority.set(priority)
+        try:
+            return await generate_async(client, prompt, model, timeout, retry, deadline, sleep, config=config)
+        finally:
+            request_priority.reset(token)
+    backend = as_backend(client)
+    extra = {"config": config} if config is not None else {}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    give_up_at = started + deadline if deadline is not None else None
+    attempt = 0
+    last_status, last_error = STATUS_ERROR, None
+
+    metrics.incr("llm_requests")
+    while attempt < max(1, retry.max_attempts):
+        attempt += 1
+        attempt_timeout = timeout
+        if give_up_at is not None:
+            attempt_timeout = min(timeout, give_up_at - loop.time())
+            if attempt_timeout <= 0:
+                last_status, last_error = STATUS_TIMEOUT, "deadline exceeded"
+                break
+        try:
+            if give_up_at is None:
+                await backend.admit(prompt)
+            else:
+                # Queueing is bounded by the overall deadline only, never by the per-attempt timeout.
+                try:
+                    await asyncio.wait_for(backend.admit(prompt), timeout=give_up_at - loop.time())
+                except asyncio.TimeoutError:
+                    last_status, last_error = STATUS_TIMEOUT, "deadline exceeded while queued for the rate limiter"
+                    break
+                attempt_timeout = min(timeout, give_up_at - loop.time())
+            text = await asyncio.wait_for(backend.generate(prompt, model, **extra), timeout=attempt_timeout)
+            metrics.observe("llm.generate", loop.time() - started)
+            return GenerationResult(STATUS_OK, text=text, attempts=attempt, elapsed=loop.time() - started)
+        except asyncio.TimeoutError:
+            last_status, last_error = STATUS_TIMEOUT, f"timed out after {attempt_timeout:.1f}s"
+        except Exception as e:
+            last_status, last_error = STATUS_ERROR, str(e) or type(e).__name__
+            if not is_retryable(e):
+                break
+
+        if attempt < retry.max_attempts:
+            metrics.incr("llm_retries")
+            delay = retry.backoff(attempt)
+            if give_up_at is not None:
+                delay = min(delay, max(0.0, give_up_at - loop.time()))
+            await sleep(delay)
+
+    metrics.observe("llm.generate", loop.time() - started)
+    metrics.incr("llm_timeouts" if last_status == STATUS_TIMEOUT else "llm_errors")
+    return GenerationResult(last_status, error=last_error, attempts=attempt, elapsed=loop.time() - started)
+
+
+async def generate_many(
+    client: Any,
+    prompts: Sequence[str],
+    model: str,
+    concurrency: int = 8,
+    **kwargs: Any,
+) -> List[GenerationResult]:
+    """Run `generate_async` for every prompt with at most `concurrency` in flight.
+
+    Results are returned in the same order as `prompts`.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(prompt: str) -> GenerationResult:
+        async with semaphore:
+            return await generate_async(client, prompt, model, **kwargs)
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+async def stream_async(
+    client: Any,
+    prompt: str,
+    model: str,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    config: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """Yield text chunks from the streaming generate API as they arrive.
+
+    `timeout` bounds the wait for the first chunk and for every chunk
+    after it, so a stalled stream raises `asyncio.TimeoutError`.
+    """
+    backend = as_backend(client)
+    await backend.admit(prompt)
+    extra = {"config": config} if config is not None else {}
+    iterator = backend.stream(prompt, model, **extra).__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            return
+        if chunk:
+            yield chunk
+
+
+#----------------------- REQUEST COALESCING ---------------------------------
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight call.
+
+    The first caller for a key starts the work; everyone arriving while it
+    runs awaits the same task and gets the same result (or exception). The
+    key is forgotten once the call finishes, so later calls start afresh
+    (put a cache in front to reuse finished results). A caller being
+    cancelled does not cancel the shared call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.shared = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, make_call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return ``(result, shared)``; `shared` is True when another caller's call was joined."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.shared += 1
+            metrics.incr("singleflight_shared")
+        else:
+            task = asyncio.ensure_future(make_call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+
+#----------------------- SYNC BRIDGE ---------------------------------------
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Start (once) a daemon thread running the event loop shared by sync callers.
+
+    Keeping one long-lived loop lets the SDK's async HTTP connections be
+    reused across calls instead of being torn down with every asyncio.run().
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="generation-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def submit(coro: Awaitable) -> "concurrent.futures.Future":
+    """Start a coroutine on the shared loop without waiting for it.
+
+    Cancelling the returned future cancels the coroutine (and any request it
+    has in flight).
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop())
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None):
+    """Run a coroutine on the shared loop and block until it finishes."""
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+_DONE = object()
+
+
+def iter_sync(make_stream: Callable[[], AsyncIterator]) -> Iterator:
+    """Consume an async iterator from synchronous code, one item at a time.
+
+    The stream runs on the shared loop and hands items over through a
+    queue; exceptions are re-raised in the caller. Closing the returned
+    generator early (or Ctrl+C) cancels the stream.
+    """
+    handoff: "queue.Queue" = queue.Queue()
+
+    async def pump() -> None:
+        try:
+            async for item in make_stream():
+                handoff.put(item)
+        except BaseException as e:  # forwarded to the consumer, including cancellation
+            handoff.put(e)
+        finally:
+            handoff.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+    try:
+        while True:
+            item = handoff.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        future.cancel()
@@ -1,26 +1,156 @@
 import json
-import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional
 
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 
-HISTORY_FILE = "session_history.json"
+from src import metrics, stats, subjects
+from src.blobs import get_blobs
+from src.cache import is_cacheable
+from src.durable import GroupCommitter
+from src.history_browser import session_panel
+from src.materials import to_markdown
+from src.storage import LEGACY_HISTORY_FILE, HistoryBackend, has_legacy_data, migrate_legacy, open_backend
+
+HISTORY_FILE = LEGACY_HISTORY_FILE
 console = Console()
 
+_backend: Optional[HistoryBackend] = None
+_committer: Optional[GroupCommitter] = None
+
+
+def get_backend() -> HistoryBackend:
+    """Return the configured history storage engine, opening it on first use.
+
+    The first time an empty store is opened, any legacy
+    `session_history.json` / `study_log.json` data is imported into it.
+    """
+    global _backend
+    if _backend is None:
+        backend = open_backend()
+        try:
+            if has_legacy_data() and backend.count() == 0:
+                imported = migrate_legacy(backend)
+                if imported:
+                    console.print(f"[dim]Imported {imported} past sessions into the {backend.name} history store.[/dim]")
+        except Exception as e:
+            console.print(f"[bold red]Error importing legacy history:[/bold red] {e}")
+        try:
+            metrics.set_gauge("history_records", backend.count())
+        except Exception:
+            pass
+        _backend = backend
+    return _backend
+
+
+def set_backend(backend: Optional[HistoryBackend]) -> None:
+    """Swap the storage engine (None re-opens the configured one on next use)."""
+    global _backend
+    if _backend is not None and _backend is not backend:
+        _backend.close()
+    _backend = backend
+
+
+@contextmanager
+def group_commit(max_delay: float = 0.05, max_batch: int = 256) -> Iterator[GroupCommitter]:
+    """Batch `log_session` writes made inside the block into grouped durable writes.
+
+    Sessions logged within `max_delay` seconds of each other are written
+    with a single lock/append/fsync. Everything is flushed on exit.
+    """
+    global _committer
+    if _committer is not None:  # already grouping; join the outer block
+        yield _committer
+        return
+    committer = GroupCommitter(_write_sessions, max_delay=max_delay, max_batch=max_batch)
+    _committer = committer
+    try:
+        yield committer
+    finally:
+        _committer = None
+        committer.close()
+        if committer.last_error is not None:
+            console.print(f"[bold red]Error saving history:[/bold red] {committer.last_error}")
+
+
+def _open_rollups() -> Optional[stats.StudyStats]:
+    # Open the rollups before writing: if they have to be rebuilt from
+    # history, the new records must not be in it yet or they would be counted twice.
+    try:
+        return stats.get_stats()
+    except Exception as e:
+        console.print(f"[bold red]Error loading statistics:[/bold red] {e}")
+        return None
+
+
+def _fold(entries: List[dict], rollups: Optional[stats.StudyStats]) -> None:
+    """Fold stored records into the statistics rollups and the subject index."""
+    metrics.add_gauge("history_records", len(entries))
+    subjects.record_subjects(e.get("subject") for e in entries)
+    if rollups is not None:
+        try:
+            rollups.record_many(entries)
+        except Exception as e:
+            console.print(f"[bold red]Error updating statistics:[/bold red] {e}")
+
+
+def _write_sessions(entries: List[dict]) -> None:
+    """Persist new session records, then fold them into the statistics rollups and subject index."""
+    rollups = _open_rollups()
+    get_backend().extend(entries)
+    _fold(entries, rollups)
+
+
+def import_sessions(entries: Iterable[dict], chunk_size: int = 500) -> int:
+    """Log already-complete session records (oldest first) with one merge.
+
+    The records are merged into the history by timestamp - sessions older
+    than the stored ones do not become the "latest" - rewriting the stored
+    history at most once, and are folded into the statistics `chunk_size`
+    at a time as the backend consumes them, so `entries` can be a generator
+    of any length. If the merge fails, the statistics are rebuilt from what
+    was actually stored. Returns how many were imported.
+    """
+    rollups = _open_rollups()
+    backend = get_backend()
+    count = 0
+
+    def folded() -> Iterator[dict]:
+        nonlocal count
+        chunk: List[dict] = []
+        for entry in entries:
+            yield entry
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                _fold(chunk, rollups)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            _fold(chunk, rollups)
+            count += len(chunk)
+
+    try:
+        backend.merge(folded(), chunk_size)
+    except BaseException:
+        if count:
+            subjects.set_subjects(None)
+            if rollups is not None:
+                rollups.rebuild(backend.iter_newest())
+        raise
+    return count
+
 
 def load_history() -> List[dict]:
-    """Load session history from a JSON file.
+    """Load the full session history, newest first.
 
-    Returns an empty list when the file doesn't exist or is corrupted.
+    Returns an empty list when the store doesn't exist or is corrupted.
     """
-    if not os.path.exists(HISTORY_FILE):
-        return []
     try:
-        with open(HISTORY_FILE, "r") as f:
-            return json.load(f)
+        with metrics.span("history.load"):
+            return list(get_backend().iter_newest())
     except json.JSONDecodeError:
         console.print("[bold red]Warning: History file corrupted. Starting new log.[/bold red]")
         return []
@@ -30,10 +160,11 @@ def load_history() -> List[dict]:
 
 
 def save_history(history: List[dict]) -> None:
-    """Save the current session history to a JSON file."""
+    """Replace the stored session history with `history` (newest first) and rebuild the statistics."""
     try:
-        with open(HISTORY_FILE, "w") as f:
-            json.dump(history, f, indent=4)
+        get_backend().replace_all(history)
+        stats.StudyStats().rebuild(history)
+        stats.set_stats(None)
     except Exception as e:
         console.print(f"[bold red]Error saving history:[/bold red] {e}")
 
@@ -49,11 +180,13 @@ def log_session(
 ) -> None:
     """Log a completed study session with metadata.
 
-    The optional `response` is truncated for storage as a preview.
+    The optional `response` is kept in full in the blob store (the record
+    gets its `material_hash`) and, rendered as Markdown, truncated for the
+    record as a preview.
+    Only the new record is written (and folded into the statistics rollups),
+    so the cost does not grow with the history size.
     """
-    history = load_history()
-
-    preview_text = (response or "")[:200].replace("\n", " ")
+    preview_text = to_markdown(response)[:200].replace("\n", " ")
     material_preview = preview_text + ("..." if response else "")
 
     session_entry = {
@@ -66,34 +199,45 @@ def log_session(
         "source": source_type,
         "material_preview": material_preview,
     }
+    if is_cacheable(response):
+        try:
+            session_entry["material_hash"] = get_blobs().put(response)
+        except Exception as e:
+            console.print(f"[bold red]Error storing study materials:[/bold red] {e}")
+
+    try:
+        with metrics.span("history.log_session"):
+            if _committer is not None:
+                _committer.submit(session_entry)
+            else:
+                _write_sessions([session_entry])
+    except Exception as e:
+        console.print(f"[bold red]Error saving history:[/bold red] {e}")
+
 
-    history.insert(0, session_entry)
-    save_history(history)
+def load_materials(session: dict) -> Optional[str]:
+    """The full materials of a logged session from the blob store (no network call).
+
+    None when the session predates the store or its blob is missing.
+    """
+    digest = session.get("material_hash")
+    return get_blobs().get(digest) if digest else None
 
 
 def get_last_sessions(limit: int = 5) -> None:
-    history = load_history()
-    if not history:
+    try:
+        with metrics.span("history.latest"):
+            recent_sessions = get_backend().latest(limit)
+    except Exception as e:
+        console.print(f"[bold red]Error loading history:[/bold red] {e}")
+        recent_sessions = []
+    if not recent_sessions:
         console.print("\n[bold yellow]No past sessions found in history.[/bold yellow]")
         return
 
-    recent_sessions = history[:limit]
-
     console.print(
         Panel(f"[bold blue]--- Last {len(recent_sessions)} Study Sessions ---[/bold blue]", border_style="blue")
     )
 
     for i, session in enumerate(recent_sessions, 1):
-        console.print(
-            Panel(
-                (
-                    f"[bold cyan]Subject:[/bold cyan] {session.get('subject', 'N/A')}\n"
-                    f"[bold cyan]Method:[/bold cyan] {session.get('method', 'N/A')}\n"
-                    f"[bold cyan]Energy/Time:[/bold cyan] {session.get('state', 'N/A')} state, {session.get('minutes', 'N/A')} min\n"
-                    f"[dim]Timestamp:[/dim] {session.get('timestamp', 'N/A')} (Source: {session.get('source', 'N/A')})\n"
-                    f"[dim]Material Preview:[/dim] {session.get('material_preview', 'N/A')}"
-                ),
-                title=f"[bold]Session {i}[/bold]",
-                border_style="blue",
-            )
-        )
+        console.print(session_panel(session, i))
@@ -0,0 +1,264 @@
+"""Interactive, paged browser for the session history.
+
+Instead of printing a Panel for every session, `browse_history` shows one
+compact table page at a time. `HistoryPager` pulls records lazily from the
+storage backend (newest first, via `iter_between`), so showing a page reads
+only that page's records (plus whatever the filters skip), however large the
+history is. Pages already seen are kept, so paging back costs nothing.
+Sessions whose full materials are in the blob store can be re-opened
+offline.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.prompt import Prompt
+from rich.table import Table
+
+from src.storage import HistoryBackend
+
+console = Console()
+
+DEFAULT_PAGE_SIZE = 10
+PREVIEW_CHARS = 40
+DATE_FORMAT = "%Y-%m-%d"
+
+
+@dataclass
+class HistoryFilter:
+    """Which sessions to show. Blank fields match everything.
+
+    `name` and `method` match case-insensitively; `subject` matches any
+    subject containing the text. `start`/`end` are inclusive ``YYYY-MM-DD`` dates.
+    """
+
+    name: Optional[str] = None
+    subject: Optional[str] = None
+    method: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return any((self.name, self.subject, self.method, self.start, self.end))
+
+    @property
+    def time_range(self) -> tuple:
+        """(start, end) timestamp bounds for `HistoryBackend.iter_between`."""
+        return (
+            f"{self.start} 00:00:00" if self.start else None,
+            f"{self.end} 23:59:59" if self.end else None,
+        )
+
+    def matches(self, record: dict) -> bool:
+        if self.name and str(record.get("name") or "").casefold() != self.name.casefold():
+            return False
+        if self.method and str(record.get("method") or "").casefold() != self.method.casefold():
+            return False
+        if self.subject and self.subject.casefold() not in str(record.get("subject") or "").casefold():
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = [f"{label}={value}" for label, value in (
+            ("name", self.name), ("subject", self.subject), ("method", self.method),
+            ("from", self.start), ("to", self.end),
+        ) if value]
+        return ", ".join(parts) or "none"
+
+
+class HistoryPager:
+    """Newest-first pages of (optionally filtered) history, read on demand."""
+
+    def __init__(self, backend: HistoryBackend, page_size: int = DEFAULT_PAGE_SIZE, filters: Optional[HistoryFilter] = None) -> None:
+        self.backend = backend
+        self.page_size = max(1, page_size)
+        self.filters = filters or HistoryFilter()
+        start, end = self.filters.time_range
+        self._source: Iterator[dict] = (r for r in backend.iter_between(start, end) if self.filters.matches(r))
+        self._pages: List[List[dict]] = []
+        self._exhausted = False
+
+    def _fill(self, index: int) -> None:
+        while len(self._pages) <= index and not self._exhausted:
+            page = []
+            for record in self._source:
+                page.append(record)
+                if len(page) >= self.page_size:
+                    break
+            if len(page) < self.page_size:
+                self._exhausted = True
+            if page:
+                self._pages.append(page)
+
+    def page(self, index: int) -> List[dict]:
+        """Records on page `index` (0-based); empty past the end."""
+        if index < 0:
+            return []
+        self._fill(index)
+        return self._pages[index] if index < len(self._pages) else []
+
+    def has_page(self, index: int) -> bool:
+        return bool(self.page(index))
+
+    def total_pages(self) -> Optional[int]:
+        """Page count if it is known without a scan (no filters, or all pages read)."""
+        if not self.filters.active:
+            return math.ceil(self.backend.count() / self.page_size)
+        if self._exhausted:
+            return len(self._pages)
+        return None
+
+
+def _preview(text: Optional[str]) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= PREVIEW_CHARS else text[: PREVIEW_CHARS - 1] + "…"
+
+
+def render_page(rows: List[dict], index: int, page_size: int, total_pages: Optional[int], filters: HistoryFilter) -> Table:
+    """One page of sessions as a compact table."""
+    of = f" of {total_pages}" if total_pages is not None else ""
+    table = Table(
+        title=f"Past Study Sessions - page {index + 1}{of}",
+        caption=f"Filters: {filters.describe()}",
+        show_header=True,
+        header_style="bold magenta",
+    )
+    table.add_column("#", justify="right", style="dim")
+    table.add_column("When", style="cyan", no_wrap=True)
+    table.add_column("Name")
+    table.add_column("Subject", style="green")
+    table.add_column("Method")
+    table.add_column("State")
+    table.add_column("Min", justify="right")
+    table.add_column("Preview", style="dim", overflow="ellipsis", no_wrap=True)
+    for offset, session in enumerate(rows, 1):
+        table.add_row(
+            str(index * page_size + offset),
+            str(session.get("timestamp", "N/A"))[:16],
+            str(session.get("name", "N/A")),
+            str(session.get("subject", "N/A")),
+            str(session.get("method", "N/A")),
+            str(session.get("state", "N/A")),
+            str(session.get("minutes", "N/A")),
+            _preview(session.get("material_preview")),
+        )
+    return table
+
+
+def session_panel(session: dict, number: int) -> Panel:
+    """The detailed view of one session (also used by `get_last_sessions`)."""
+    stored = "\n[dim]Full materials saved - re-open them from the history browser.[/dim]" if session.get("material_hash") else ""
+    return Panel(
+        (
+            f"[bold cyan]Subject:[/bold cyan] {session.get('subject', 'N/A')}\n"
+            f"[bold cyan]Method:[/bold cyan] {session.get('method', 'N/A')}\n"
+            f"[bold cyan]Energy/Time:[/bold cyan] {session.get('state', 'N/A')} state, {session.get('minutes', 'N/A')} min\n"
+            f"[dim]Timestamp:[/dim] {session.get('timestamp', 'N/A')} (Source: {session.get('source', 'N/A')})\n"
+            f"[dim]Material Preview:[/dim] {session.get('material_preview', 'N/A')}"
+            f"{stored}"
+        ),
+        title=f"[bold]Session {number}[/bold]",
+        border_style="blue",
+    )
+
+
+def show_stored_materials(text: str, subject: str) -> None:
+    from rich.markdown import Markdown
+
+    console.print(Panel(Markdown(text), title=f"[bold green]Saved Study Materials for {subject}[/bold green]", border_style="blue"))
+
+
+def reopen_materials(session: dict, show: Callable[[str, str], None] = show_stored_materials) -> bool:
+    """Show a past session's full materials from the blob store. False if none were saved."""
+    from src.history import load_materials
+
+    text = load_materials(session)
+    if text is None:
+        return False
+    show(text, str(session.get("subject", "")))
+    return True
+
+
+def _ask_date(label: str, ask: Callable[..., str]) -> Optional[str]:
+    while True:
+        text = ask(f"{label} date (YYYY-MM-DD, blank for any)", default="").strip()
+        if not text:
+            return None
+        try:
+            datetime.strptime(text, DATE_FORMAT)
+            return text
+        except ValueError:
+            console.print("[bold red]Please use the YYYY-MM-DD format.[/bold red]")
+
+
+def ask_filters(ask: Callable[..., str] = Prompt.ask) -> HistoryFilter:
+    """Prompt for each filter field (blank answers leave it unset)."""
+    return HistoryFilter(
+        name=ask("Name (blank for any)", default="").strip() or None,
+        subject=ask("Subject contains (blank for any)", default="").strip() or None,
+        method=ask("Method (blank for any)", default="").strip() or None,
+        start=_ask_date("From", ask),
+        end=_ask_date("To", ask),
+    )
+
+
+def browse_history(
+    backend: Optional[HistoryBackend] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    ask: Callable[..., str] = Prompt.ask,
+    show_materials: Callable[[str, str], None] = show_stored_materials,
+) -> None:
+    """Interactive pager: n/p to move, f to filter, c to clear filters, v N to view one session,
+    o N to re-open its saved materials, q to quit."""
+    if backend is None:
+        from src.history import get_backend
+
+        backend = get_backend()
+    filters = HistoryFilter()
+    pager = HistoryPager(backend, page_size, filters)
+    index = 0
+    while True:
+        rows = pager.page(index)
+        if not rows:
+            if index == 0:
+                console.print("\n[bold yellow]No past sessions match.[/bold yellow]" if filters.active else "\n[bold yellow]No past sessions found in history.[/bold yellow]")
+                if not filters.active:
+                    return
+            else:
+                index -= 1
+                continue
+        else:
+            console.print(render_page(rows, index, pager.page_size, pager.total_pages(), filters))
+
+        command = ask("[n]ext, [p]revious, [f]ilter, [c]lear filters, [v N] view session, [o N] open materials, [q]uit", default="n" if pager.has_page(index + 1) else "q").strip().lower()
+        if command in ("q", "quit"):
+            return
+        if command in ("n", "next", ""):
+            if pager.has_page(index + 1):
+                index += 1
+            else:
+                console.print("[dim]That was the last page.[/dim]")
+        elif command in ("p", "prev", "previous"):
+            index = max(0, index - 1)
+        elif command == "f":
+            filters = ask_filters(ask)
+            pager, index = HistoryPager(backend, page_size, filters), 0
+        elif command == "c":
+            filters = HistoryFilter()
+            pager, index = HistoryPager(backend, page_size, filters), 0
+        elif command[:1] in ("v", "o"):
+            number = command[1:].strip()
+            start = index * pager.page_size
+            if not (number.isdigit() and start < int(number) <= start + len(rows)):
+                console.print(f"[bold red]Enter '{command[0]}' followed by a number shown on this page ({start + 1}-{start + len(rows)}).[/bold red]")
+            elif command[0] == "v":
+                console.print(session_panel(rows[int(number) - start - 1], int(number)))
+            elif not reopen_materials(rows[int(number) - start - 1], show_materials):
+                console.print("[bold yellow]Only a preview was saved for that session.[/bold yellow]")
+        else:
+            console.print("[bold red]Unknown command.[/bold red]")
@@ -0,0 +1,354 @@
+"""Streaming export and import of the session history.
+
+Every stage is a generator, so memory stays flat however many sessions
+there are:
+
+* `export_history` reads records from the history store, narrowed by a
+  `HistoryFilter` (the date range is pushed down to
+  `HistoryBackend.iter_between`, so the segmented store never opens segments
+  outside it), keeps only the requested fields, and writes NDJSON, CSV or a
+  JSON array in chunks;
+* `read_records` reads those formats back: NDJSON and CSV line by line, and
+  the legacy ``session_history.json`` array with `iter_json_array`, an
+  incremental parser that holds one record at a time instead of the whole
+  array;
+* `import_history` applies the same filter and projection, orders the
+  records oldest first with an external merge sort (sorted runs spilled to
+  temporary files), and merges them into the store by timestamp in one
+  streamed pass (the ``ndjson`` log is rewritten at most once, through a
+  temporary file), updating the statistics and the subject index a chunk
+  at a time as it goes.
+
+Typical run commands:
+    python -m src.history_io export sessions.ndjson --from 2024-01-01 --name Ana
+    python -m src.history_io export lab.csv --fields timestamp,name,subject,minutes
+    python -m src.history_io import old/session_history.json
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import sys
+import tempfile
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+
+from rich.console import Console
+
+from src import metrics
+from src.history_browser import HistoryFilter
+from src.storage import HistoryBackend
+
+console = Console()
+
+FORMATS = ("ndjson", "csv", "json")
+HISTORY_FIELDS = (
+    "timestamp", "name", "subject", "method", "state", "minutes", "source", "material_preview", "material_hash",
+)
+CHUNK_RECORDS = 500
+READ_CHUNK_CHARS = 1 << 16
+SORT_RUN_RECORDS = 10_000
+
+_EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".json": "json"}
+
+
+def format_for(path: str, fmt: Optional[str] = None) -> str:
+    """The explicit `fmt`, else the one implied by the file extension (NDJSON by default)."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+        return fmt
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), "ndjson")
+
+
+def project(records: Iterable[dict], fields: Optional[Sequence[str]]) -> Iterator[dict]:
+    """Keep only `fields` of each record (all of them when `fields` is empty)."""
+    if not fields:
+        yield from records
+        return
+    for record in records:
+        yield {field: record[field] for field in fields if field in record}
+
+
+def select(records: Iterable[dict], filters: Optional[HistoryFilter]) -> Iterator[dict]:
+    """Records that pass `filters` (its date range included)."""
+    if filters is None or not filters.active:
+        yield from records
+        return
+    start, end = filters.time_range
+    for record in records:
+        ts = record.get("timestamp") or ""
+        if (start is None or ts >= start) and (end is None or ts <= end) and filters.matches(record):
+            yield record
+
+
+#================================READING=====================================
+
+def iter_json_array(stream: IO[str], chunk_chars: int = READ_CHUNK_CHARS) -> Iterator:
+    """Yield the elements of a top-level JSON array read from `stream` in chunks.
+
+    Only the element being decoded (plus one chunk) is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_chars)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return not eof
+
+    def skip_space() -> Optional[str]:
+        """The next non-whitespace character (not consumed), or None at end of input."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    if skip_space() != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    if skip_space() == "]":
+        return
+    while True:
+        if skip_space() is None:
+            raise ValueError("unexpected end of JSON array")
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof or not fill():
+                raise
+            continue
+        if end == len(buffer) and not eof:  # a number might continue in the next chunk
+            fill()
+            continue
+        pos = end
+        yield value
+        separator = skip_space()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or ']' in JSON array, found {separator!r}")
+        pos += 1
+
+
+def _iter_ndjson(stream: IO[str]) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _iter_csv(stream: IO[str]) -> Iterator[dict]:
+    for row in csv.DictReader(stream):
+        record = {key: value for key, value in row.items() if key and value not in ("", None)}
+        minutes = record.get("minutes")
+        if isinstance(minutes, str) and minutes.lstrip("-").isdigit():
+            record["minutes"] = int(minutes)
+        yield record
+
+
+def read_records(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """Stream session records from an NDJSON, CSV or JSON-array file (non-objects are skipped)."""
+    readers = {"ndjson": _iter_ndjson, "csv": _iter_csv, "json": iter_json_array}
+    for record in readers[fmt](stream):
+        if isinstance(record, dict):
+            yield record
+
+
+#================================WRITING=====================================
+
+def write_records(
+    records: Iterable[dict],
+    out: IO[str],
+    fmt: str,
+    fields: Optional[Sequence[str]] = None,
+    chunk_records: int = CHUNK_RECORDS,
+) -> int:
+    """Write `records` to `out`, `chunk_records` at a time. Returns how many were written.
+
+    CSV columns are `fields`, or the standard history fields.
+    """
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=list(fields or HISTORY_FIELDS), extrasaction="ignore")
+        writer.writeheader()
+    elif fmt == "json":
+        buffer.write("[")
+
+    count = 0
+    for record in records:
+        if fmt == "csv":
+            writer.writerow(record)
+        else:
+            if fmt == "json":
+                buffer.write(",\n" if count else "\n")
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            if fmt == "ndjson":
+                buffer.write("\n")
+        count += 1
+        if count % chunk_records == 0:
+            out.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+    if fmt == "json":
+        buffer.write("\n]\n" if count else "]\n")
+    out.write(buffer.getvalue())
+    return count
+
+
+def export_history(
+    path: str,
+    fmt: Optional[str] = None,
+    filters: Optional[HistoryFilter] = None,
+    fields: Optional[Sequence[str]] = None,
+    backend: Optional[HistoryBackend] = None,
+) -> int:
+    """Export the matching sessions (newest first) to `path` ("-" for stdout).
+
+    A file is written under a temporary name and renamed into place when
+    complete. Returns the number of sessions written.
+    """
+    if backend is None:
+        from src.history import get_backend
+
+        backend = get_backend()
+    fmt = format_for(path, fmt)
+    filters = filters or HistoryFilter()
+    start, end = filters.time_range
+    records = project((r for r in backend.iter_between(start, end) if filters.matches(r)), fields)
+
+    with metrics.span("history.export"):
+        if path == "-":
+            count = write_records(records, sys.stdout, fmt, fields)
+        else:
+            tmp = f"{path}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8", newline="") as out:
+                    count = write_records(records, out, fmt, fields)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+    metrics.incr("history_exported", count)
+    return count
+
+
+#================================IMPORTING===================================
+
+def _timestamp(record: dict) -> str:
+    return str(record.get("timestamp") or "")
+
+
+def oldest_first(records: Iterable[dict], run_records: int = SORT_RUN_RECORDS) -> Iterator[dict]:
+    """`records` sorted by timestamp (stable), holding at most `run_records` in memory.
+
+    Inputs larger than one run are spilled as sorted NDJSON runs to a
+    temporary directory and merged back.
+    """
+    run: List[dict] = []
+    source = iter(records)
+    for record in source:
+        run.append(record)
+        if len(run) >= run_records:
+            break
+    else:
+        run.sort(key=_timestamp)
+        yield from run
+        return
+
+    with tempfile.TemporaryDirectory(prefix="study_buddy_import_") as directory:
+        paths: List[str] = []
+
+        def spill() -> None:
+            run.sort(key=_timestamp)
+            path = os.path.join(directory, f"run-{len(paths):05d}.ndjson")
+            with open(path, "w", encoding="utf-8") as f:
+                write_records(run, f, "ndjson")
+            paths.append(path)
+            run.clear()
+
+        spill()
+        for record in source:
+            run.append(record)
+            if len(run) >= run_records:
+                spill()
+        if run:
+            spill()
+
+        handles = [open(path, "r", encoding="utf-8") for path in paths]
+        try:
+            yield from heapq.merge(*(_iter_ndjson(f) for f in handles), key=_timestamp)
+        finally:
+            for f in handles:
+                f.close()
+
+
+def import_history(
+    path: str,
+    fmt: Optional[str] = None,
+    filters: Optional[HistoryFilter] = None,
+    fields: Optional[Sequence[str]] = None,
+    chunk_records: int = CHUNK_RECORDS,
+    run_records: int = SORT_RUN_RECORDS,
+) -> int:
+    """Add the matching sessions in `path` to the history store. Returns how many.
+
+    Records are merged into what is already stored by timestamp, so older
+    sessions never become the latest ones; importing the same file twice
+    stores its sessions twice.
+    """
+    from src.history import import_sessions
+
+    fmt = format_for(path, fmt)
+    with metrics.span("history.import"), open(path, "r", encoding="utf-8", newline="") as stream:
+        records = project(select(read_records(stream, fmt), filters), fields)
+        count = import_sessions(oldest_first(records, run_records), chunk_records)
+    metrics.incr("history_imported", count)
+    return count
+
+
+#==================================CLI=======================================
+
+def _filters(args: argparse.Namespace) -> HistoryFilter:
+    return HistoryFilter(name=args.name, subject=args.subject, method=args.method, start=args.start, end=args.end)
+
+
+def _fields(value: Optional[str]) -> Optional[List[str]]:
+    return [f.strip() for f in value.split(",") if f.strip()] if value else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export or import the session history without loading it all into memory.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write sessions to an NDJSON, CSV or JSON file ('-' for stdout).")
+    export.add_argument("path")
+    imports = sub.add_parser("import", help="Add the sessions in an NDJSON, CSV or JSON-array file to the history.")
+    imports.add_argument("path")
+    for command in (export, imports):
+        command.add_argument("--format", choices=FORMATS, default=None, help="File format (default: from the extension).")
+        command.add_argument("--from", dest="start", metavar="YYYY-MM-DD", default=None, help="Only sessions on or after this date.")
+        command.add_argument("--to", dest="end", metavar="YYYY-MM-DD", default=None, help="Only sessions on or before this date.")
+        command.add_argument("--name", default=None, help="Only this user's sessions.")
+        command.add_argument("--subject", default=None, help="Only subjects containing this text.")
+        command.add_argument("--method", default=None, help="Only this study method.")
+        command.add_argument("--fields", default=None, help="Comma-separated fields to keep (default: all).")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        count = export_history(args.path, args.format, _filters(args), _fields(args.fields))
+        if args.path != "-":
+            console.print(f"[bold green]Exported {count} sessions to {args.path}.[/bold green]")
+        return
+    count = import_history(args.path, args.format, _filters(args), _fields(args.fields))
+    console.print(f"[bold green]Imported {count} sessions from {args.path}.[/bold green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""LLM backends for study-material generation.
+
+`src.generation` talks to an `LLMBackend` rather than to the Gemini SDK
+directly, so the same code paths (CLI, streaming, batch, prefetch,
+benchmarks) can run against:
+
+* `GeminiBackend` - the real Gemini API via a ``google.genai`` client;
+* `RecordingBackend` - wraps another backend and appends every
+  prompt -> response pair (with its latency) to an NDJSON cassette;
+* `ReplayBackend` - answers from a cassette, or from the existing
+  ``study_log.json``, with configurable latency and error distributions, so
+  load tests and CI exercise realistic concurrency without network access.
+
+The CLI picks one with ``STUDY_BUDDY_LLM_BACKEND`` (``gemini``, ``record``
+or ``replay``); see `open_llm_backend`.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from src.cache import cache_key, is_cacheable
+from src.durable import append_durable
+
+LLM_BACKEND_ENV_VAR = "STUDY_BUDDY_LLM_BACKEND"
+CASSETTE_ENV_VAR = "STUDY_BUDDY_CASSETTE"
+LATENCY_ENV_VAR = "STUDY_BUDDY_REPLAY_LATENCY_MS"
+ERROR_RATE_ENV_VAR = "STUDY_BUDDY_REPLAY_ERROR_RATE"
+DEFAULT_LLM_BACKEND = "gemini"
+DEFAULT_CASSETTE = "llm_cassette.ndjson"
+STUDY_LOG_FILE = "study_log.json"
+
+_METHOD_RE = re.compile(r"^Method:\s*(.+)$", re.MULTILINE)
+
+
+class LLMBackend:
+    """Interface every generation backend implements."""
+
+    name = "base"
+
+    async def admit(self, prompt: str) -> None:
+        """Wait until `prompt` may be sent (rate limiting); most backends never wait.
+
+        Callers await this outside their per-request timeout, so time spent
+        queued is not mistaken for a slow response.
+        """
+
+    async def generate(self, prompt: str, model: str, config: Optional[dict] = None) -> str:
+        """Return the full response text for `prompt`.
+
+        `config` holds generation settings (JSON mode, response schema,
+        output token limit; see `src.materials`) for backends that honour them.
+        """
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, model: str, config: Optional[dict] = None) -> AsyncIterator[str]:
+        """Yield the response in chunks (by default, all at once)."""
+        yield await self.generate(prompt, model, config)
+
+
+class GeminiBackend(LLMBackend):
+    """The Gemini API through a ``google.genai`` client.
+
+    Pass the client itself, or a `client_factory` that returns it so the
+    client can be built lazily (and swapped in tests).
+    """
+
+    name = "gemini"
+
+    def __init__(self, client: Any = None, client_factory: Optional[Callable[[], Any]] = None) -> None:
+        self._client = client
+        self._client_factory = client_factory
+
+    @property
+    def client(self) -> Any:
+        client = self._client if self._client is not None else (self._client_factory() if self._client_factory else None)
+        if client is None:
+            raise RuntimeError("API Client not initialized. Check API Key.")
+        return client
+
+    async def generate(self, prompt: str, model: str, config: Optional[dict] = None) -> str:
+        extra = {"config": config} if config is not None else {}
+        response = await self.client.aio.models.generate_content(model=model, contents=prompt, **extra)
+        return response.text
+
+    async def stream(self, prompt: str, model: str, config: Optional[dict] = None) -> AsyncIterator[str]:
+        extra = {"config": config} if config is not None else {}
+        stream = await self.client.aio.models.generate_content_stream(model=model, contents=prompt, **extra)
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+def as_backend(client: Any) -> LLMBackend:
+    """Accept either an `LLMBackend` or a raw genai client."""
+    return client if isinstance(client, LLMBackend) else GeminiBackend(client)
+
+
+#============================RECORD==========================================
+
+class RecordingBackend(LLMBackend):
+    """Pass requests through to `inner` and append each exchange to a cassette."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, cassette_path: str = DEFAULT_CASSETTE) -> None:
+        self.inner = inner
+        self.cassette_path = cassette_path
+
+    def _record(self, prompt: str, model: str, response: str, latency: float) -> None:
+        line = {"prompt": prompt, "model": model, "response": response, "latency_ms": round(latency * 1000, 1)}
+        append_durable(self.cassette_path, (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def admit(self, prompt: str) -> None:
+        await self.inner.admit(prompt)
+
+    async def generate(self, prompt: str, model: str, config: Optional[dict] = None) -> str:
+        started = time.perf_counter()
+        text = await self.inner.generate(prompt, model, config)
+        self._record(prompt, model, text, time.perf_counter() - started)
+        return text
+
+    async def stream(self, prompt: str, model: str, config: Optional[dict] = None) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        parts = []
+        async for chunk in self.inner.stream(prompt, model, config):
+            parts.append(chunk)
+            yield chunk
+        self._record(prompt, model, "".join(parts), time.perf_counter() - started)
+
+
+#============================REPLAY==========================================
+
+class SimulatedAPIError(Exception):
+    """An injected API failure. `code` is the HTTP status it imitates."""
+
+    def __init__(self, code: int) -> None:
+        super().__init__(f"simulated API error {code}")
+        self.code = code
+
+
+@dataclass
+class LatencyModel:
+    """Response-time distribution for `ReplayBackend`.
+
+    ``kind`` is ``fixed`` (always `median_ms`), ``uniform`` (0.5x-1.5x the
+    median), ``lognormal`` (median `median_ms`, spread `sigma`) or
+    ``recorded`` (each cassette entry's own latency, falling back to lognormal).
+    """
+
+    kind: str = "lognormal"
+    median_ms: float = 800.0
+    sigma: float = 0.5
+
+    def sample(self, rng: random.Random, recorded_ms: Optional[float] = None) -> float:
+        """Seconds to wait before answering."""
+        if self.kind == "recorded" and recorded_ms is not None:
+            return recorded_ms / 1000
+        if self.kind == "fixed":
+            return self.median_ms / 1000
+        if self.kind == "uniform":
+            return rng.uniform(0.5, 1.5) * self.median_ms / 1000
+        return rng.lognormvariate(0, self.sigma) * self.median_ms / 1000
+
+
+@dataclass
+class ErrorModel:
+    """Failure injection for `ReplayBackend`.
+
+    With probability `error_rate` a request fails with one of `codes`
+    (weighted); with probability `timeout_rate` it hangs for `hang_seconds`
+    so callers' timeouts fire.
+    """
+
+    error_rate: float = 0.0
+    codes: Dict[int, float] = field(default_factory=lambda: {429: 0.5, 503: 0.4, 500: 0.1})
+    timeout_rate: float = 0.0
+    hang_seconds: float = 3600.0
+
+
+def load_cassette(path: str) -> List[dict]:
+    """Read a cassette written by `RecordingBackend` (one JSON object per line)."""
+    entries = []
+    with open(path, "rb") as f:
+        for line in f:
+            if line.endswith(b"\n") and line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def entries_from_study_log(
+    build_prompt: Callable[[str, str, str], str], path: str = STUDY_LOG_FILE, model: str = ""
+) -> List[dict]:
+    """Turn ``study_log.json`` records into cassette entries using the app's prompt builder.
+
+    Logged fallback/error messages are skipped, like they are for the cache.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    return [
+        {
+            "prompt": build_prompt(r.get("name", ""), r.get("method", ""), r.get("subject", "")),
+            "model": model,
+            "response": r["content"],
+        }
+        for r in records
+        if r.get("content") and is_cacheable(r["content"])
+    ]
+
+
+class ReplayBackend(LLMBackend):
+    """Answers from recorded exchanges with simulated latency and failures.
+
+    Prompts are matched exactly (per model when the entry records one). With
+    `fallback`, an unknown prompt gets a deterministic pick among entries for
+    the same study method, or among all entries, so synthetic load works too.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        entries: Iterable[dict],
+        latency: Optional[LatencyModel] = None,
+        errors: Optional[ErrorModel] = None,
+        fallback: bool = True,
+        seed: Optional[int] = None,
+        chunk_chars: int = 80,
+        sleep: Callable[[float], Any] = asyncio.sleep,
+    ) -> None:
+        self.entries = list(entries)
+        self.latency = latency or LatencyModel()
+        self.errors = errors or ErrorModel()
+        self.fallback = fallback
+        self.chunk_chars = chunk_chars
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._exact: Dict[str, dict] = {}
+        self._by_method: Dict[str, List[dict]] = {}
+        for entry in self.entries:
+            self._exact[cache_key(entry["prompt"], entry.get("model") or "")] = entry
+            method = _METHOD_RE.search(entry["prompt"])
+            if method:
+                self._by_method.setdefault(method.group(1).strip().lower(), []).append(entry)
+        self.calls = 0
+
+    def lookup(self, prompt: str, model: str) -> Optional[dict]:
+        entry = self._exact.get(cache_key(prompt, model)) or self._exact.get(cache_key(prompt, ""))
+        if entry is not None or not self.fallback or not self.entries:
+            return entry
+        method = _METHOD_RE.search(prompt)
+        pool = self._by_method.get(method.group(1).strip().lower(), []) if method else []
+        pool = pool or self.entries
+        return pool[int(cache_key(prompt, model)[:8], 16) % len(pool)]
+
+    async def _respond(self, prompt: str, model: str) -> dict:
+        self.calls += 1
+        entry = self.lookup(prompt, model)
+        roll = self._rng.random()
+        if roll < self.errors.timeout_rate:
+            await self._sleep(self.errors.hang_seconds)
+        delay = self.latency.sample(self._rng, entry.get("latency_ms") if entry else None)
+        if roll < self.errors.timeout_rate + self.errors.error_rate:
+            await self._sleep(delay * self._rng.random())
+            codes = list(self.errors.codes)
+            raise SimulatedAPIError(self._rng.choices(codes, weights=[self.errors.codes[c] for c in codes])[0])
+        if entry is None:
+            await self._sleep(delay)
+            raise SimulatedAPIError(404)
+        return {"entry": entry, "delay": delay}
+
+    async def generate(self, prompt: str, model: str, config: Optional[dict] = None) -> str:
+        response = await self._respond(prompt, model)
+        await self._sleep(response["delay"])
+        return response["entry"]["response"]
+
+    async def stream(self, prompt: str, model: str, config: Optional[dict] = None) -> AsyncIterator[str]:
+        response = await self._respond(prompt, model)
+        text = response["entry"]["response"]
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        # Spend about a third of the latency before the first chunk, the rest spread over the others.
+        await self._sleep(response["delay"] / 3)
+        per_chunk = response["delay"] * 2 / 3 / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await self._sleep(per_chunk)
+            yield chunk
+
+
+#============================CONFIGURATION===================================
+
+def open_llm_backend(
+    name: Optional[str] = None,
+    client_factory: Optional[Callable[[], Any]] = None,
+    build_prompt: Optional[Callable[[str, str, str], str]] = None,
+    cassette_path: Optional[str] = None,
+) -> LLMBackend:
+    """Build the configured backend (``STUDY_BUDDY_LLM_BACKEND``, default gemini).
+
+    ``replay`` reads the cassette (``STUDY_BUDDY_CASSETTE``) when it exists,
+    otherwise seeds from ``study_log.json`` via `build_prompt`. Its latency
+    median and error rate come from ``STUDY_BUDDY_REPLAY_LATENCY_MS`` and
+    ``STUDY_BUDDY_REPLAY_ERROR_RATE``. The live backends (gemini, record)
+    are rate limited when ``STUDY_BUDDY_RPM``/``STUDY_BUDDY_TPM`` set a budget (off by default).
+    """
+    name = (name or os.getenv(LLM_BACKEND_ENV_VAR) or DEFAULT_LLM_BACKEND).strip().lower()
+    cassette_path = cassette_path or os.getenv(CASSETTE_ENV_VAR) or DEFAULT_CASSETTE
+    if name == "gemini":
+        return _rate_limited(GeminiBackend(client_factory=client_factory))
+    if name == "record":
+        return RecordingBackend(_rate_limited(GeminiBackend(client_factory=client_factory)), cassette_path)
+    if name == "replay":
+        if os.path.exists(cassette_path):
+            entries = load_cassette(cassette_path)
+        elif build_prompt is not None and os.path.exists(STUDY_LOG_FILE):
+            entries = entries_from_study_log(build_prompt)
+        else:
+            entries = []
+        latency_ms = os.getenv(LATENCY_ENV_VAR)
+        error_rate = os.getenv(ERROR_RATE_ENV_VAR)
+        return ReplayBackend(
+            entries,
+            latency=LatencyModel(median_ms=float(latency_ms)) if latency_ms else None,
+            errors=ErrorModel(error_rate=float(error_rate)) if error_rate else None,
+        )
+    raise ValueError(f"Unknown LLM backend '{name}'. Choose from: gemini, record, replay")
+
+
+def _rate_limited(backend: LLMBackend) -> LLMBackend:
+    """Share the API quota with other processes (`src.ratelimit`); replay needs no limit."""
+    from src.ratelimit import RateLimitedBackend, limiter_from_env
+
+    limiter = limiter_from_env()
+    return RateLimitedBackend(backend, limiter) if limiter is not None else backend
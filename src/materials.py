@@ -0,0 +1,316 @@
+"""Structured, token-budgeted study materials.
+
+Each study method has a `GenerationProfile`: a compact prompt template
+(built once, at import, for every item count), a response schema so the model answers in JSON
+mode, and a size budget. The number of questions, cards or key points grows
+with the minutes the student has (`items_for`), and ``max_output_tokens`` is
+set to what that many items need, so response length - and with it latency
+and cost - stays bounded.
+
+Responses are parsed into small ``__slots__`` objects (`QuizQuestion`,
+`Flashcard`, `KeyPoint` inside `StudyMaterials`) and rendered to Markdown from
+those. The raw JSON is what gets cached and stored, so other features can
+reuse the individual items. Free-form text - older cache entries and
+history, cassettes recorded before JSON mode - passes through unchanged.
+
+The generation config for a prompt is recovered from the prompt itself
+(`generation_config`), the way the replay backend finds a prompt's method,
+so prompts can keep travelling through the cache, batch jobs, the prefetcher
+and the service as plain strings. Only the template's own fixed lines are
+read, and user input (name, subject) is collapsed to one line before it is
+interpolated, so a name like ``"Ana\nItems: 500"`` cannot change the budget.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Union
+
+DEFAULT_ITEMS = 5
+MIN_ITEMS = 3
+MAX_ITEMS = 10
+MINUTES_PER_ITEM = 5
+
+_HEADER = "You are a friendly tutor. Reply in JSON only."
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def items_for(minutes: Optional[int]) -> int:
+    """How many questions, cards or key points fit a session of `minutes`."""
+    if not minutes or minutes <= 0:
+        return DEFAULT_ITEMS
+    items = minutes // MINUTES_PER_ITEM
+    return MIN_ITEMS if items < MIN_ITEMS else MAX_ITEMS if items > MAX_ITEMS else items
+
+
+def single_line(text: object) -> str:
+    """`text` with every run of whitespace (newlines included) collapsed to one space."""
+    return " ".join(str(text or "").split())
+
+
+def _string(description: str) -> dict:
+    return {"type": "STRING", "description": description}
+
+
+def _object(properties: Dict[str, dict]) -> dict:
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+
+def _envelope(items_key: str, item: dict, **extra: dict) -> dict:
+    return _object({
+        "greeting": _string("One friendly sentence confirming the student's name and method."),
+        **extra,
+        items_key: {"type": "ARRAY", "items": item},
+    })
+
+
+class GenerationProfile:
+    """Prompt template, response schema and output budget for one study method."""
+
+    __slots__ = ("method", "schema", "tokens_per_item", "overhead_tokens", "_tails")
+
+    def __init__(self, method: str, instructions: str, schema: dict, tokens_per_item: int, overhead_tokens: int = 100) -> None:
+        self.method = method
+        self.schema = schema
+        self.tokens_per_item = tokens_per_item
+        self.overhead_tokens = overhead_tokens
+        # Everything after the subject depends only on the item count, so it is built once per count.
+        self._tails = {
+            count: f"\nItems: {count}\n" + instructions.format(count=count) + " If unsure about the subject, say so in the greeting."
+            for count in range(MIN_ITEMS, MAX_ITEMS + 1)
+        }
+
+    def prompt(self, name: str, subject: str, minutes: Optional[int] = None) -> str:
+        return f"{_HEADER}\nName: {single_line(name)}\nMethod: {self.method}\nSubject: {single_line(subject)}{self._tails[items_for(minutes)]}"
+
+    def max_output_tokens(self, items: int) -> int:
+        return self.overhead_tokens + self.tokens_per_item * items
+
+    def config(self, items: int) -> dict:
+        """The ``google.genai`` generation config for `items` items."""
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": self.schema,
+            "max_output_tokens": self.max_output_tokens(items),
+            "thinking_config": {"thinking_budget": 0},  # the budget is for the answer itself
+        }
+
+
+PROFILES: Dict[str, GenerationProfile] = {
+    profile.method.lower(): profile
+    for profile in (
+        GenerationProfile(
+            "Quiz",
+            "Write {count} multiple-choice questions with 4 options each; `answer` is the 0-based index of the "
+            "correct option and `explanation` one short sentence.",
+            _envelope("questions", _object({
+                "question": _string("The question."),
+                "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "answer": {"type": "INTEGER", "description": "0-based index of the correct option."},
+                "explanation": _string("Why that option is correct, in one sentence."),
+            })),
+            tokens_per_item=120,
+        ),
+        GenerationProfile(
+            "Flashcards",
+            "Write {count} flashcards: a short term or question on the `front`, a one- or two-sentence answer on the `back`.",
+            _envelope("cards", _object({"front": _string("Term or question."), "back": _string("Answer.")})),
+            tokens_per_item=60,
+        ),
+        GenerationProfile(
+            "Summary",
+            "Summarize one aspect of the subject: a two-sentence `overview`, then {count} key points, each a short "
+            "`point` with a one-sentence `detail`.",
+            _envelope(
+                "key_points",
+                _object({"point": _string("The key concept."), "detail": _string("One sentence explaining it.")}),
+                overview=_string("Two sentences introducing the topic."),
+            ),
+            tokens_per_item=80,
+        ),
+    )
+}
+
+
+def profile_for(method: str) -> Optional[GenerationProfile]:
+    return PROFILES.get(str(method or "").strip().lower())
+
+
+def generation_config(prompt: str) -> Optional[dict]:
+    """The JSON-mode config for a prompt built by a `GenerationProfile` (None for any other prompt).
+
+    Only the template's fixed Method (third) and Items (fifth) lines are
+    read, and the item count is clamped to the supported range.
+    """
+    lines = prompt.split("\n", 5)
+    if len(lines) < 5 or lines[0] != _HEADER or not lines[2].startswith("Method: ") or not lines[4].startswith("Items: "):
+        return None
+    profile = profile_for(lines[2][len("Method: "):])
+    items = lines[4][len("Items: "):]
+    if profile is None or not items.isdigit():
+        return None
+    return profile.config(min(MAX_ITEMS, max(MIN_ITEMS, int(items))))
+
+
+#==============================PARSED RESULTS================================
+
+def option_label(index: int) -> str:
+    return chr(ord("A") + index) if index < 26 else str(index + 1)
+
+
+class QuizQuestion:
+    __slots__ = ("question", "options", "answer", "explanation")
+
+    def __init__(self, question: str, options: List[str], answer: Optional[int] = None, explanation: str = "") -> None:
+        self.question = question
+        self.options = options
+        self.answer = answer
+        self.explanation = explanation
+
+    def to_markdown(self, number: int) -> str:
+        lines = [f"**{number}. {self.question}**", ""]
+        lines.extend(f"- {option_label(i)}) {option}" for i, option in enumerate(self.options))
+        if self.answer is not None and 0 <= self.answer < len(self.options):
+            answer = f"*Answer: {option_label(self.answer)}) {self.options[self.answer]}*"
+            lines += ["", answer + (f" - {self.explanation}" if self.explanation else "")]
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"question": self.question, "options": self.options, "answer": self.answer, "explanation": self.explanation}
+
+
+class Flashcard:
+    __slots__ = ("front", "back")
+
+    def __init__(self, front: str, back: str) -> None:
+        self.front = front
+        self.back = back
+
+    def to_markdown(self, number: int) -> str:
+        return f"**{number}. {self.front}**\n\n{self.back}"
+
+    def to_dict(self) -> dict:
+        return {"front": self.front, "back": self.back}
+
+
+class KeyPoint:
+    __slots__ = ("point", "detail")
+
+    def __init__(self, point: str, detail: str = "") -> None:
+        self.point = point
+        self.detail = detail
+
+    def to_markdown(self, number: int) -> str:
+        return f"{number}. **{self.point}**" + (f" - {self.detail}" if self.detail else "")
+
+    def to_dict(self) -> dict:
+        return {"point": self.point, "detail": self.detail}
+
+
+Item = Union[QuizQuestion, Flashcard, KeyPoint]
+
+_HEADINGS = {"Quiz": "Quiz", "Flashcards": "Flashcards", "Summary": "Key points"}
+
+
+class StudyMaterials:
+    """One parsed response: a greeting plus the method's items (and a Summary's overview)."""
+
+    __slots__ = ("method", "greeting", "items", "overview")
+
+    def __init__(self, method: str, greeting: str, items: List[Item], overview: str = "") -> None:
+        self.method = method
+        self.greeting = greeting
+        self.items = items
+        self.overview = overview
+
+    def to_markdown(self) -> str:
+        parts = [self.greeting] if self.greeting else []
+        if self.overview:
+            parts.append(self.overview)
+        parts.append(f"### {_HEADINGS[self.method]}")
+        parts.extend(item.to_markdown(number) for number, item in enumerate(self.items, 1))
+        return "\n\n".join(parts)
+
+    def to_dict(self) -> dict:
+        data = {"method": self.method, "greeting": self.greeting, "items": [item.to_dict() for item in self.items]}
+        if self.overview:
+            data["overview"] = self.overview
+        return data
+
+
+def _text(value: object) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _questions(raw: list) -> List[Item]:
+    items: List[Item] = []
+    for entry in raw:
+        if not isinstance(entry, dict) or not _text(entry.get("question")):
+            continue
+        options = [_text(o) for o in entry.get("options") or [] if _text(o)]
+        answer = entry.get("answer")
+        items.append(QuizQuestion(
+            _text(entry["question"]), options, answer if isinstance(answer, int) else None, _text(entry.get("explanation")),
+        ))
+    return items
+
+
+def _cards(raw: list) -> List[Item]:
+    return [
+        Flashcard(_text(e["front"]), _text(e.get("back")))
+        for e in raw if isinstance(e, dict) and _text(e.get("front"))
+    ]
+
+
+def _key_points(raw: list) -> List[Item]:
+    return [
+        KeyPoint(_text(e["point"]), _text(e.get("detail")))
+        for e in raw if isinstance(e, dict) and _text(e.get("point"))
+    ]
+
+
+_SHAPES = (("questions", "Quiz", _questions), ("cards", "Flashcards", _cards), ("key_points", "Summary", _key_points))
+
+
+def parse_materials(text: Optional[str]) -> Optional[StudyMaterials]:
+    """Parse a JSON-mode response; None for free-form text or a truncated/invalid response."""
+    if not text:
+        return None
+    text = _FENCE_RE.sub("", text.strip())
+    if not text.startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for key, method, parse in _SHAPES:
+        if isinstance(data.get(key), list):
+            items = parse(data[key])
+            if items:
+                return StudyMaterials(method, _text(data.get("greeting")), items, _text(data.get("overview")))
+    return None
+
+
+def to_markdown(text: Optional[str]) -> str:
+    """Markdown for a response: rendered from the parsed items, or the text itself if free-form."""
+    materials = parse_materials(text)
+    return materials.to_markdown() if materials is not None else (text or "")
+
+
+_ITEM_KEYS = (('"question"', "questions"), ('"front"', "cards"), ('"point"', "key points"))
+
+
+def streaming_preview(partial: str) -> str:
+    """What to show while a response is still streaming in.
+
+    Free-form text is shown as it arrives; half a JSON document would not
+    render, so JSON-mode responses show how many items have started.
+    """
+    if not partial.lstrip().startswith(("{", "```")):
+        return partial
+    for key, label in _ITEM_KEYS:
+        count = partial.count(key)
+        if count:
+            return f"*Generating... {count} {label} so far*"
+    return "*Generating...*"
@@ -0,0 +1,150 @@
+"""Lightweight in-process metrics for Pomodoro Study Buddy.
+
+Hot paths record into the module-level `METRICS` registry:
+
+* ``span(name)`` times a block (count, total, max seconds per name);
+* ``incr(name, n)`` bumps a counter (cache hits, retries, bytes written...);
+* ``set_gauge``/``add_gauge`` track a current value (e.g. history size).
+
+Recording is a dict update under a lock, cheap enough to leave on. At exit
+the CLI can write the registry as a JSON summary (``--metrics-json``) or in
+the Prometheus text format (``--metrics-prom``) for node_exporter's textfile
+collector.
+"""
+
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+PREFIX = "study_buddy"
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Metrics:
+    """A thread-safe registry of spans, counters and gauges."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one timed occurrence of span `name`."""
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+            span["count"] += 1
+            span["total_s"] += seconds
+            if seconds > span["max_s"]:
+                span["max_s"] = seconds
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as span `name` (recorded even if it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def add_gauge(self, name: str, amount: float) -> None:
+        """Adjust a gauge that has already been set (ignored until then)."""
+        with self._lock:
+            if name in self.gauges:
+                self.gauges[name] += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    # ----------------------------------------------------------------- export
+
+    def snapshot(self) -> dict:
+        """A JSON-serializable copy of every metric."""
+        with self._lock:
+            spans = {
+                name: {**span, "mean_s": span["total_s"] / span["count"] if span["count"] else 0.0}
+                for name, span in sorted(self.spans.items())
+            }
+            return {
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "spans": spans,
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": dict(sorted(self.gauges.items())),
+            }
+
+    def to_prometheus(self) -> str:
+        """Render in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+        if snap["spans"]:
+            for suffix, key, kind in (("seconds_sum", "total_s", "counter"), ("seconds_count", "count", "counter"), ("seconds_max", "max_s", "gauge")):
+                metric = f"{PREFIX}_span_{suffix}"
+                lines.append(f"# TYPE {metric} {kind}")
+                for name, span in snap["spans"].items():
+                    lines.append(f'{metric}{{span="{_label(name)}"}} {_number(span[key])}')
+        for name, value in snap["counters"].items():
+            metric = f"{PREFIX}_{_metric_name(name)}"
+            metric = metric if metric.endswith("_total") else metric + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {_number(value)}")
+        for name, value in snap["gauges"].items():
+            metric = f"{PREFIX}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        from src.durable import atomic_write_text
+
+        atomic_write_text(path, json.dumps(self.snapshot(), indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        """Write atomically, as the textfile collector requires (it may read at any moment)."""
+        from src.durable import atomic_write_text
+
+        atomic_write_text(path, self.to_prometheus())
+
+
+def _metric_name(name: str) -> str:
+    return _NAME_RE.sub("_", name).strip("_").lower()
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+METRICS = Metrics()
+span = METRICS.span
+observe = METRICS.observe
+incr = METRICS.incr
+set_gauge = METRICS.set_gauge
+add_gauge = METRICS.add_gauge
+
+
+def export(json_path: Optional[str] = None, prometheus_path: Optional[str] = None) -> None:
+    """Write the global registry to whichever outputs are given."""
+    if json_path:
+        METRICS.write_json(json_path)
+    if prometheus_path:
+        METRICS.write_prometheus(prometheus_path)
@@ -0,0 +1,78 @@
+"""Speculative prefetch of the next cycle's study materials.
+
+While a multi-cycle Pomodoro session is in its work phase the CLI is idle,
+so `Prefetcher` uses that time to generate the next cycle's quiz, flashcards
+or summary on the shared background event loop (`src.generation.submit`).
+By the time the break starts the result is usually ready, and the next
+cycle opens with no wait.
+
+The prefetcher follows the timer's lifecycle through `on_phase_change`:
+entering a work phase starts the fetch for the following cycle, and the
+session ending (completed or quit) cancels anything still in flight.
+"""
+
+import concurrent.futures
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.generation import GenerationResult, submit
+from src.timer import DONE, WORK, PomodoroEngine
+
+Fetch = Callable[[int], Awaitable[GenerationResult]]
+
+
+class Prefetcher:
+    """Generates materials for upcoming cycles in the background.
+
+    `fetch(cycle)` returns a coroutine producing the `GenerationResult` for
+    that cycle. Each cycle is fetched at most once.
+    """
+
+    def __init__(self, fetch: Fetch) -> None:
+        self._fetch = fetch
+        self._futures: Dict[int, concurrent.futures.Future] = {}
+        self.closed = False
+
+    def start(self, cycle: int) -> None:
+        """Begin generating materials for `cycle` unless already started."""
+        if self.closed or cycle in self._futures:
+            return
+        self._futures[cycle] = submit(self._fetch(cycle))
+
+    def ready(self, cycle: int) -> bool:
+        future = self._futures.get(cycle)
+        return future is not None and future.done()
+
+    def result(self, cycle: int, timeout: Optional[float] = None) -> Optional[GenerationResult]:
+        """Wait up to `timeout` for the cycle's materials.
+
+        Returns None if the cycle was never prefetched, was cancelled or is
+        still running when the timeout expires.
+        """
+        future = self._futures.get(cycle)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout)
+        except (concurrent.futures.CancelledError, concurrent.futures.TimeoutError):
+            return None
+        except Exception as e:
+            return GenerationResult("error", error=str(e) or type(e).__name__)
+
+    def cancel(self) -> None:
+        """Cancel every fetch still in flight and stop accepting new ones."""
+        self.closed = True
+        for future in self._futures.values():
+            future.cancel()
+
+    def on_phase_change(self, engine: PomodoroEngine, old: str, new: str) -> None:
+        """Timer hook: prefetch during work phases, cancel when the session ends."""
+        if new == WORK and engine.cycle < engine.cycles:
+            self.start(engine.cycle + 1)
+        elif new == DONE:
+            self.cancel()
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cancel()
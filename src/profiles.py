@@ -0,0 +1,248 @@
+"""Profile storage for Pomodoro Study Buddy.
+
+`ProfileStore` keeps every profile in memory for O(1) keyed lookup and
+persists changes incrementally:
+
+* ``profiles.json`` stays the snapshot, in exactly the format the app has
+  always written (``{key: profile}``), so existing files load unchanged.
+* Each put/delete after that is appended as one line to a journal
+  (``profiles.json.journal``) instead of rewriting the snapshot.
+* Once the journal grows past the size of the snapshot it is folded back
+  into ``profiles.json`` (compaction).
+
+Every change happens under the shared file lock from `src.durable`: the
+store first catches up with anything other processes journaled, then
+appends (fsynced), and compaction replaces the snapshot atomically.
+
+A sorted (name, key) index supports case-insensitive name-prefix search and
+paginated listing without sorting all profiles on every screen.
+"""
+
+import bisect
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.durable import atomic_write_json, file_lock
+
+PROFILES_FILE = "profiles.json"
+JOURNAL_SUFFIX = ".journal"
+COMPACT_MIN_OPS = 256
+
+
+def _sort_name(profile: dict) -> str:
+    return str(profile.get("name") or "").casefold()
+
+
+class ProfileStore:
+    """Keyed profile store with a journal for incremental updates.
+
+    Behaves like a read-only mapping (``store[key]``, ``key in store``,
+    ``len(store)``, iteration) so existing dict-based code keeps working;
+    mutations go through `put` and `delete`.
+    """
+
+    def __init__(self, path: str = PROFILES_FILE, compact_min_ops: int = COMPACT_MIN_OPS) -> None:
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_min_ops = compact_min_ops
+        self._profiles: Dict[str, dict] = {}
+        self._index: List[Tuple[str, str]] = []  # sorted (casefolded name, key)
+        self._journal_ops = 0
+        self._journal_pos = 0
+        self._snapshot_sig: Optional[tuple] = None
+        self.load_error: Optional[str] = None
+        self._load()
+
+    # ------------------------------------------------------------- mapping API
+
+    def __getitem__(self, key: str) -> dict:
+        return self._profiles[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._profiles
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._profiles)
+
+    def __bool__(self) -> bool:
+        return bool(self._profiles)
+
+    def get(self, key: str, default: Optional[dict] = None) -> Optional[dict]:
+        return self._profiles.get(key, default)
+
+    def keys(self):
+        return self._profiles.keys()
+
+    def items(self):
+        return self._profiles.items()
+
+    def to_dict(self) -> Dict[str, dict]:
+        return dict(self._profiles)
+
+    # --------------------------------------------------------------- mutation
+
+    def put(self, key: str, profile: dict) -> None:
+        """Insert or replace one profile, appending a single journal record."""
+        with file_lock(self.path):
+            self._refresh()
+            self._index_remove(key)
+            self._profiles[key] = dict(profile)
+            self._index_add(key)
+            self._append_journal({"op": "put", "key": key, "profile": profile})
+
+    def delete(self, key: str) -> dict:
+        """Remove one profile, appending a single journal record."""
+        with file_lock(self.path):
+            self._refresh()
+            profile = self._profiles[key]
+            self._index_remove(key)
+            del self._profiles[key]
+            self._append_journal({"op": "del", "key": key})
+        return profile
+
+    def replace_all(self, profiles: Dict[str, dict]) -> None:
+        """Replace every profile and write a fresh snapshot."""
+        with file_lock(self.path):
+            self._profiles = {k: dict(v) for k, v in profiles.items()}
+            self._rebuild_index()
+            self._write_snapshot()
+
+    def import_json(self, path: str) -> int:
+        """Merge a legacy ``{key: profile}`` JSON file. Returns profiles imported."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, profile in data.items():
+            self.put(key, profile)
+        return len(data)
+
+    # ----------------------------------------------------------------- queries
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Keys whose profile name starts with `prefix` (case-insensitive), by name."""
+        folded = prefix.casefold()
+        start = bisect.bisect_left(self._index, (folded, ""))
+        keys = []
+        for name, key in self._index[start:]:
+            if not name.startswith(folded) or (limit is not None and len(keys) >= limit):
+                break
+            keys.append(key)
+        return keys
+
+    def page(self, page: int, page_size: int, prefix: str = "") -> Tuple[List[Tuple[str, dict]], int]:
+        """One page (0-based) of profiles ordered by name, plus the total match count.
+
+        Without a prefix this slices the sorted index directly, so the cost
+        depends on the page size rather than on the number of profiles.
+        """
+        if prefix:
+            folded = prefix.casefold()
+            lo = bisect.bisect_left(self._index, (folded, ""))
+            hi = bisect.bisect_left(self._index, (folded + "\U0010ffff", ""))
+        else:
+            lo, hi = 0, len(self._index)
+        start = lo + max(0, page) * page_size
+        rows = [(key, self._profiles[key]) for _name, key in self._index[start:min(hi, start + page_size)]]
+        return rows, hi - lo
+
+    # --------------------------------------------------------------- internals
+
+    def _index_add(self, key: str) -> None:
+        bisect.insort(self._index, (_sort_name(self._profiles[key]), key))
+
+    def _index_remove(self, key: str) -> None:
+        profile = self._profiles.get(key)
+        if profile is None:
+            return
+        entry = (_sort_name(profile), key)
+        pos = bisect.bisect_left(self._index, entry)
+        if pos < len(self._index) and self._index[pos] == entry:
+            del self._index[pos]
+
+    def _rebuild_index(self) -> None:
+        self._index = sorted((_sort_name(p), k) for k, p in self._profiles.items())
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load(self) -> None:
+        self._profiles = {}
+        self._journal_ops = 0
+        self._journal_pos = 0
+        self._snapshot_sig = self._signature()
+        if self._snapshot_sig is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._profiles = data
+            except (OSError, json.JSONDecodeError) as e:
+                self.load_error = str(e)
+        self._replay_journal()
+        self._rebuild_index()
+
+    def _replay_journal(self) -> bool:
+        """Apply journal records written since we last looked. True if any were applied."""
+        try:
+            f = open(self.journal_path, "rb")
+        except OSError:
+            return False
+        applied = False
+        with f:
+            f.seek(self._journal_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final line from an interrupted write; ignore it
+                self._journal_pos += len(line)
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                self._journal_ops += 1
+                applied = True
+        return applied
+
+    def _refresh(self) -> None:
+        """Catch up with changes other processes made (call under the file lock)."""
+        if self._signature() != self._snapshot_sig:
+            self._load()  # another process compacted; start from its snapshot
+        elif self._replay_journal():
+            self._rebuild_index()
+
+    def _apply(self, op: dict) -> None:
+        if op.get("op") == "put":
+            self._profiles[op["key"]] = op["profile"]
+        elif op.get("op") == "del":
+            self._profiles.pop(op["key"], None)
+
+    def _append_journal(self, op: dict) -> None:
+        line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_pos += len(line)
+        self._journal_ops += 1
+        if self._journal_ops > max(self.compact_min_ops, len(self._profiles)):
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        atomic_write_json(self.path, self._profiles)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_ops = 0
+        self._journal_pos = 0
+        self._snapshot_sig = self._signature()
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh ``profiles.json`` snapshot."""
+        with file_lock(self.path):
+            self._refresh()
+            self._write_snapshot()
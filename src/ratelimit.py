@@ -0,0 +1,285 @@
+"""Rate limiting for LLM calls, shared by every process on the host.
+
+CLI sessions, batch jobs and the service often share one ``GEMINI_API_KEY``
+and therefore one quota. `RateLimiter` keeps two token buckets - requests
+per minute and (estimated) tokens per minute - in a small state file under
+the durable file lock, so all processes draw from the same budget instead
+of each assuming it has the whole quota and collecting 429 errors.
+
+Callers that have to wait queue by priority: `INTERACTIVE` (someone is
+watching the spinner) goes before `PREFETCH` (next-cycle materials), which
+goes before `BATCH`. The queue lives in the same state file; a waiter may
+take a token only when no live waiter with a higher priority (or the same
+priority, but queued earlier) is ahead of it. Waiters that stop polling
+(a killed process) expire after `STALE_AFTER` seconds.
+
+Priority travels with the request through a context variable set by
+`src.generation.generate_async(..., priority=...)`. Queue waits are
+recorded in `src.metrics` as the ``ratelimit.wait.<priority>`` spans, next
+to a ``ratelimit_queue_depth`` gauge and ``ratelimit_throttled`` counter.
+
+The state file is read and written under a blocking ``flock`` that other
+processes contend for, so the coroutines (`RateLimiter.acquire`,
+`RateLimitedBackend`) do that work in the default executor and never hold
+up the event loop - in ``--serve`` mode that loop serves every student.
+
+Limiting is opt-in: ``STUDY_BUDDY_RPM`` and ``STUDY_BUDDY_TPM`` both default
+to ``0`` (no limiter), and setting either turns on that bucket - Gemini's
+free tier is ``STUDY_BUDDY_RPM=10 STUDY_BUDDY_TPM=250000``. The state file
+defaults to one per API key in the temp directory
+(``STUDY_BUDDY_RATELIMIT_FILE`` overrides it).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from src import metrics
+from src.durable import file_lock
+from src.llm import LLMBackend
+
+INTERACTIVE = 0
+PREFETCH = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch", BATCH: "batch"}
+
+RPM_ENV_VAR = "STUDY_BUDDY_RPM"
+TPM_ENV_VAR = "STUDY_BUDDY_TPM"
+STATE_FILE_ENV_VAR = "STUDY_BUDDY_RATELIMIT_FILE"
+DEFAULT_RPM = 0  # off unless configured
+DEFAULT_TPM = 0
+FREE_TIER_RPM = 10
+FREE_TIER_TPM = 250_000
+EXPECTED_OUTPUT_TOKENS = 1_000
+POLL_SECONDS = 0.25
+STALE_AFTER = 30.0
+EPSILON = 1e-6  # refill rounding; without it a waiter can chase a vanishing shortfall
+
+request_priority: contextvars.ContextVar = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def default_state_file(api_key: Optional[str] = None) -> str:
+    key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY") or ""
+    suffix = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"study_buddy_ratelimit_{suffix}.json")
+
+
+class RateLimiter:
+    """Cross-process requests-per-minute and tokens-per-minute buckets with a priority queue."""
+
+    def __init__(
+        self,
+        rpm: float = FREE_TIER_RPM,
+        tpm: float = FREE_TIER_TPM,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        poll_seconds: float = POLL_SECONDS,
+        stale_after: float = STALE_AFTER,
+    ) -> None:
+        self.limits = {"requests": float(rpm), "tokens": float(tpm)}
+        self.path = path or default_state_file()
+        self._clock = clock
+        self._sleep = sleep
+        self.poll_seconds = poll_seconds
+        self.stale_after = stale_after
+
+    # ------------------------------------------------------------ state file
+
+    def _fresh(self, now: float) -> dict:
+        return {"buckets": {name: [limit, now] for name, limit in self.limits.items()}, "waiters": {}}
+
+    def _load(self, now: float) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if isinstance(state, dict) and "buckets" in state and "waiters" in state:
+                return state
+        except (OSError, ValueError):
+            pass
+        return self._fresh(now)
+
+    def _save(self, state: dict) -> None:
+        # Soft state: a lost update only resets the buckets, so skip the fsync.
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _refill(self, state: dict, now: float) -> Dict[str, float]:
+        """Top up each bucket for the time elapsed; returns the current levels."""
+        levels = {}
+        for name, limit in self.limits.items():
+            level, updated = state["buckets"].get(name, [limit, now])
+            level = min(limit, level + max(0.0, now - updated) * limit / 60.0)
+            state["buckets"][name] = [level, now]
+            levels[name] = level
+        return levels
+
+    def _update(self, change: Callable[[dict, float], Any]) -> Any:
+        with file_lock(self.path):
+            now = self._clock()
+            state = self._load(now)
+            self._refill(state, now)
+            result = change(state, now)
+            self._save(state)
+            return result
+
+    # -------------------------------------------------------------- acquiring
+
+    def try_acquire(self, waiter: str, priority: int, tokens: int, since: float) -> float:
+        """Take 1 request and `tokens` tokens if it is `waiter`'s turn.
+
+        Returns 0 on success, otherwise roughly how long to wait. Until it
+        succeeds the waiter stays in the shared queue.
+        """
+
+        def change(state: dict, now: float) -> float:
+            waiters = state["waiters"]
+            for other, (_p, _since, seen) in list(waiters.items()):
+                if now - seen > self.stale_after:
+                    del waiters[other]
+            waiters[waiter] = [priority, since, now]
+            metrics.set_gauge("ratelimit_queue_depth", len(waiters))
+            ahead = min(waiters.items(), key=lambda kv: (kv[1][0], kv[1][1], kv[0]))[0]
+            if ahead != waiter:
+                return self.poll_seconds
+            cost = {"requests": 1.0, "tokens": float(min(tokens, self.limits["tokens"]))}
+            wait = 0.0
+            for name, limit in self.limits.items():
+                if limit <= 0:
+                    continue
+                level = state["buckets"][name][0]
+                if level + EPSILON < cost[name]:
+                    wait = max(wait, (cost[name] - level) * 60.0 / limit)
+            if wait > 0:
+                return wait
+            for name, limit in self.limits.items():
+                if limit > 0:
+                    state["buckets"][name][0] -= cost[name]
+            del waiters[waiter]
+            return 0.0
+
+        return self._update(change)
+
+    def leave(self, waiter: str) -> None:
+        """Drop `waiter` from the queue (it gave up or was cancelled)."""
+        self._update(lambda state, _now: state["waiters"].pop(waiter, None))
+
+    async def acquire(self, tokens: int = 1, priority: Optional[int] = None) -> float:
+        """Wait for a request slot and `tokens` tokens; returns the seconds spent queued.
+
+        Each attempt runs in the default executor, off the event loop.
+        """
+        if all(limit <= 0 for limit in self.limits.values()):
+            return 0.0
+        priority = request_priority.get() if priority is None else priority
+        waiter = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        started = self._clock()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                wait = await loop.run_in_executor(None, self.try_acquire, waiter, priority, tokens, started)
+                if wait <= 0:
+                    break
+                await self._sleep(min(wait, self.poll_seconds))
+        except BaseException:
+            # Not awaited: a cancelled task must not block on the lock either.
+            loop.run_in_executor(None, self.leave, waiter)
+            raise
+        waited = self._clock() - started
+        metrics.observe(f"ratelimit.wait.{PRIORITY_NAMES.get(priority, priority)}", waited)
+        if waited > 0:
+            metrics.incr("ratelimit_throttled")
+        return waited
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Charge (or refund) the difference between estimated and actual tokens."""
+        if self.limits["tokens"] <= 0 or actual == estimated:
+            return
+
+        def change(state: dict, _now: float) -> None:
+            state["buckets"]["tokens"][0] = min(self.limits["tokens"], state["buckets"]["tokens"][0] - (actual - estimated))
+
+        self._update(change)
+
+    def drain(self) -> None:
+        """Empty the request bucket after the API reported a quota error, so every process backs off."""
+
+        def change(state: dict, _now: float) -> None:
+            state["buckets"]["requests"][0] = min(0.0, state["buckets"]["requests"][0])
+
+        self._update(change)
+        metrics.incr("ratelimit_quota_errors")
+
+    def levels(self) -> Dict[str, float]:
+        """Current bucket levels (after refilling)."""
+        return self._update(lambda state, _now: {name: bucket[0] for name, bucket in state["buckets"].items()})
+
+
+class RateLimitedBackend(LLMBackend):
+    """Wraps a backend so every request first waits its turn in the shared limiter.
+
+    The wait happens in `admit`, which callers await before starting their
+    per-request timeout; `generate`/`stream` then settle the token estimate
+    against the actual response and drain the buckets on a quota error.
+    """
+
+    def __init__(self, inner: LLMBackend, limiter: RateLimiter) -> None:
+        self.inner = inner
+        self.limiter = limiter
+        self.name = inner.name
+
+    async def admit(self, prompt: str) -> None:
+        await self.inner.admit(prompt)
+        await self.limiter.acquire(estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS)
+
+    async def _settle(self, prompt: str, text: str) -> None:
+        estimated = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+        actual = estimate_tokens(prompt) + estimate_tokens(text)
+        await asyncio.get_running_loop().run_in_executor(None, self.limiter.settle, estimated, actual)
+
+    async def _quota_error(self, exc: BaseException) -> None:
+        code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        if code == 429:
+            await asyncio.get_running_loop().run_in_executor(None, self.limiter.drain)
+
+    async def generate(self, prompt: str, model: str, config: Optional[dict] = None) -> str:
+        try:
+            text = await self.inner.generate(prompt, model, config)
+        except Exception as e:
+            await self._quota_error(e)
+            raise
+        await self._settle(prompt, text or "")
+        return text
+
+    async def stream(self, prompt: str, model: str, config: Optional[dict] = None) -> AsyncIterator[str]:
+        parts = []
+        try:
+            async for chunk in self.inner.stream(prompt, model, config):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            await self._quota_error(e)
+            raise
+        await self._settle(prompt, "".join(parts))
+
+
+def limiter_from_env() -> Optional[RateLimiter]:
+    """The limiter configured by the environment, or None when both budgets are 0 (the default)."""
+    rpm = float(os.getenv(RPM_ENV_VAR) or DEFAULT_RPM)
+    tpm = float(os.getenv(TPM_ENV_VAR) or DEFAULT_TPM)
+    if rpm <= 0 and tpm <= 0:
+        return None
+    return RateLimiter(rpm, tpm, os.getenv(STATE_FILE_ENV_VAR) or None)
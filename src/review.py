@@ -0,0 +1,373 @@
+"""Spaced-repetition review of generated flashcards and quiz questions.
+
+Flashcards and quiz questions (see `src.materials`) are turned into review
+cards and kept per user in a `ReviewDeck`, scheduled with the SM-2
+algorithm: each review is graded, and a card that was recalled comes back
+after 1 day, then 6, then a growing number of days set by its ease factor;
+a card that was forgotten starts over and comes back within minutes.
+
+Storage is an append-only NDJSON log per user under ``.study_reviews/``. A
+new card is written once in full; each review appends only the card's
+scheduling fields (about 80 bytes), so reviewing never rewrites the deck.
+Loading replays the log, and when it holds more than twice as many lines as
+there are cards it is compacted to one line per card.
+
+What is due is answered by a min-heap of ``(due, card id)``: the next due
+card is a peek, and ``k`` due cards cost ``O(k log n)``, so a deck of 100k
+cards reviews as fast as a deck of ten. Rescheduled cards are pushed again
+and their old entries skipped when they reach the top (lazy deletion).
+
+Reviewing needs no API key or network. It runs on its own (``--review``),
+during the Pomodoro work phase, or from the command line::
+
+    python -m src.review study Ana --limit 20
+    python -m src.review due Ana
+    python -m src.review backfill Ana   # cards from Ana's past sessions
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.prompt import Prompt
+
+from src import metrics
+from src.durable import append_durable, atomic_write_text, file_lock
+from src.materials import Flashcard, QuizQuestion, StudyMaterials, option_label, parse_materials
+from src.subjects import normalize_subject
+
+REVIEW_DIR = ".study_reviews"
+DAY_SECONDS = 86_400
+RELEARN_SECONDS = 600  # a forgotten card comes back within the same sitting
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+COMPACT_MIN_LINES = 1000
+
+# Answer keys shown while reviewing, mapped to SM-2 recall quality (0-5).
+GRADES = {"a": 1, "h": 3, "g": 4, "e": 5}
+GRADE_LABELS = "a=again, h=hard, g=good, e=easy"
+
+_SCHEDULE_FIELDS = ("ease", "interval", "reps", "lapses", "due")
+
+console = Console()
+
+
+class Card:
+    """One reviewable item plus its SM-2 schedule (`interval` in days, `due` in epoch seconds)."""
+
+    __slots__ = ("id", "subject", "method", "front", "back", "ease", "interval", "reps", "lapses", "due")
+
+    def __init__(
+        self,
+        id: str,
+        subject: str,
+        method: str,
+        front: str,
+        back: str,
+        ease: float = DEFAULT_EASE,
+        interval: int = 0,
+        reps: int = 0,
+        lapses: int = 0,
+        due: int = 0,
+    ) -> None:
+        self.id = id
+        self.subject = subject
+        self.method = method
+        self.front = front
+        self.back = back
+        self.ease = ease
+        self.interval = interval
+        self.reps = reps
+        self.lapses = lapses
+        self.due = due
+
+    def schedule(self) -> dict:
+        return {"id": self.id, **{field: getattr(self, field) for field in _SCHEDULE_FIELDS}}
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "subject": self.subject, "method": self.method, "front": self.front, "back": self.back,
+                **{field: getattr(self, field) for field in _SCHEDULE_FIELDS}}
+
+    def apply(self, quality: int, now: float) -> None:
+        """Update the schedule for a review graded `quality` (0 = blackout .. 5 = perfect)."""
+        if not 0 <= quality <= 5:
+            raise ValueError(f"quality must be between 0 and 5, got {quality}")
+        if quality < 3:
+            self.reps = 0
+            self.interval = 1
+            self.lapses += 1
+            self.due = int(now) + RELEARN_SECONDS
+        else:
+            self.reps += 1
+            self.interval = 1 if self.reps == 1 else 6 if self.reps == 2 else max(1, round(self.interval * self.ease))
+            self.due = int(now) + self.interval * DAY_SECONDS
+        self.ease = round(max(MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)), 2)
+
+
+def card_id(subject: str, front: str) -> str:
+    """Content address of a card: the same question in the same subject is one card."""
+    key = f"{normalize_subject(subject)}\n{' '.join(front.split()).casefold()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def cards_from(materials: StudyMaterials) -> List[Tuple[str, str]]:
+    """(front, back) pairs for the flashcards or quiz questions in `materials` (none for a Summary)."""
+    pairs = []
+    for item in materials.items:
+        if isinstance(item, Flashcard):
+            pairs.append((item.front, item.back))
+        elif isinstance(item, QuizQuestion):
+            front = "\n".join([item.question, ""] + [f"{option_label(i)}) {o}" for i, o in enumerate(item.options)])
+            if item.answer is not None and 0 <= item.answer < len(item.options):
+                back = f"{option_label(item.answer)}) {item.options[item.answer]}"
+                pairs.append((front, back + (f"\n\n{item.explanation}" if item.explanation else "")))
+    return pairs
+
+
+def deck_path(name: str, directory: str = REVIEW_DIR) -> str:
+    """The review log for user `name` (a readable slug plus a hash, so any name is a safe file name)."""
+    key = " ".join(str(name or "").split()).casefold()
+    slug = re.sub(r"[^a-z0-9]+", "-", key).strip("-")[:40] or "user"
+    return os.path.join(directory, f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}.ndjson")
+
+
+class ReviewDeck:
+    """A user's review cards, their append-only log and the due-time heap."""
+
+    def __init__(self, name: str, directory: str = REVIEW_DIR, clock: Callable[[], float] = time.time) -> None:
+        self.name = name
+        self.path = deck_path(name, directory)
+        self.clock = clock
+        self._cards: Dict[str, Card] = {}
+        self._heap: List[Tuple[int, str]] = []
+        self._lines = 0
+        self._loaded = False
+
+    # ------------------------------------------------------------ storage
+
+    def _replay(self) -> Tuple[Dict[str, Card], int]:
+        cards: Dict[str, Card] = {}
+        lines = 0
+        if not os.path.exists(self.path):
+            return cards, lines
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line from a crash
+                lines += 1
+                card = cards.get(entry.get("id"))
+                if card is None:
+                    if "front" in entry:
+                        cards[entry["id"]] = Card(**{k: entry[k] for k in Card.__slots__ if k in entry})
+                    continue
+                for field in _SCHEDULE_FIELDS:
+                    if field in entry:
+                        setattr(card, field, entry[field])
+        return cards, lines
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with metrics.span("review.load"):
+            self._cards, self._lines = self._replay()
+            self._rebuild_heap()
+        self._loaded = True
+        if self._lines > max(COMPACT_MIN_LINES, 2 * len(self._cards)):
+            self.compact()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(card.due, card.id) for card in self._cards.values()]
+        heapq.heapify(self._heap)
+
+    def _append(self, entries: Iterable[dict]) -> None:
+        data = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries)
+        if not data:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        append_durable(self.path, data.encode("utf-8"))
+        self._lines += data.count("\n")
+
+    def compact(self) -> None:
+        """Rewrite the log as one line per card (re-read under the lock, so other writers' reviews are kept)."""
+        with file_lock(self.path):
+            self._cards, _lines = self._replay()
+            atomic_write_text(self.path, "".join(
+                json.dumps(card.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n" for card in self._cards.values()
+            ))
+        self._lines = len(self._cards)
+        self._rebuild_heap()
+        metrics.incr("review_compactions")
+
+    # ------------------------------------------------------------ cards
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._cards)
+
+    def get(self, card_id: str) -> Optional[Card]:
+        self._load()
+        return self._cards.get(card_id)
+
+    def add(self, pairs: Iterable[Tuple[str, str]], subject: str, method: str, now: Optional[float] = None) -> int:
+        """Add (front, back) cards due `now`; ones already in the deck are skipped. Returns how many were added."""
+        self._load()
+        due = int(self.clock() if now is None else now)
+        added = []
+        for front, back in pairs:
+            cid = card_id(subject, front)
+            if cid in self._cards:
+                continue
+            card = self._cards[cid] = Card(cid, subject, method, front, back, due=due)
+            heapq.heappush(self._heap, (card.due, cid))
+            added.append(card.to_dict())
+        self._append(added)
+        metrics.incr("review_cards_added", len(added))
+        return len(added)
+
+    def add_materials(self, text: Optional[str], subject: str, now: Optional[float] = None) -> int:
+        """Add the cards in a generated response; free-form text and summaries add none."""
+        materials = parse_materials(text)
+        if materials is None:
+            return 0
+        return self.add(cards_from(materials), subject, materials.method, now)
+
+    # ------------------------------------------------------------ schedule
+
+    def _valid(self, entry: Tuple[int, str]) -> bool:
+        card = self._cards.get(entry[1])
+        return card is not None and card.due == entry[0]
+
+    def next_due(self, now: Optional[float] = None) -> Optional[Card]:
+        """The most overdue card at `now`, or None if nothing is due."""
+        self._load()
+        now = self.clock() if now is None else now
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+        if heap and heap[0][0] <= now:
+            return self._cards[heap[0][1]]
+        return None
+
+    def iter_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> Iterator[Card]:
+        """Due cards, most overdue first, without rescheduling them."""
+        self._load()
+        now = self.clock() if now is None else now
+        taken: List[Tuple[int, str]] = []
+        seen = set()
+        try:
+            while self._heap and (limit is None or len(seen) < limit):
+                entry = self._heap[0]
+                if not self._valid(entry) or entry[1] in seen:
+                    heapq.heappop(self._heap)
+                    continue
+                if entry[0] > now:
+                    break
+                taken.append(heapq.heappop(self._heap))
+                seen.add(entry[1])
+                yield self._cards[entry[1]]
+        finally:
+            for entry in taken:
+                heapq.heappush(self._heap, entry)
+
+    def due_count(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        return sum(1 for _ in self.iter_due(now, limit))
+
+    def review(self, card_id: str, quality: int, now: Optional[float] = None) -> Card:
+        """Grade a review of `card_id`, reschedule it and log the new schedule."""
+        self._load()
+        card = self._cards[card_id]
+        card.apply(quality, self.clock() if now is None else now)
+        heapq.heappush(self._heap, (card.due, card.id))
+        if len(self._heap) > 2 * len(self._cards) + 64:
+            self._rebuild_heap()  # drop the superseded entries
+        self._append([card.schedule()])
+        metrics.incr("reviews")
+        if self._lines > max(COMPACT_MIN_LINES, 2 * len(self._cards)):
+            self.compact()
+        return card
+
+
+#==============================INTERACTIVE REVIEW================================
+
+def run_review(
+    deck: ReviewDeck,
+    until: Optional[Callable[[], bool]] = None,
+    limit: Optional[int] = None,
+) -> int:
+    """Show due cards one by one and grade them, until none are due, `limit` is reached
+    or `until()` turns false (e.g. the work phase is over). Returns how many were reviewed.
+    """
+    reviewed = 0
+    while (limit is None or reviewed < limit) and (until is None or until()):
+        card = deck.next_due()
+        if card is None:
+            break
+        console.print(Panel(card.front, title=f"[bold cyan]{card.subject} - {card.method}[/bold cyan]", border_style="cyan"))
+        Prompt.ask("[dim]Press Enter to show the answer[/dim]", default="", show_default=False)
+        console.print(Panel(card.back, border_style="green"))
+        answer = Prompt.ask(f"How well did you remember it? ({GRADE_LABELS}, q=stop)", choices=[*GRADES, "q"], default="g")
+        if answer == "q":
+            break
+        updated = deck.review(card.id, GRADES[answer])
+        reviewed += 1
+        when = "in a few minutes" if updated.reps == 0 else f"in {updated.interval} day(s)"
+        console.print(f"[dim]Next review {when}.[/dim]")
+    if reviewed:
+        console.print(f"[bold green]Reviewed {reviewed} card(s).[/bold green]")
+    elif deck.next_due() is None:
+        console.print("[dim]No cards are due for review.[/dim]")
+    return reviewed
+
+
+def backfill(deck: ReviewDeck, records: Iterable[dict]) -> int:
+    """Add cards from the stored materials of `records` belonging to the deck's user."""
+    from src.history import load_materials
+
+    key = " ".join(deck.name.split()).casefold()
+    added = 0
+    for record in records:
+        if " ".join(str(record.get("name") or "").split()).casefold() == key:
+            added += deck.add_materials(load_materials(record), str(record.get("subject") or ""))
+    return added
+
+
+#==================================CLI=======================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Spaced-repetition review of generated flashcards and quiz questions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    study = sub.add_parser("study", help="Review the cards that are due.")
+    study.add_argument("--limit", type=int, default=None, help="Stop after this many cards.")
+    sub.add_parser("due", help="Show how many cards are due.")
+    sub.add_parser("backfill", help="Add cards from the user's past sessions.")
+    sub.add_parser("compact", help="Rewrite the review log as one line per card.")
+    for command in sub.choices.values():
+        command.add_argument("name", help="Whose deck.")
+    args = parser.parse_args(argv)
+
+    deck = ReviewDeck(args.name)
+    if args.command == "study":
+        run_review(deck, limit=args.limit)
+    elif args.command == "due":
+        console.print(f"[bold]{deck.due_count()}[/bold] of {len(deck)} card(s) due for {args.name}.")
+    elif args.command == "backfill":
+        from src.history import get_backend
+
+        added = backfill(deck, get_backend().iter_newest())
+        console.print(f"[bold green]Added {added} card(s) from past sessions.[/bold green]")
+    else:
+        deck.compact()
+        console.print(f"[bold green]Compacted {len(deck)} card(s).[/bold green]")
+
+
+if __name__ == "__main__":
+    main()
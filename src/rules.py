@@ -1,22 +1,336 @@
+"""Study-mode rules: (state, minutes, time of day) -> a study plan.
+
+The rules live in ``study_rules.json`` (next to this module, or the file named
+by ``STUDY_BUDDY_RULES_FILE``) as a list of modes and an ordered list of
+rules; the first rule whose conditions all hold picks the mode:
+
+* ``state`` - a state name or a list of them (case-insensitive);
+* ``min_minutes`` / ``max_minutes`` - inclusive bounds on available minutes;
+* ``hours`` - an inclusive ``[start, end]`` hour range (``[22, 4]`` wraps midnight).
+
+Unknown minutes pass any minute bound; rules with ``hours`` apply only when
+the hour is known.
+
+`RuleSet` compiles the rules once into a dispatch table keyed by
+(state, minutes bucket, hour), so classifying a session is a bisect and a
+dict lookup however many rules there are. `classify_many` scores whole
+lists of history records in one call.
+"""
+
+import argparse
+import json
 import logging
-from typing import Optional
+import os
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rich.console import Console
+from rich.table import Table
 
 logging.basicConfig(level=logging.INFO)
 
+console = Console()
+
+RULES_ENV_VAR = "STUDY_BUDDY_RULES_FILE"
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "study_rules.json")
+DEFAULT_MODE = "basic check-in"
+ANY_STATE = "*"
+HOURS = tuple(range(24))
+
+
+@dataclass(frozen=True)
+class Mode:
+    """A study mode: work/break lengths and the most cycles worth suggesting."""
+
+    label: str
+    title: str
+    work: int
+    break_: int
+    max_cycles: int
+
+    def cycles_for(self, minutes: Optional[int]) -> int:
+        """How many cycles fit in `minutes` (at least 1, at most `max_cycles`)."""
+        if self.work <= 0 or self.max_cycles <= 0:
+            return 0
+        if minutes is None:
+            return self.max_cycles
+        return max(1, min(self.max_cycles, minutes // (self.work + self.break_)))
+
+
+@dataclass(frozen=True)
+class StudyPlan:
+    """What the rules suggest for one session."""
+
+    label: str
+    title: str
+    work: int
+    break_: int
+    cycles: int
+
+    @property
+    def description(self) -> str:
+        """Human-readable summary; the timer reads the cycle count from it."""
+        if self.work <= 0:
+            return self.title
+        plural = "cycle" if self.cycles == 1 else "cycles"
+        return f"{self.title} ({self.work} min work / {self.break_} min break, {self.cycles} {plural})"
+
+
+@dataclass(frozen=True)
+class Rule:
+    mode: str
+    states: Optional[frozenset] = None
+    min_minutes: Optional[int] = None
+    max_minutes: Optional[int] = None
+    hours: Optional[Tuple[int, int]] = None
+
+    def matches(self, state: str, minutes: Optional[int], hour: Optional[int]) -> bool:
+        """Unknown minutes (None) pass the minute bounds; an unknown hour skips hour-bound rules."""
+        if self.states is not None and state not in self.states:
+            return False
+        if minutes is not None:
+            if self.min_minutes is not None and minutes < self.min_minutes:
+                return False
+            if self.max_minutes is not None and minutes > self.max_minutes:
+                return False
+        if self.hours is not None:
+            if hour is None:
+                return False
+            start, end = self.hours
+            inside = start <= hour <= end if start <= end else (hour >= start or hour <= end)
+            if not inside:
+                return False
+        return True
+
+
+def _normalize_state(state: object) -> str:
+    return state.strip().lower() if isinstance(state, str) else ANY_STATE
+
+
+def _normalize_minutes(minutes: object) -> Optional[int]:
+    """Positive whole minutes, or None when unknown (missing, zero or invalid)."""
+    try:
+        value = int(minutes)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _optional_int(value: object) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def _hour_of(timestamp: object) -> Optional[int]:
+    """The hour of a ``YYYY-MM-DD HH:MM:SS`` history timestamp."""
+    text = str(timestamp or "")
+    return int(text[11:13]) if len(text) >= 13 and text[11:13].isdigit() else None
+
+
+class RuleSet:
+    """Modes plus ordered rules, compiled into a precomputed dispatch table."""
+
+    def __init__(self, modes: Dict[str, Mode], rules: List[Rule], default: str = DEFAULT_MODE) -> None:
+        for label in [r.mode for r in rules] + [default]:
+            if label not in modes:
+                raise ValueError(f"Rule refers to unknown mode '{label}'. Defined modes: {', '.join(modes)}")
+        self.modes = modes
+        self.rules = rules
+        self.default = default
+        self._compile()
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "RuleSet":
+        modes = {}
+        for label, spec in (config.get("modes") or {}).items():
+            label = label.strip().lower()
+            modes[label] = Mode(
+                label=label,
+                title=str(spec.get("title") or label.capitalize()),
+                work=int(spec.get("work", 0)),
+                break_=int(spec.get("break", 0)),
+                max_cycles=int(spec.get("max_cycles", 1)),
+            )
+        rules = []
+        for spec in config.get("rules") or []:
+            states = spec.get("state")
+            if isinstance(states, str):
+                states = [states]
+            hours = spec.get("hours")
+            if hours is not None and (len(hours) != 2 or not all(0 <= int(h) <= 23 for h in hours)):
+                raise ValueError(f"Rule 'hours' must be [start, end] with hours 0-23, got {hours!r}")
+            rules.append(
+                Rule(
+                    mode=str(spec["mode"]).strip().lower(),
+                    states=frozenset(s.strip().lower() for s in states) if states else None,
+                    min_minutes=_optional_int(spec.get("min_minutes")),
+                    max_minutes=_optional_int(spec.get("max_minutes")),
+                    hours=(int(hours[0]), int(hours[1])) if hours is not None else None,
+                )
+            )
+        return cls(modes, rules, str(config.get("default") or DEFAULT_MODE).strip().lower())
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "RuleSet":
+        """Read the rules file (``STUDY_BUDDY_RULES_FILE``, else the bundled one)."""
+        path = path or os.getenv(RULES_ENV_VAR) or DEFAULT_RULES_FILE
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
 
-def study_mode(current_state: Optional[object]) -> str:
+    #----------------------------- COMPILATION -----------------------------------
+
+    def _compile(self) -> None:
+        """Evaluate the rules once for every (state, minutes bucket, hour) combination.
+
+        Minute bounds split the number line into buckets that no rule can tell
+        apart; `_breakpoints` are the bucket edges, found with bisect at lookup.
+        Hour None and bucket None stand for "unknown".
+        """
+        edges = set()
+        for rule in self.rules:
+            if rule.min_minutes is not None:
+                edges.add(rule.min_minutes)
+            if rule.max_minutes is not None:
+                edges.add(rule.max_minutes + 1)
+        self._breakpoints = sorted(edges)
+        samples: List[Optional[int]] = [None]
+        if self._breakpoints:
+            samples.append(self._breakpoints[0] - 1)
+            samples.extend(self._breakpoints)
+        else:
+            samples.append(0)
+        states = {ANY_STATE}
+        for rule in self.rules:
+            states.update(rule.states or ())
+
+        self._table: Dict[tuple, str] = {}
+        for state in states:
+            for bucket, minutes in enumerate(samples):
+                key_bucket = None if minutes is None else bucket - 1
+                for hour in (None,) + HOURS:
+                    self._table[(state, key_bucket, hour)] = self._evaluate(state, minutes, hour)
+        self._plans: Dict[tuple, StudyPlan] = {}
+
+    def _evaluate(self, state: str, minutes: Optional[int], hour: Optional[int]) -> str:
+        for rule in self.rules:
+            if rule.matches(state, minutes, hour):
+                return rule.mode
+        return self.default
+
+    def mode_for(self, state: object, minutes: object = None, hour: Optional[int] = None) -> Mode:
+        """The mode the rules pick (a table lookup; unknown states use the catch-all rules)."""
+        state = _normalize_state(state)
+        minutes = _normalize_minutes(minutes)
+        bucket = None if minutes is None else bisect_right(self._breakpoints, minutes)
+        if hour is not None and hour not in HOURS:
+            hour = None
+        label = self._table.get((state, bucket, hour)) or self._table[(ANY_STATE, bucket, hour)]
+        return self.modes[label]
+
+    #----------------------------- CLASSIFICATION -----------------------------------
+
+    def classify(self, state: object, minutes: object = None, hour: Optional[int] = None) -> StudyPlan:
+        """The study plan for one session; cycles are fitted to the available minutes."""
+        mode = self.mode_for(state, minutes, hour)
+        cycles = mode.cycles_for(_normalize_minutes(minutes))
+        plan = self._plans.get((mode.label, cycles))
+        if plan is None:
+            plan = self._plans[(mode.label, cycles)] = StudyPlan(mode.label, mode.title, mode.work, mode.break_, cycles)
+        return plan
+
+    def classify_many(self, records: Iterable[dict]) -> List[StudyPlan]:
+        """Plans for many session records (``state``, ``minutes`` and, if present, ``timestamp``)."""
+        classify = self.classify
+        return [classify(r.get("state"), r.get("minutes"), _hour_of(r.get("timestamp"))) for r in records]
+
+
+_rules: Optional[RuleSet] = None
+
+
+def get_rules() -> RuleSet:
+    """The rule set, loaded and compiled on first use."""
+    global _rules
+    if _rules is None:
+        _rules = RuleSet.load()
+    return _rules
+
+
+def set_rules(rules: Optional[RuleSet]) -> None:
+    """Replace the rule set (None reloads the rules file on next use)."""
+    global _rules
+    _rules = rules
+
+
+def classify(state: object, minutes: object = None, hour: Optional[int] = None) -> StudyPlan:
+    return get_rules().classify(state, minutes, hour)
+
+
+def classify_many(records: Iterable[dict]) -> List[StudyPlan]:
+    return get_rules().classify_many(records)
+
+
+def study_mode(current_state: Optional[object], minutes: Optional[int] = None, hour: Optional[int] = None) -> str:
     """Return a short study-mode suggestion string based on the user's current state.
 
+    `minutes` and `hour` refine the suggestion when given; without them only
+    the state is considered.
     """
 
     if not isinstance(current_state, str):
-        logging.warning(f"Invalid state input: {type(current_state)}. Defaulting to 'basic check-in'.")
-        return "basic check-in"
+        logging.warning(f"Invalid state input: {type(current_state)}. Defaulting to '{get_rules().default}'.")
+        return get_rules().default
+
+    return get_rules().mode_for(current_state, minutes, hour).label
+
+
+def current_hour() -> int:
+    return datetime.now().hour
+
+
+#============================COMMAND LINE====================================
+
+def score_history(records: Iterable[dict], rules: Optional[RuleSet] = None) -> Dict[str, Counter]:
+    """Suggested-mode counts for past sessions, overall and per recorded state."""
+    records = list(records)
+    plans = (rules or get_rules()).classify_many(records)
+    by_state: Dict[str, Counter] = {}
+    for record, plan in zip(records, plans):
+        by_state.setdefault(str(record.get("state") or "Unknown"), Counter())[plan.label] += 1
+    overall = Counter()
+    for counts in by_state.values():
+        overall.update(counts)
+    return {"all": overall, **by_state}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Study-mode rules.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Show the plan for one state.")
+    check.add_argument("state")
+    check.add_argument("minutes", nargs="?", type=int, default=None)
+    check.add_argument("--hour", type=int, default=None, help="Hour of day (0-23); default ignores the time.")
+    sub.add_parser("score", help="Re-score the session history with the current rules.")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        plan = classify(args.state, args.minutes, args.hour)
+        console.print(f"[bold blue]{plan.label}[/bold blue]: {plan.description}")
+        return
+
+    from src.history import get_backend
+
+    scores = score_history(get_backend().iter_newest())
+    modes = list(get_rules().modes)
+    table = Table(title="Suggested Modes for Past Sessions", show_header=True, header_style="bold magenta")
+    table.add_column("State", style="cyan")
+    for mode in modes:
+        table.add_column(mode, justify="right")
+    for state, counts in scores.items():
+        table.add_row(state, *(str(counts.get(mode, 0)) for mode in modes))
+    console.print(table)
 
-    current_state = current_state.strip().lower()
 
-    if current_state == "focused":
-        return "deep study"
-    if current_state == "tired":
-        return "light review"
-    return "basic check-in"
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Segmented, compressed session history.
+
+`SegmentedBackend` splits the history into time-based segments (one per
+month by default) inside ``session_history.segments/``:
+
+* the newest segment is an open NDJSON log with a tail index (the same
+  format as `NdjsonBackend`), so logging and "last N sessions" touch only it;
+* when a record arrives for a later period the open segment is closed:
+  gzip-compressed (or zstd when the ``zstandard`` package is installed and
+  requested) and recorded in ``manifest.json`` with its time range and
+  record count;
+* readers use the manifest to skip segments outside a requested time range,
+  and stream one segment at a time, so memory stays flat as history grows;
+* an optional retention policy deletes closed segments past a maximum age
+  or count whenever a segment is rotated;
+* records older than the newest stored one (an import of past sessions)
+  are merged into the segment of their own period - the open one, an
+  existing closed one, or a new closed one inserted in period order - so
+  segments, their manifest ranges and "latest" stay in time order.
+
+Records whose timestamp cannot be parsed (malformed legacy or imported
+data) never join a dated segment: they are kept in one closed "undated"
+segment that sorts before every dated period (so retention treats it as
+the oldest).
+
+Rotation and retention are configured with ``STUDY_BUDDY_HISTORY_ROTATION``
+(``monthly``, ``weekly`` or ``daily``) and
+``STUDY_BUDDY_HISTORY_RETENTION_DAYS``.
+"""
+
+import gzip
+import heapq
+import itertools
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from src.durable import atomic_write_json, file_lock
+from src.storage import MERGE_CHUNK_RECORDS, HistoryBackend, NdjsonBackend
+
+try:  # optional, faster and smaller than gzip
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+SEGMENTS_DIR = "session_history.segments"
+MANIFEST_FILE = "manifest.json"
+ROTATION_ENV_VAR = "STUDY_BUDDY_HISTORY_ROTATION"
+RETENTION_ENV_VAR = "STUDY_BUDDY_HISTORY_RETENTION_DAYS"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+UNDATED_PERIOD = "0000-undated"  # sorts before every monthly, weekly and daily period
+
+_PERIOD_FORMATS = {
+    "monthly": lambda d: d.strftime("%Y-%m"),
+    "weekly": lambda d: "{0}-W{1:02d}".format(*d.isocalendar()[:2]),
+    "daily": lambda d: d.strftime("%Y-%m-%d"),
+}
+
+
+@dataclass
+class RetentionPolicy:
+    """Which closed segments to keep. None means unlimited."""
+
+    max_age_days: Optional[int] = None
+    max_segments: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        days = os.getenv(RETENTION_ENV_VAR)
+        return cls(max_age_days=int(days) if days else None)
+
+
+def period_of(timestamp: Optional[str], rotation: str = "monthly") -> str:
+    """The segment period a record belongs to (e.g. '2025-12' for monthly).
+
+    Missing or unparsable timestamps map to `UNDATED_PERIOD`.
+    """
+    try:
+        moment = datetime.strptime(timestamp or "", TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return UNDATED_PERIOD
+    return _PERIOD_FORMATS[rotation](moment)
+
+
+def _timestamp(record: dict) -> str:
+    return str(record.get("timestamp") or "")
+
+
+def _open_segment(path: str) -> IO[bytes]:
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+class SegmentedBackend(HistoryBackend):
+    """Time-segmented history: one open NDJSON segment plus compressed closed ones."""
+
+    name = "segmented"
+
+    def __init__(
+        self,
+        directory: str = SEGMENTS_DIR,
+        rotation: Optional[str] = None,
+        retention: Optional[RetentionPolicy] = None,
+        compression: str = "gzip",
+    ) -> None:
+        self.directory = directory
+        self.rotation = (rotation or os.getenv(ROTATION_ENV_VAR) or "monthly").lower()
+        if self.rotation not in _PERIOD_FORMATS:
+            raise ValueError(f"Unknown rotation '{self.rotation}'. Choose from: {', '.join(_PERIOD_FORMATS)}")
+        self.retention = retention or RetentionPolicy.from_env()
+        self.compression = "zstd" if compression == "zstd" and zstandard is not None else "gzip"
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self._manifest: dict = {}
+        self._manifest_sig: Optional[tuple] = ()
+        self._active: Optional[NdjsonBackend] = None
+        self._refresh_manifest()
+
+    # ---------------------------------------------------------------- manifest
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _refresh_manifest(self) -> None:
+        """Reload the manifest if another process rotated segments since we read it."""
+        sig = self._signature()
+        if sig == self._manifest_sig:
+            return
+        manifest = {"version": 1, "next_seq": 1, "active": None, "segments": []}
+        if sig is not None:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest.update(json.load(f))
+        self._manifest = manifest
+        self._manifest_sig = sig
+        active = manifest["active"]
+        self._active = NdjsonBackend(os.path.join(self.directory, active["file"])) if active else None
+
+    def _save_manifest(self) -> None:
+        atomic_write_json(self.manifest_path, self._manifest, indent=2)
+        self._manifest_sig = self._signature()
+
+    @property
+    def segments(self) -> List[dict]:
+        """Closed segments, oldest first, as recorded in the manifest."""
+        self._refresh_manifest()
+        return list(self._manifest["segments"])
+
+    # ---------------------------------------------------------------- rotation
+
+    def _open_segment_for(self, period: str) -> None:
+        seq = self._manifest["next_seq"]
+        self._manifest["next_seq"] = seq + 1
+        self._manifest["active"] = {"seq": seq, "period": period, "file": f"seg-{seq:06d}-{period}.ndjson"}
+        self._active = NdjsonBackend(os.path.join(self.directory, self._manifest["active"]["file"]))
+
+    def _compress(self, lines: Iterable[bytes], target: str) -> tuple:
+        """Write NDJSON `lines` compressed to `target`. Returns (count, start, end)."""
+        count, start, end = 0, None, None
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as raw:
+            if self.compression == "zstd":
+                out = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            else:
+                out = gzip.GzipFile(fileobj=raw, mode="wb")
+            with out:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    out.write(line)
+                    ts = json.loads(line).get("timestamp") or ""
+                    start = ts if start is None or ts < start else start
+                    end = ts if end is None or ts > end else end
+                    count += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, target)
+        return count, start, end
+
+    def _segment_entry(self, seq: int, period: str, target: str, count: int, start: Optional[str], end: Optional[str]) -> dict:
+        return {
+            "seq": seq,
+            "period": period,
+            "file": os.path.basename(target),
+            "start": start,
+            "end": end,
+            "count": count,
+            "compression": self.compression,
+        }
+
+    def _close_active(self) -> None:
+        """Compress the open segment and record its range and count in the manifest."""
+        active = self._manifest["active"]
+        if not active:
+            return
+        source = os.path.join(self.directory, active["file"])
+        suffix = ".zst" if self.compression == "zstd" else ".gz"
+        target = source + suffix
+        count, start, end = 0, None, None
+        if os.path.exists(source):
+            with open(source, "rb") as src:
+                count, start, end = self._compress(src, target)
+        if count:
+            self._manifest["segments"].append(self._segment_entry(active["seq"], active["period"], target, count, start, end))
+        elif os.path.exists(target):
+            os.remove(target)
+        self._manifest["active"] = None
+        self._active = None
+        self._save_manifest()
+        for leftover in (source, source + ".idx", source + ".lock"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    def _newest_timestamp(self) -> Optional[str]:
+        """Timestamp of the newest stored record (None when the store is empty)."""
+        if self._active:
+            latest = self._active.latest(1)
+            if latest:
+                return _timestamp(latest[0])
+        dated = [s for s in self._manifest["segments"] if s["period"] != UNDATED_PERIOD]
+        return dated[-1]["end"] if dated else None
+
+    def _merge_active(self, entries: List[dict]) -> None:
+        """Merge `entries` into the open segment by timestamp (it holds one period, so it is bounded)."""
+        newest_first = sorted(entries, key=_timestamp, reverse=True)
+        self._active.replace_all(list(heapq.merge(self._active.iter_newest(), newest_first, key=_timestamp, reverse=True)))
+
+    def _merge_closed(self, period: str, entries: List[dict]) -> None:
+        """Merge `entries` into the closed segment for `period`, creating it if needed.
+
+        The segment is rewritten (it holds one period, so it is bounded) under
+        a new sequence number and swapped in the manifest, which stays sorted
+        by period.
+        """
+        segments = self._manifest["segments"]
+        old = next((s for s in segments if s["period"] == period), None)
+        existing: List[dict] = []
+        if old is not None:
+            with _open_segment(os.path.join(self.directory, old["file"])) as f:
+                existing = [json.loads(line) for line in f if line.strip()]
+        merged = heapq.merge(existing, sorted(entries, key=_timestamp), key=_timestamp)
+        seq = self._manifest["next_seq"]
+        self._manifest["next_seq"] = seq + 1
+        suffix = ".zst" if self.compression == "zstd" else ".gz"
+        target = os.path.join(self.directory, f"seg-{seq:06d}-{period}.ndjson{suffix}")
+        count, start, end = self._compress(((json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in merged), target)
+        if old is not None:
+            segments.remove(old)
+        segments.append(self._segment_entry(seq, period, target, count, start, end))
+        segments.sort(key=lambda s: (s["period"], s["seq"]))
+        self._save_manifest()
+        if old is not None:
+            try:
+                os.remove(os.path.join(self.directory, old["file"]))
+            except OSError:
+                pass
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """Delete closed segments outside the retention policy. Returns how many."""
+        segments = self._manifest["segments"]
+        keep = list(segments)
+        if self.retention.max_age_days is not None:
+            cutoff = ((now or datetime.now()) - timedelta(days=self.retention.max_age_days)).strftime(TIMESTAMP_FORMAT)
+            keep = [s for s in keep if (s.get("end") or "") >= cutoff]
+        if self.retention.max_segments is not None:
+            keep = keep[-self.retention.max_segments:] if self.retention.max_segments > 0 else []
+        dropped = [s for s in segments if s not in keep]
+        if not dropped:
+            return 0
+        self._manifest["segments"] = keep
+        self._save_manifest()
+        for segment in dropped:
+            try:
+                os.remove(os.path.join(self.directory, segment["file"]))
+            except OSError:
+                pass
+        return len(dropped)
+
+    def rotate(self) -> None:
+        """Close the open segment now (the next record starts a new one)."""
+        with file_lock(self.manifest_path):
+            self._refresh_manifest()
+            self._close_active()
+            self.apply_retention()
+
+    # --------------------------------------------------------------- interface
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: Iterable[dict]) -> None:
+        with file_lock(self.manifest_path):
+            self._refresh_manifest()
+            newest = self._newest_timestamp()
+            pending: List[dict] = []
+            late: Dict[str, List[dict]] = {}
+            for entry in entries:
+                period = period_of(entry.get("timestamp"), self.rotation)
+                if period == UNDATED_PERIOD or (newest is not None and _timestamp(entry) < newest):
+                    late.setdefault(period, []).append(entry)
+                    continue
+                newest = _timestamp(entry)
+                active = self._manifest["active"]
+                if active is None or period > active["period"]:
+                    if pending:
+                        self._active.extend(pending)
+                        pending = []
+                    rotated = active is not None
+                    self._close_active()
+                    self._open_segment_for(period)
+                    self._save_manifest()
+                    if rotated:
+                        self.apply_retention()
+                pending.append(entry)
+            if pending:
+                self._active.extend(pending)
+            for period, records in sorted(late.items()):
+                active = self._manifest["active"]
+                if active is not None and period == active["period"]:
+                    self._merge_active(records)
+                else:
+                    self._merge_closed(period, records)
+
+    def merge(self, entries: Iterable[dict], chunk_size: int = MERGE_CHUNK_RECORDS) -> None:
+        # extend already files older records by period, rewriting only the segments they fall in
+        source = iter(entries)
+        chunk = list(itertools.islice(source, chunk_size))
+        while chunk:
+            self.extend(chunk)
+            chunk = list(itertools.islice(source, chunk_size))
+
+    def count(self) -> int:
+        self._refresh_manifest()
+        active = self._active.count() if self._active else 0
+        return active + sum(s["count"] for s in self._manifest["segments"])
+
+    def latest(self, limit: int) -> List[dict]:
+        self._refresh_manifest()
+        records = self._active.latest(limit) if self._active else []
+        if len(records) < limit:
+            for record in self._iter_closed_newest():
+                records.append(record)
+                if len(records) >= limit:
+                    break
+        return records
+
+    def iter_newest(self) -> Iterator[dict]:
+        return self.iter_between()
+
+    def iter_between(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """Yield records with start <= timestamp <= end, newest first.
+
+        Closed segments whose manifest range lies outside the window are
+        never opened.
+        """
+        self._refresh_manifest()
+
+        def wanted(record: dict) -> bool:
+            ts = record.get("timestamp") or ""
+            return (start is None or ts >= start) and (end is None or ts <= end)
+
+        if self._active:
+            for record in self._active.iter_newest():
+                if wanted(record):
+                    yield record
+        for record in self._iter_closed_newest(start, end):
+            if wanted(record):
+                yield record
+
+    def _iter_closed_newest(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        for segment in reversed(self._manifest["segments"]):
+            if start is not None and (segment.get("end") or "") < start:
+                continue
+            if end is not None and (segment.get("start") or "") > end:
+                continue
+            # Segments are bounded (one period), so reversing one at a time keeps memory flat.
+            with _open_segment(os.path.join(self.directory, segment["file"])) as f:
+                lines = [line for line in f if line.strip()]
+            for line in reversed(lines):
+                yield json.loads(line)
+
+    def replace_all(self, entries: List[dict]) -> None:
+        with file_lock(self.manifest_path):
+            for name in os.listdir(self.directory):
+                if name.startswith("seg-"):
+                    os.remove(os.path.join(self.directory, name))
+            self._manifest = {"version": 1, "next_seq": 1, "active": None, "segments": []}
+            self._active = None
+            self._save_manifest()
+        self.extend(reversed(entries))
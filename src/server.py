@@ -0,0 +1,489 @@
+"""Local multi-user HTTP service for Pomodoro Study Buddy.
+
+One process serves a whole study group over a small JSON API on asyncio,
+instead of every student running their own ``python -m src.app``:
+
+* the LLM client (and its connection pool) is built once and shared;
+* identical generation requests that arrive while one is in flight are
+  coalesced onto that single call (`SingleFlight`), so a class-wide burst
+  for the same "Quiz on Photosynthesis" costs one LLM request - and the
+  response cache answers the ones that come later;
+* timers for every student run on the same loop (`TimerService`).
+
+By default materials are generated without the student's name in the
+prompt so classmates can share them; send ``"personalize": true`` to get a
+greeting by name (then only identical name/method/subject requests share).
+Quiz, Flashcards and Summary responses also come back parsed, as
+``"materials": {"method", "greeting", "items", "overview"?}``.
+
+Endpoints (JSON in and out):
+
+    GET    /health
+    POST   /generate              {"name", "method", "subject", "state"?, "minutes"?, "personalize"?, "log"?}
+    GET    /history               ?page=&page_size=&name=&subject=&method=&start=&end=
+    GET    /materials/{hash}
+    GET    /profiles              ?prefix=&page=&page_size=
+    GET    /profiles/{key}
+    PUT    /profiles/{key}        {"name", "method", "subject", "state"?, "minutes"?}
+    DELETE /profiles/{key}
+    GET    /timers
+    POST   /timers                {"session_id", "state"?, "minutes"?} or {"session_id", "work_minutes", "break_minutes", "cycles"?}
+    GET    /timers/{id}
+    POST   /timers/{id}/pause
+    POST   /timers/{id}/resume
+    DELETE /timers/{id}
+    GET    /metrics               (Prometheus text format)
+
+Typical run command: python -m src.app --serve 127.0.0.1:8765
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from rich.console import Console
+
+from src import metrics
+from src.blobs import content_hash, get_blobs
+from src.cache import cache_key
+from src.generation import GenerationResult, SingleFlight
+from src.history import get_backend, log_session
+from src.history_browser import HistoryFilter, HistoryPager
+from src.materials import parse_materials
+from src.profiles import PROFILES_FILE, ProfileStore
+from src.rules import classify
+from src.subjects import canonical_subject, get_subjects
+from src.timer_service import TimerService
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+SHARED_NAME = "Student"
+SERVICE_SOURCE = "Service"
+
+console = Console()
+
+
+class HTTPError(Exception):
+    """Raised by handlers to answer with an error status and message."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HTTPError(400, f"invalid JSON body: {e}") from None
+        if not isinstance(data, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return data
+
+    def int_param(self, name: str, default: int, minimum: int = 0, maximum: Optional[int] = None) -> int:
+        try:
+            value = int(self.query.get(name, default))
+        except ValueError:
+            raise HTTPError(400, f"'{name}' must be an integer") from None
+        value = max(minimum, value)
+        return min(maximum, value) if maximum is not None else value
+
+
+@dataclass
+class Response:
+    status: int = 200
+    payload: Any = None
+    content_type: str = "application/json"
+
+    def encode(self, keep_alive: bool) -> bytes:
+        if self.content_type == "application/json":
+            body = json.dumps(self.payload, ensure_ascii=False).encode("utf-8")
+        else:
+            body = str(self.payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {self.status} {HTTPStatus(self.status).phrase}\r\n"
+            f"Content-Type: {self.content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("ascii") + body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one HTTP/1.1 request; None when the client closed the connection."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431, "too many headers")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+    return Request(method.upper(), unquote(url.path), query, headers, body)
+
+
+#============================SERVICE=========================================
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class StudyBuddyService:
+    """The operations behind the HTTP API, independent of the transport.
+
+    `generate(prompt)` is the coroutine producing a `GenerationResult`
+    (default: the app's cached generation path with its shared LLM client).
+    Blocking storage work runs on one I/O thread, so profile and history
+    files are never written concurrently and the event loop never waits on
+    an fsync.
+    """
+
+    def __init__(
+        self,
+        generate: Optional[Callable[[str], Awaitable[GenerationResult]]] = None,
+        build_prompt: Optional[Callable[[str, str, str, int], str]] = None,
+        profiles: Optional[ProfileStore] = None,
+        timers: Optional[TimerService] = None,
+        valid_methods: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        max_profiles: Optional[int] = None,
+    ) -> None:
+        from src import app
+
+        self._generate = generate or app.generate_study_materials_async
+        self.build_prompt = build_prompt or app.build_prompt
+        self.profiles = profiles if profiles is not None else ProfileStore(PROFILES_FILE)
+        self.timers = timers or TimerService()
+        self.valid_methods = valid_methods or app.VALID_METHODS
+        self.model = model or app.MODEL_NAME
+        self.max_profiles = max_profiles or app.MAX_PROFILES
+        self.flights = SingleFlight()
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-io")
+        self.routes: List[Tuple[str, "re.Pattern", Handler]] = []
+        for method, pattern, handler in (
+            ("GET", "/health", self.health),
+            ("POST", "/generate", self.generate),
+            ("GET", "/history", self.history),
+            ("GET", "/materials/{digest}", self.materials),
+            ("GET", "/profiles", self.list_profiles),
+            ("GET", "/profiles/{key}", self.get_profile),
+            ("PUT", "/profiles/{key}", self.put_profile),
+            ("DELETE", "/profiles/{key}", self.delete_profile),
+            ("GET", "/timers", self.list_timers),
+            ("POST", "/timers", self.start_timer),
+            ("GET", "/timers/{session_id}", self.get_timer),
+            ("POST", "/timers/{session_id}/pause", self.pause_timer),
+            ("POST", "/timers/{session_id}/resume", self.resume_timer),
+            ("DELETE", "/timers/{session_id}", self.cancel_timer),
+            ("GET", "/metrics", self.metrics),
+        ):
+            regex = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", pattern) + "$")
+            self.routes.append((method, regex, handler))
+
+    async def io(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run blocking storage work on the service's I/O thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._io, lambda: fn(*args, **kwargs))
+
+    async def dispatch(self, request: Request) -> Response:
+        allowed = []
+        for method, regex, handler in self.routes:
+            match = regex.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                with metrics.span(f"http.{handler.__name__}"):
+                    result = await handler(request, **match.groupdict())
+            except HTTPError as e:
+                return Response(e.status, {"error": str(e)})
+            except KeyError as e:
+                return Response(404, {"error": str(e.args[0]) if e.args else "not found"})
+            except ValueError as e:
+                return Response(400, {"error": str(e)})
+            return result if isinstance(result, Response) else Response(200, result)
+        if allowed:
+            return Response(405, {"error": f"use {', '.join(allowed)}"})
+        return Response(404, {"error": f"no route for {request.path}"})
+
+    def close(self) -> None:
+        self._io.shutdown(wait=True)
+
+    # --------------------------------------------------------------- handlers
+
+    async def health(self, request: Request) -> dict:
+        return {"status": "ok", "timers": len(self.timers.sessions), "inflight_generations": len(self.flights._inflight)}
+
+    async def metrics(self, request: Request) -> Response:
+        return Response(200, metrics.METRICS.to_prometheus(), content_type="text/plain; version=0.0.4")
+
+    def _session_fields(self, body: dict) -> Dict[str, Any]:
+        name = str(body.get("name") or "").strip()
+        subject = canonical_subject(body.get("subject"))
+        method = str(body.get("method") or "").strip().capitalize()
+        if not name or not subject:
+            raise HTTPError(400, "'name' and 'subject' are required")
+        if method not in self.valid_methods:
+            raise HTTPError(400, f"'method' must be one of {', '.join(self.valid_methods)}")
+        try:
+            minutes = int(body.get("minutes") or 0)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'minutes' must be an integer") from None
+        return {
+            "name": name,
+            "method": method,
+            "subject": subject,
+            "state": str(body.get("state") or "focused").strip().lower(),
+            "minutes": minutes,
+        }
+
+    async def generate(self, request: Request) -> Response:
+        body = request.json()
+        fields = self._session_fields(body)
+        prompt_name = fields["name"] if body.get("personalize") else SHARED_NAME
+        prompt = self.build_prompt(prompt_name, fields["method"], fields["subject"], fields["minutes"])
+        result, shared = await self.flights.do(cache_key(prompt, self.model), lambda: self._generate(prompt))
+        if result.ok and body.get("log", True):
+            await self.io(
+                log_session,
+                fields["name"], fields["method"], fields["subject"], fields["state"], fields["minutes"], SERVICE_SOURCE,
+                response=result.text,
+            )
+        plan = classify(fields["state"], fields["minutes"] or None)
+        status = 200 if result.ok else (504 if result.status == "timeout" else 502)
+        materials = parse_materials(result.text) if result.ok else None
+        return Response(status, {
+            "status": result.status,
+            "text": result.text,
+            "materials": materials.to_dict() if materials is not None else None,
+            "error": result.error,
+            "shared": shared,
+            "material_hash": content_hash(result.text) if result.ok else None,
+            "mode": plan.label,
+            "mode_description": plan.description,
+        })
+
+    async def history(self, request: Request) -> dict:
+        page = request.int_param("page", 0)
+        page_size = request.int_param("page_size", 10, minimum=1, maximum=100)
+        filters = HistoryFilter(
+            name=request.query.get("name") or None,
+            subject=request.query.get("subject") or None,
+            method=request.query.get("method") or None,
+            start=request.query.get("start") or None,
+            end=request.query.get("end") or None,
+        )
+
+        def read() -> dict:
+            pager = HistoryPager(get_backend(), page_size, filters)
+            return {"page": page, "sessions": pager.page(page), "has_next": pager.has_page(page + 1)}
+
+        return await self.io(read)
+
+    async def materials(self, request: Request, digest: str) -> dict:
+        text = await self.io(get_blobs().get, digest)
+        if text is None:
+            raise HTTPError(404, f"no stored materials '{digest}'")
+        return {"material_hash": digest, "text": text}
+
+    async def list_profiles(self, request: Request) -> dict:
+        page = request.int_param("page", 0)
+        page_size = request.int_param("page_size", 10, minimum=1, maximum=100)
+        rows, total = await self.io(self.profiles.page, page, page_size, request.query.get("prefix", ""))
+        return {"total": total, "profiles": [{"key": key, **profile} for key, profile in rows]}
+
+    async def get_profile(self, request: Request, key: str) -> dict:
+        profile = await self.io(self.profiles.get, key)
+        if profile is None:
+            raise HTTPError(404, f"no profile '{key}'")
+        return {"key": key, **profile}
+
+    async def put_profile(self, request: Request, key: str) -> Response:
+        fields = self._session_fields(request.json())
+        fields["source"] = SERVICE_SOURCE
+
+        def put() -> bool:
+            created = key not in self.profiles
+            if created and len(self.profiles) >= self.max_profiles:
+                raise HTTPError(409, "the maximum number of profiles has been reached")
+            self.profiles.put(key, fields)
+            return created
+
+        created = await self.io(put)
+        return Response(201 if created else 200, {"key": key, **fields})
+
+    async def delete_profile(self, request: Request, key: str) -> dict:
+        if not await self.io(self.profiles.__contains__, key):
+            raise HTTPError(404, f"no profile '{key}'")
+        await self.io(self.profiles.delete, key)
+        return {"deleted": key}
+
+    async def list_timers(self, request: Request) -> dict:
+        return {"timers": [s.snapshot() for s in self.timers.sessions.values()]}
+
+    async def start_timer(self, request: Request) -> Response:
+        body = request.json()
+        session_id = str(body.get("session_id") or "").strip()
+        if not session_id:
+            raise HTTPError(400, "'session_id' is required")
+        if "work_minutes" in body:
+            try:
+                work, pause, cycles = float(body["work_minutes"]), float(body.get("break_minutes", 0)), int(body.get("cycles", 1))
+            except (TypeError, ValueError):
+                raise HTTPError(400, "'work_minutes' and 'break_minutes' must be numbers and 'cycles' an integer") from None
+            description = f"{work:g} min work / {pause:g} min break, {cycles} cycles"
+        else:
+            plan = classify(body.get("state"), body.get("minutes"))
+            work, pause, cycles, description = plan.work, plan.break_, plan.cycles, plan.description
+        if work <= 0 or cycles <= 0:
+            raise HTTPError(400, f"no timer for this plan ({description})")
+        session = self.timers.start(session_id, work * 60, pause * 60, cycles)
+        return Response(201, {**session.snapshot(), "mode_description": description})
+
+    def _timer(self, session_id: str):
+        session = self.timers.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"no timer session '{session_id}'")
+        return session
+
+    async def get_timer(self, request: Request, session_id: str) -> dict:
+        return self._timer(session_id).snapshot()
+
+    async def pause_timer(self, request: Request, session_id: str) -> dict:
+        self._timer(session_id)
+        return self.timers.pause(session_id).snapshot()
+
+    async def resume_timer(self, request: Request, session_id: str) -> dict:
+        self._timer(session_id)
+        return self.timers.resume(session_id).snapshot()
+
+    async def cancel_timer(self, request: Request, session_id: str) -> dict:
+        self._timer(session_id)
+        self.timers.cancel(session_id)
+        return {"cancelled": session_id}
+
+
+#============================TRANSPORT=======================================
+
+async def handle_connection(service: StudyBuddyService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Serve requests on one (keep-alive) connection until the client closes it."""
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except HTTPError as e:
+                writer.write(Response(e.status, {"error": str(e)}).encode(keep_alive=False))
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if request is None:
+                break
+            metrics.incr("http_requests")
+            try:
+                response = await service.dispatch(request)
+            except Exception as e:
+                console.print(f"[bold red]Error handling {request.method} {request.path}:[/bold red] {e}")
+                response = Response(500, {"error": "internal server error"})
+            keep_alive = request.headers.get("connection", "").lower() != "close"
+            writer.write(response.encode(keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start_server(
+    service: Optional[StudyBuddyService] = None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> Tuple[asyncio.AbstractServer, StudyBuddyService, asyncio.Task]:
+    """Start listening and running the timers; returns (server, service, timer task)."""
+    service = service or StudyBuddyService()
+    await service.io(get_subjects)  # build the subject index before the first request needs it
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    timers = asyncio.ensure_future(service.timers.run())
+    return server, service, timers
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    server, service, timers = await start_server(host=host, port=port)
+    address = server.sockets[0].getsockname()
+    console.print(f"[bold green]Study Buddy service listening on http://{address[0]}:{address[1]}[/bold green] (Ctrl+C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        timers.cancel()
+        service.close()
+
+
+def parse_address(text: Optional[str]) -> Tuple[str, int]:
+    """``HOST:PORT``, ``:PORT`` or ``PORT`` -> (host, port). Raises ValueError for anything else."""
+    if not text:
+        return DEFAULT_HOST, DEFAULT_PORT
+    host, _, port = text.rpartition(":")
+    if not port.isdigit() or not 0 <= int(port) <= 65535:
+        raise ValueError(f"Invalid address '{text}': expected HOST:PORT, :PORT or PORT (e.g. 127.0.0.1:{DEFAULT_PORT})")
+    return host or DEFAULT_HOST, int(port)
+
+
+def run_server(address: Optional[str] = None) -> None:
+    """Blocking entry point used by ``--serve``."""
+    try:
+        host, port = parse_address(address)
+    except ValueError as e:
+        console.print(f"[bold red]{e}[/bold red]")
+        raise SystemExit(2) from None
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        console.print("\n[bold red]Service stopped.[/bold red]")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve Pomodoro Study Buddy over a local HTTP API.")
+    parser.add_argument("address", nargs="?", default=None, help=f"HOST:PORT to listen on (default {DEFAULT_HOST}:{DEFAULT_PORT}).")
+    args = parser.parse_args(argv)
+    run_server(args.address)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Startup-time measurement for Pomodoro Study Buddy.
+
+The CLI keeps its heavy dependencies (google-genai, python-dotenv,
+rich.markdown, ...) out of the import path and loads them on first use.
+This module records how long those stages take so `--startup-profile`
+can show where cold-start time goes.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from src import metrics
+
+# (stage name, seconds) in the order the stages ran in this process.
+STAGES: List[Tuple[str, float]] = []
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a startup stage (an import, client construction, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, started)
+
+
+def record(name: str, started: float) -> None:
+    """Record a stage that began at `started` (a time.perf_counter() value)."""
+    seconds = time.perf_counter() - started
+    STAGES.append((name, seconds))
+    metrics.observe(f"startup.{name}", seconds)
+
+
+def import_breakdown(statement: str, top: int = 12) -> List[Tuple[str, float]]:
+    """Run `statement` in a fresh interpreter with ``-X importtime``.
+
+    Returns the `top` top-level packages by total self import time (seconds),
+    which is what a cold CLI launch pays before doing any work.
+    """
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", os.getcwd())
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    totals: Dict[str, float] = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, _cumulative, name = (part.strip() for part in line[len("import time:"):].split("|", 2))
+            totals[name.split(".")[0]] += int(self_us) / 1_000_000
+        except ValueError:
+            continue  # header line
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
@@ -0,0 +1,279 @@
+"""Study statistics for Pomodoro Study Buddy.
+
+`StudyStats` keeps materialized rollups of the session history in
+``study_stats.json``: session counts and minutes per user, subject and
+method, sessions per day, state distribution and study streaks. Each logged
+session updates the rollups incrementally (`record`), so reading them is a
+dictionary lookup no matter how long the history grows.
+
+The rollups are derived data: `rebuild` recomputes them from the raw history,
+and they are rebuilt automatically when the file is missing. From the command
+line::
+
+    python -m src.stats rebuild
+"""
+
+import argparse
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from src.durable import atomic_write_json, file_lock
+
+STATS_FILE = "study_stats.json"
+DIMENSIONS = ("user", "subject", "method")
+_FIELDS = {"user": "name", "subject": "subject", "method": "method"}
+
+console = Console()
+
+_stats: Optional["StudyStats"] = None
+
+
+def _empty() -> dict:
+    return {
+        "version": 1,
+        "sessions": 0,
+        "minutes": 0,
+        "by_user": {},
+        "by_subject": {},
+        "by_method": {},
+        "by_state": {},
+        "per_day": {},
+        "streak": {"last_day": None, "days": 0},
+        "user_streaks": {},
+    }
+
+
+def _minutes(record: dict) -> int:
+    try:
+        return int(record.get("minutes") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _bump_streak(streak: dict, day: str) -> None:
+    """Extend a streak with a study day. Days at or before the last one are ignored."""
+    last = streak.get("last_day")
+    if last is not None and day <= last:
+        return
+    yesterday = (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+    streak["days"] = streak["days"] + 1 if last == yesterday else 1
+    streak["last_day"] = day
+
+
+class StudyStats:
+    """Incrementally maintained study rollups backed by a small JSON file."""
+
+    def __init__(self, path: str = STATS_FILE) -> None:
+        self.path = path
+        self._data = _empty()
+        self._sig: Optional[tuple] = None
+        self._load()
+
+    # ------------------------------------------------------------- persistence
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load(self) -> bool:
+        """Re-read the file if it changed. Returns True if it was unreadable and rebuilt from history."""
+        sig = self._signature()
+        if sig == self._sig:
+            return False
+        data = _empty()
+        if sig is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if not isinstance(loaded, dict):
+                    raise ValueError("not a JSON object")
+                data.update(loaded)
+            except (OSError, ValueError) as e:
+                # Saving empty rollups over the file would lose every total; recompute them instead.
+                console.print(f"[bold yellow]{self.path} is unreadable ({e}); rebuilding it from the session history.[/bold yellow]")
+                from src.history import get_backend
+
+                self.rebuild(get_backend().iter_newest())
+                return True
+        self._data = data
+        self._sig = sig
+        return False
+
+    def _save(self) -> None:
+        atomic_write_json(self.path, self._data, indent=None)
+        self._sig = self._signature()
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    # ----------------------------------------------------------------- updates
+
+    def _apply(self, record: dict) -> None:
+        data = self._data
+        minutes = _minutes(record)
+        data["sessions"] += 1
+        data["minutes"] += minutes
+        for dimension in DIMENSIONS:
+            key = str(record.get(_FIELDS[dimension]) or "Unknown")
+            bucket = data[f"by_{dimension}"].setdefault(key, {"sessions": 0, "minutes": 0})
+            bucket["sessions"] += 1
+            bucket["minutes"] += minutes
+        state = str(record.get("state") or "unknown").lower()
+        data["by_state"][state] = data["by_state"].get(state, 0) + 1
+        day = (record.get("timestamp") or "")[:10]
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            return
+        data["per_day"][day] = data["per_day"].get(day, 0) + 1
+        _bump_streak(data["streak"], day)
+        user = str(record.get("name") or "Unknown")
+        _bump_streak(data["user_streaks"].setdefault(user, {"last_day": None, "days": 0}), day)
+
+    def record(self, record: dict) -> None:
+        """Fold one newly logged session into the rollups."""
+        self.record_many([record])
+
+    def record_many(self, records: Iterable[dict]) -> None:
+        """Fold several sessions (oldest first, already in the history) into the rollups with one write."""
+        with file_lock(self.path):
+            if self._load():
+                return  # rebuilt from the history, which already holds `records`
+            for record in records:
+                self._apply(record)
+            self._save()
+
+    def rebuild(self, records: Iterable[dict]) -> int:
+        """Recompute every rollup from raw history records (any order). Returns the count."""
+        ordered = sorted(records, key=lambda r: r.get("timestamp") or "")
+        with file_lock(self.path):
+            self._data = _empty()
+            for record in ordered:
+                self._apply(record)
+            self._save()
+        return len(ordered)
+
+    # ----------------------------------------------------------------- queries
+
+    def totals(self) -> Dict[str, int]:
+        self._load()
+        return {"sessions": self._data["sessions"], "minutes": self._data["minutes"]}
+
+    def breakdown(self, dimension: str) -> Dict[str, Dict[str, int]]:
+        """Sessions and minutes per user, subject or method."""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'. Choose from: {', '.join(DIMENSIONS)}")
+        self._load()
+        return self._data[f"by_{dimension}"]
+
+    def sessions_per_day(self) -> Dict[str, int]:
+        self._load()
+        return self._data["per_day"]
+
+    def state_distribution(self) -> Dict[str, int]:
+        self._load()
+        return self._data["by_state"]
+
+    def current_streak(self, name: Optional[str] = None, today: Optional[date] = None) -> int:
+        """Consecutive study days ending today or yesterday (0 once a day is missed)."""
+        self._load()
+        streak = self._data["streak"] if name is None else self._data["user_streaks"].get(name)
+        if not streak or not streak.get("last_day"):
+            return 0
+        today = today or date.today()
+        if streak["last_day"] < (today - timedelta(days=1)).isoformat():
+            return 0
+        return streak["days"]
+
+
+def get_stats() -> StudyStats:
+    """Return the shared rollups, rebuilding them from history if the file is missing."""
+    global _stats
+    if _stats is None:
+        stats = StudyStats()
+        if not stats.exists:
+            from src.history import get_backend
+
+            backend = get_backend()
+            if backend.count():
+                stats.rebuild(backend.iter_newest())
+        _stats = stats
+    return _stats
+
+
+def set_stats(stats: Optional[StudyStats]) -> None:
+    """Swap the shared rollups (None re-opens ``study_stats.json`` on next use)."""
+    global _stats
+    _stats = stats
+
+
+def _top(rows: Dict[str, Dict[str, int]], limit: int) -> List[tuple]:
+    return sorted(rows.items(), key=lambda kv: (-kv[1]["minutes"], kv[0]))[:limit]
+
+
+def print_stats(stats: Optional[StudyStats] = None, limit: int = 10) -> None:
+    """Render the rollups as rich tables (--stats)."""
+    stats = stats or get_stats()
+    totals = stats.totals()
+    if not totals["sessions"]:
+        console.print("\n[bold yellow]No study sessions recorded yet.[/bold yellow]")
+        return
+    console.print(
+        f"\n[bold green]{totals['sessions']} sessions, {totals['minutes']} minutes studied.[/bold green] "
+        f"Current streak: [bold]{stats.current_streak()}[/bold] day(s)."
+    )
+    for dimension in DIMENSIONS:
+        table = Table(title=f"Top {dimension.title()}s by Minutes", show_header=True, header_style="bold magenta")
+        table.add_column(dimension.title(), style="cyan")
+        table.add_column("Sessions", justify="right")
+        table.add_column("Minutes", style="green", justify="right")
+        if dimension == "user":
+            table.add_column("Streak", justify="right")
+        for key, bucket in _top(stats.breakdown(dimension), limit):
+            row = [key, str(bucket["sessions"]), str(bucket["minutes"])]
+            if dimension == "user":
+                row.append(str(stats.current_streak(key)))
+            table.add_row(*row)
+        console.print(table)
+
+    states = Table(title="Energy States", show_header=True, header_style="bold magenta")
+    states.add_column("State", style="cyan")
+    states.add_column("Sessions", justify="right")
+    for state, count in sorted(stats.state_distribution().items(), key=lambda kv: -kv[1]):
+        states.add_row(state, str(count))
+    console.print(states)
+
+    days = Table(title="Sessions per Day (last 14 days studied)", show_header=True, header_style="bold magenta")
+    days.add_column("Day", style="cyan")
+    days.add_column("Sessions", justify="right")
+    for day, count in sorted(stats.sessions_per_day().items())[-14:]:
+        days.add_row(day, str(count))
+    console.print(days)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Study statistics rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recompute study_stats.json from the session history.")
+    sub.add_parser("show", help="Print the statistics.")
+    args = parser.parse_args(argv)
+    if args.command == "rebuild":
+        from src.history import get_backend
+
+        count = StudyStats().rebuild(get_backend().iter_newest())
+        console.print(f"[bold green]Rebuilt statistics from {count} sessions.[/bold green]")
+    else:
+        print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,602 @@
+"""Storage engines for the session history.
+
+`src.history` talks to a `HistoryBackend` instead of reading and rewriting
+`session_history.json` on every call. Four engines are available:
+
+* ``json``   - the original single JSON array (kept for compatibility; O(n) writes).
+* ``ndjson`` - an append-only newline-delimited JSON log with a fixed-width
+  offset index, so appends and "last N sessions" reads are O(1)/O(N).
+* ``sqlite`` - a SQLite database in WAL mode indexed by timestamp, name and subject.
+* ``segmented`` - monthly NDJSON segments, compressed once closed, with a
+  manifest and retention (see `src.segments`).
+
+The engine is chosen with the ``STUDY_BUDDY_HISTORY_BACKEND`` environment
+variable (default ``segmented``). Existing ``session_history.json`` and the
+older ``study_log.json`` data (or a ``session_history.ndjson`` log written by
+the ``ndjson`` engine) can be imported with `migrate_legacy`, or from the
+command line::
+
+    python -m src.storage migrate --backend sqlite
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import struct
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from src import metrics
+from src.blobs import get_blobs
+from src.cache import is_cacheable
+from src.durable import atomic_write_bytes, atomic_write_json, atomic_writer, file_lock
+
+LEGACY_HISTORY_FILE = "session_history.json"
+STUDY_LOG_FILE = "study_log.json"
+NDJSON_HISTORY_FILE = "session_history.ndjson"
+SQLITE_HISTORY_FILE = "session_history.db"
+DEFAULT_BACKEND = "segmented"
+BACKEND_ENV_VAR = "STUDY_BUDDY_HISTORY_BACKEND"
+MERGE_CHUNK_RECORDS = 500
+
+# Each index slot is one unsigned 64-bit byte offset into the data file.
+_OFFSET = struct.Struct("<Q")
+
+
+def _timestamp(record: dict) -> str:
+    return str(record.get("timestamp") or "")
+
+
+def _chunks(entries: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    source = iter(entries)
+    chunk = list(itertools.islice(source, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(source, size))
+
+
+class HistoryBackend:
+    """Interface every session-history store implements.
+
+    Records are plain dicts. Readers always receive them newest first, which
+    is the order `session_history.json` has always used.
+    """
+
+    name = "base"
+
+    def append(self, entry: dict) -> None:
+        """Persist one new session record."""
+        raise NotImplementedError
+
+    def extend(self, entries: Iterable[dict]) -> None:
+        """Persist several records (oldest first) in one go."""
+        for entry in entries:
+            self.append(entry)
+
+    def merge(self, entries: Iterable[dict], chunk_size: int = MERGE_CHUNK_RECORDS) -> None:
+        """Persist records of any age (an import, oldest first), keeping readers newest first.
+
+        `entries` may be a generator of any length. If none is older than the
+        stored records they are appended `chunk_size` at a time; otherwise
+        the history is rewritten once with `entries` merged in by timestamp
+        (see `_rewrite_merged`). Backends that can place old records
+        directly override this.
+        """
+        chunks = _chunks(entries, chunk_size)
+        first = next(chunks, None)
+        if first is None:
+            return
+        newest = self.latest(1)
+        if newest and _timestamp(first[0]) < _timestamp(newest[0]):
+            self._rewrite_merged(itertools.chain(first, *chunks))
+            return
+        for chunk in itertools.chain([first], chunks):
+            self.extend(chunk)
+
+    def _rewrite_merged(self, entries: Iterator[dict]) -> None:
+        """Rewrite the history with `entries` (oldest first) merged in by timestamp.
+
+        This generic version holds the whole history in memory; backends
+        that can stream the rewrite override it.
+        """
+        stored = list(self.iter_newest())
+        merged = list(heapq.merge(reversed(stored), entries, key=_timestamp))
+        merged.reverse()
+        self.replace_all(merged)
+
+    def latest(self, limit: int) -> List[dict]:
+        """Return up to `limit` of the most recent records, newest first."""
+        raise NotImplementedError
+
+    def iter_newest(self) -> Iterator[dict]:
+        """Yield every record, newest first."""
+        raise NotImplementedError
+
+    def iter_between(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """Yield records with ``start <= timestamp <= end`` (either bound optional), newest first."""
+        for record in self.iter_newest():
+            ts = record.get("timestamp") or ""
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                yield record
+
+    def replace_all(self, entries: List[dict]) -> None:
+        """Replace the whole history with `entries` (given newest first)."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Return the number of stored records."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release any open handles."""
+
+
+class JsonArrayBackend(HistoryBackend):
+    """The original storage format: one JSON array, newest record first."""
+
+    name = "json"
+
+    def __init__(self, path: str = LEGACY_HISTORY_FILE) -> None:
+        self.path = path
+
+    def _load(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: Iterable[dict]) -> None:
+        # Read-modify-write under the lock so concurrent CLIs never drop each other's sessions.
+        with file_lock(self.path):
+            history = self._load()
+            for entry in entries:
+                history.insert(0, entry)
+            atomic_write_json(self.path, history)
+
+    def latest(self, limit: int) -> List[dict]:
+        return self._load()[:limit]
+
+    def iter_newest(self) -> Iterator[dict]:
+        return iter(self._load())
+
+    def _rewrite_merged(self, entries: Iterator[dict]) -> None:
+        with file_lock(self.path):  # the whole array is rewritten anyway; keep the read and write together
+            super()._rewrite_merged(entries)
+
+    def replace_all(self, entries: List[dict]) -> None:
+        with file_lock(self.path):
+            atomic_write_json(self.path, entries)
+
+    def count(self) -> int:
+        return len(self._load())
+
+
+class NdjsonBackend(HistoryBackend):
+    """Append-only NDJSON log with a tail index.
+
+    The data file holds one JSON record per line, oldest first. A sidecar
+    ``.idx`` file stores the byte offset of every line as a fixed-width
+    integer, so the newest N records can be located by reading the last
+    N index slots instead of scanning the log.
+    """
+
+    name = "ndjson"
+
+    def __init__(self, path: str = NDJSON_HISTORY_FILE) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        self._lock = threading.Lock()
+        self._checked = False
+
+    # ----------------------------------------------------------- index upkeep
+
+    def _ensure_index(self) -> None:
+        """Rebuild the index if it is missing or out of step with the log."""
+        if self._checked:
+            return
+        if not self._index_matches():
+            with file_lock(self.path):
+                if not self._index_matches():
+                    self.rebuild_index()
+        self._checked = True
+
+    def _index_matches(self) -> bool:
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if not os.path.exists(self.index_path):
+            return data_size == 0
+        index_size = os.path.getsize(self.index_path)
+        if index_size % _OFFSET.size:
+            return False
+        if index_size == 0:
+            return data_size == 0
+        with open(self.index_path, "rb") as idx:
+            idx.seek(index_size - _OFFSET.size)
+            (last_offset,) = _OFFSET.unpack(idx.read(_OFFSET.size))
+        if last_offset >= data_size:
+            return False
+        with open(self.path, "rb") as data:
+            data.seek(last_offset)
+            data.readline()
+            return data.tell() == data_size
+
+    def rebuild_index(self) -> None:
+        """Recreate the offset index by scanning the data file once.
+
+        A torn final line (a crash mid-append) is truncated away first.
+        """
+        offsets = []
+        if os.path.exists(self.path):
+            with open(self.path, "rb+") as data:
+                offset = 0
+                for line in data:
+                    if not line.endswith(b"\n"):
+                        data.truncate(offset)
+                        break
+                    if line.strip():
+                        offsets.append(_OFFSET.pack(offset))
+                    offset += len(line)
+        atomic_write_bytes(self.index_path, b"".join(offsets))
+
+    def _read_offsets(self, start: int, stop: int) -> List[int]:
+        with open(self.index_path, "rb") as idx:
+            idx.seek(start * _OFFSET.size)
+            raw = idx.read((stop - start) * _OFFSET.size)
+        return [value for (value,) in _OFFSET.iter_unpack(raw)]
+
+    def _read_records(self, offsets: Iterable[int]) -> List[dict]:
+        records = []
+        with open(self.path, "rb") as data:
+            for offset in offsets:
+                data.seek(offset)
+                records.append(json.loads(data.readline()))
+        return records
+
+    # -------------------------------------------------------------- interface
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: Iterable[dict]) -> None:
+        """Append records with one lock, one write and one fsync per file.
+
+        Data is made durable before the index that points at it, so readers
+        never see an offset past the end of the log. If a previous writer
+        crashed between the two, the index is rebuilt first.
+        """
+        lines = [(json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in entries]
+        if not lines:
+            return
+        with self._lock, file_lock(self.path):
+            if not self._index_matches():
+                self.rebuild_index()
+            self._checked = True
+            payload = b"".join(lines)
+            with open(self.path, "ab") as data:
+                offset = data.seek(0, os.SEEK_END)
+                data.write(payload)
+                data.flush()
+                os.fsync(data.fileno())
+            offsets = []
+            for line in lines:
+                offsets.append(_OFFSET.pack(offset))
+                offset += len(line)
+            with open(self.index_path, "ab") as idx:
+                idx.write(b"".join(offsets))
+                idx.flush()
+                os.fsync(idx.fileno())
+        metrics.incr("history_bytes_written", len(payload))
+
+    def count(self) -> int:
+        with self._lock:
+            self._ensure_index()
+            return os.path.getsize(self.index_path) // _OFFSET.size if os.path.exists(self.index_path) else 0
+
+    def latest(self, limit: int) -> List[dict]:
+        total = self.count()
+        if limit <= 0 or total == 0:
+            return []
+        offsets = self._read_offsets(max(0, total - limit), total)
+        return self._read_records(reversed(offsets))
+
+    def iter_newest(self, chunk_size: int = 256) -> Iterator[dict]:
+        stop = self.count()
+        while stop > 0:
+            start = max(0, stop - chunk_size)
+            offsets = self._read_offsets(start, stop)
+            yield from self._read_records(reversed(offsets))
+            stop = start
+
+    def _stored_lines(self) -> Iterator[Tuple[str, bytes]]:
+        """(timestamp, raw line) for every stored record, oldest first, read one line at a time."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as data:
+            for line in data:
+                if line.strip():
+                    yield _timestamp(json.loads(line)), line
+
+    def _rewrite_merged(self, entries: Iterator[dict]) -> None:
+        """Stream the log and `entries` (oldest first) into a new log and index, then swap them in.
+
+        Stored lines are copied as they are and imported ones encoded as
+        they arrive, so memory use does not grow with either. The log is
+        renamed into place before its index; a crash in between leaves an
+        index that no longer matches, which is rebuilt on next use.
+        """
+        imported = ((_timestamp(e), (json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8")) for e in entries)
+        with self._lock, file_lock(self.path):
+            if not self._index_matches():
+                self.rebuild_index()
+            offset = 0
+            with atomic_writer(self.index_path) as idx, atomic_writer(self.path) as data:
+                for _ts, line in heapq.merge(self._stored_lines(), imported, key=lambda pair: pair[0]):
+                    data.write(line)
+                    idx.write(_OFFSET.pack(offset))
+                    offset += len(line)
+            self._checked = True
+        metrics.incr("history_bytes_written", offset)
+
+    def replace_all(self, entries: List[dict]) -> None:
+        data, offsets, offset = [], [], 0
+        for entry in reversed(entries):
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            data.append(line)
+            offsets.append(_OFFSET.pack(offset))
+            offset += len(line)
+        with self._lock, file_lock(self.path):
+            atomic_write_bytes(self.path, b"".join(data))
+            atomic_write_bytes(self.index_path, b"".join(offsets))
+            self._checked = True
+
+
+class SqliteBackend(HistoryBackend):
+    """SQLite store (WAL mode) indexed by timestamp, name and subject.
+
+    Indexed columns are kept alongside the full JSON record so that extra
+    fields added to session entries survive a round trip.
+    """
+
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            name TEXT,
+            subject TEXT,
+            method TEXT,
+            state TEXT,
+            minutes INTEGER,
+            source TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_timestamp ON sessions(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_sessions_name ON sessions(name);
+        CREATE INDEX IF NOT EXISTS idx_sessions_subject ON sessions(subject);
+    """
+
+    def __init__(self, path: str = SQLITE_HISTORY_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    @staticmethod
+    def _row(entry: dict) -> tuple:
+        return (
+            entry.get("timestamp", ""),
+            entry.get("name"),
+            entry.get("subject"),
+            entry.get("method"),
+            entry.get("state"),
+            entry.get("minutes"),
+            entry.get("source"),
+            json.dumps(entry, ensure_ascii=False),
+        )
+
+    _INSERT = (
+        "INSERT INTO sessions (timestamp, name, subject, method, state, minutes, source, record) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def append(self, entry: dict) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: Iterable[dict]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(self._INSERT, (self._row(e) for e in entries))
+
+    def merge(self, entries: Iterable[dict], chunk_size: int = MERGE_CHUNK_RECORDS) -> None:
+        for chunk in _chunks(entries, chunk_size):
+            self.extend(chunk)  # reads are ordered by the timestamp index
+
+    def latest(self, limit: int) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM sessions ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def _iter_query(self, where: str, params: tuple, chunk_size: int) -> Iterator[dict]:
+        """Yield records newest first, `chunk_size` rows per query.
+
+        Keyset pagination on ``(timestamp, id)`` holds the lock only while a
+        page is fetched, so memory stays constant and writers are not blocked
+        while the caller consumes the records.
+        """
+        query = f"SELECT timestamp, id, record FROM sessions WHERE {where} {{}} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        first, rest = query.format(""), query.format("AND (timestamp < ? OR (timestamp = ? AND id < ?))")
+        with self._lock:
+            rows = self._conn.execute(first, params + (chunk_size,)).fetchall()
+        while rows:
+            for _ts, _id, record in rows:
+                yield json.loads(record)
+            if len(rows) < chunk_size:
+                return
+            ts, row_id, _record = rows[-1]
+            with self._lock:
+                rows = self._conn.execute(rest, params + (ts, ts, row_id, chunk_size)).fetchall()
+
+    def iter_newest(self, chunk_size: int = 256) -> Iterator[dict]:
+        return self._iter_query("1", (), chunk_size)
+
+    def iter_between(
+        self, start: Optional[str] = None, end: Optional[str] = None, chunk_size: int = 256
+    ) -> Iterator[dict]:
+        return self._iter_query(
+            "timestamp >= ? AND timestamp <= ?", (start or "", end if end is not None else "\uffff"), chunk_size
+        )
+
+    def replace_all(self, entries: List[dict]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.executemany(self._INSERT, (self._row(e) for e in reversed(entries)))
+
+    def count(self) -> int:
+        with self._lock:
+            (total,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return total
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    JsonArrayBackend.name: JsonArrayBackend,
+    NdjsonBackend.name: NdjsonBackend,
+    SqliteBackend.name: SqliteBackend,
+    "segmented": None,  # src.segments builds on this module, so it is imported on demand
+}
+
+
+def open_backend(name: Optional[str] = None, path: Optional[str] = None) -> HistoryBackend:
+    """Instantiate a history backend by name (defaults to the env/config choice)."""
+    name = (name or os.getenv(BACKEND_ENV_VAR) or DEFAULT_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown history backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    backend_cls = BACKENDS[name]
+    if backend_cls is None:
+        from src.segments import SegmentedBackend
+
+        backend_cls = SegmentedBackend
+    return backend_cls(path) if path else backend_cls()
+
+
+#============================LEGACY MIGRATION================================
+
+def _read_json_array(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def _from_study_log(record: dict) -> dict:
+    """Convert an old `study_log.json` record into the session-history shape.
+
+    The full content goes into the blob store, so it can still be re-opened.
+    """
+    content = record.get("content") or ""
+    preview = content[:200].replace("\n", " ")
+    converted = {
+        "timestamp": record.get("timestamp", ""),
+        "name": record.get("name"),
+        "subject": record.get("subject"),
+        "method": record.get("method"),
+        "state": record.get("state"),
+        "minutes": record.get("minutes"),
+        "source": "legacy/study_log",
+        "material_preview": preview + ("..." if content else ""),
+    }
+    if is_cacheable(content):
+        converted["material_hash"] = get_blobs().put(content)
+    return converted
+
+
+def _read_ndjson(path: str) -> List[dict]:
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            if line.endswith(b"\n") and line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+def legacy_records(
+    history_file: str = LEGACY_HISTORY_FILE,
+    study_log_file: str = STUDY_LOG_FILE,
+    ndjson_file: Optional[str] = NDJSON_HISTORY_FILE,
+) -> List[dict]:
+    """Return every record from the legacy files, oldest first.
+
+    An existing NDJSON log already contains the imported JSON history, so
+    when one is present it is used instead of the two JSON files.
+    """
+    if ndjson_file and os.path.exists(ndjson_file) and os.path.getsize(ndjson_file) > 0:
+        return _read_ndjson(ndjson_file)
+    records = list(reversed(_read_json_array(history_file)))
+    records.extend(_from_study_log(r) for r in _read_json_array(study_log_file))
+    records.sort(key=lambda r: r.get("timestamp") or "")
+    return records
+
+
+def migrate_legacy(
+    backend: HistoryBackend,
+    history_file: str = LEGACY_HISTORY_FILE,
+    study_log_file: str = STUDY_LOG_FILE,
+    force: bool = False,
+) -> int:
+    """Import `session_history.json` and `study_log.json` into `backend`.
+
+    Only runs against an empty store unless `force` is set, so calling it
+    twice never duplicates records. Returns the number of imported records.
+    """
+    if isinstance(backend, JsonArrayBackend) and os.path.abspath(backend.path) == os.path.abspath(history_file):
+        return 0
+    if not force and backend.count() > 0:
+        return 0
+    ndjson_file = None if isinstance(backend, NdjsonBackend) else NDJSON_HISTORY_FILE
+    records = legacy_records(history_file, study_log_file, ndjson_file)
+    backend.extend(records)
+    return len(records)
+
+
+def has_legacy_data(history_file: str = LEGACY_HISTORY_FILE, study_log_file: str = STUDY_LOG_FILE) -> bool:
+    """True if any legacy file (JSON history, study log or NDJSON log) has data."""
+    return any(
+        os.path.exists(p) and os.path.getsize(p) > 2 for p in (history_file, study_log_file, NDJSON_HISTORY_FILE)
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Session history storage tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import session_history.json and study_log.json into a backend.")
+    migrate.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="Target backend (default: configured backend).")
+    migrate.add_argument("--path", default=None, help="Target file (default: the backend's standard file).")
+    migrate.add_argument("--force", action="store_true", help="Import even if the target already has records.")
+    args = parser.parse_args(argv)
+
+    backend = open_backend(args.backend, args.path)
+    try:
+        imported = migrate_legacy(backend, force=args.force)
+        print(f"Imported {imported} records into the {backend.name} backend ({backend.count()} total).")
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Subject normalization, autocomplete and fuzzy matching.
+
+Subjects are free text, so "math", "Math " and "MATH" would otherwise be
+three cache entries, three profiles and three statistics buckets.
+`SubjectIndex` maps every spelling to a normalized key (Unicode NFKC,
+accents stripped, case-folded, whitespace collapsed) and remembers the most
+used spelling of each key as its canonical form. It answers:
+
+* `canonical(text)` - the canonical spelling of an equivalent subject;
+* `complete(prefix)` - the most used subjects starting with `prefix`, from a
+  trie whose nodes keep their own top-ranked keys, so a lookup is a walk of
+  ``len(prefix)`` nodes however many subjects there are;
+* `suggest(text)` - close matches by character-trigram similarity, for
+  typos ("biolgy" -> "Biology").
+
+The index is built from the statistics rollups (which already count the
+sessions per subject spelling) plus saved profiles, and is updated as new
+sessions are logged.
+"""
+
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOP_PER_NODE = 8
+MIN_SIMILARITY = 0.45
+
+
+def normalize_subject(text: object) -> str:
+    """The matching key for a subject: NFKC, no accents, case-folded, single spaces."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def clean_subject(text: object) -> str:
+    """A subject as the user typed it, minus stray whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", str(text or "")).split())
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.top: List[str] = []  # keys below this node, most used first
+
+
+class SubjectIndex:
+    """Canonical spellings, a prefix trie and a trigram index over known subjects."""
+
+    def __init__(self, top_per_node: int = TOP_PER_NODE) -> None:
+        self.top_per_node = top_per_node
+        self._lock = threading.Lock()
+        self._spellings: Dict[str, Counter] = {}
+        self._counts: Counter = Counter()
+        self._root = _Node()
+        self._grams: Dict[str, Set[str]] = {}
+        self._gram_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, text: object) -> bool:
+        return normalize_subject(text) in self._counts
+
+    # ---------------------------------------------------------------- updates
+
+    def add(self, subject: object, count: int = 1) -> None:
+        """Record `count` uses of `subject` (blank subjects are ignored)."""
+        spelling = clean_subject(subject)
+        key = normalize_subject(spelling)
+        if not key or count <= 0:
+            return
+        with self._lock:
+            if key not in self._counts:
+                self._spellings[key] = Counter()
+                grams = trigrams(key)
+                self._gram_counts[key] = len(grams)
+                for gram in grams:
+                    self._grams.setdefault(gram, set()).add(key)
+            self._spellings[key][spelling] += count
+            self._counts[key] += count
+            self._rank(key)
+
+    def add_many(self, subjects: Iterable[Tuple[object, int]]) -> None:
+        for subject, count in subjects:
+            self.add(subject, count)
+
+    def _rank(self, key: str) -> None:
+        """Refresh `key`'s place in the top lists along its trie path (counts only grow)."""
+        node = self._root
+        count = self._counts[key]
+        for depth in range(len(key) + 1):
+            top = node.top
+            if key in top:
+                top.remove(key)
+            if len(top) < self.top_per_node or count > self._counts[top[-1]]:
+                position = len(top)
+                while position and self._counts[top[position - 1]] < count:
+                    position -= 1
+                top.insert(position, key)
+                del top[self.top_per_node:]
+            if depth < len(key):
+                node = node.children.setdefault(key[depth], _Node())
+
+    # ---------------------------------------------------------------- lookups
+
+    def display(self, key: str) -> str:
+        """The most used spelling of a normalized key."""
+        return self._spellings[key].most_common(1)[0][0]
+
+    def canonical(self, text: object) -> Optional[str]:
+        """The canonical spelling of a known equivalent subject, else None."""
+        key = normalize_subject(text)
+        with self._lock:
+            return self.display(key) if key in self._counts else None
+
+    def complete(self, prefix: object, limit: int = 5) -> List[str]:
+        """Known subjects starting with `prefix`, most used first."""
+        key = normalize_subject(prefix)
+        with self._lock:
+            node = self._root
+            for ch in key:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            return [self.display(k) for k in node.top[:limit]]
+
+    def suggest(self, text: object, limit: int = 3, min_similarity: float = MIN_SIMILARITY) -> List[str]:
+        """Known subjects that look like `text` (Dice similarity of character trigrams)."""
+        key = normalize_subject(text)
+        if not key:
+            return []
+        grams = trigrams(key)
+        with self._lock:
+            shared: Counter = Counter()
+            for gram in grams:
+                shared.update(self._grams.get(gram, ()))
+            scored = []
+            for candidate, overlap in shared.items():
+                score = 2 * overlap / (len(grams) + self._gram_counts[candidate])
+                if score >= min_similarity:
+                    scored.append((-score, -self._counts[candidate], candidate))
+            scored.sort()
+            return [self.display(candidate) for _s, _c, candidate in scored[:limit]]
+
+    def resolve(self, text: object) -> Tuple[str, List[str]]:
+        """(subject to use, suggestions): the canonical spelling when one is known,
+        otherwise the cleaned input plus fuzzy suggestions to offer."""
+        canonical = self.canonical(text)
+        if canonical is not None:
+            return canonical, []
+        return clean_subject(text), self.suggest(text)
+
+
+#============================SHARED INDEX====================================
+
+_index: Optional[SubjectIndex] = None
+_index_lock = threading.Lock()
+
+
+def build_index() -> SubjectIndex:
+    """Index every subject in the statistics rollups and the saved profiles."""
+    from src.profiles import PROFILES_FILE, ProfileStore
+    from src.stats import get_stats
+
+    index = SubjectIndex()
+    index.add_many(
+        (subject, bucket["sessions"]) for subject, bucket in get_stats().breakdown("subject").items() if subject != "Unknown"
+    )
+    index.add_many((profile.get("subject"), 1) for _key, profile in ProfileStore(PROFILES_FILE).items())
+    return index
+
+
+def get_subjects() -> SubjectIndex:
+    """The shared index, built on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = build_index()
+        return _index
+
+
+def set_subjects(index: Optional[SubjectIndex]) -> None:
+    """Replace the shared index (None rebuilds it on next use)."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def record_subjects(subjects: Iterable[object]) -> None:
+    """Count newly logged subjects, if the index has been built (otherwise the rebuild sees them)."""
+    index = _index
+    if index is not None:
+        for subject in subjects:
+            index.add(subject)
+
+
+def canonical_subject(text: object) -> str:
+    """`text` in its canonical spelling when an equivalent subject is known."""
+    return get_subjects().canonical(text) or clean_subject(text)
@@ -3,24 +3,225 @@
 
 Provides a simple interactive multi-cycle Pomodoro implementation with
 pause/resume support via specific keys.
+
+Timing is driven by `PomodoroEngine`, a small phase state machine that
+works from absolute `time.monotonic()` deadlines instead of counting
+`sleep(1)` calls, so terminal writes and pauses never add drift. The clock
+is injectable: pass a `VirtualClock` to run a full session instantly.
 """
 
+import math
 import re
 import time
-from typing import Tuple
+from typing import Callable, Optional
 
 from rich.console import Console
 from rich.prompt import Prompt
-from rich.style import Style
+
+from src import metrics
 
 console = Console()
 
+# Engine phases.
+IDLE = "idle"        # between cycles, waiting for the next work phase to start
+WORK = "work"
+BREAK = "break"
+PAUSED = "paused"
+DONE = "done"
+
+
+class Clock:
+    """Real time: monotonic seconds and blocking sleep."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """A clock that advances instantly when slept on (tests, benchmarks)."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.now += seconds
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class PomodoroEngine:
+    """Deadline-based Pomodoro state machine (idle -> work -> break -> ... -> done).
+
+    `on_render(engine, seconds_left)` is called at most once per
+    `render_interval` while a phase runs; `on_phase_change(engine, old, new)`
+    is called on every transition, including pause and resume.
+    """
+
+    def __init__(
+        self,
+        work_seconds: float,
+        break_seconds: float,
+        cycles: int = 1,
+        clock: Optional[Clock] = None,
+        render_interval: float = 1.0,
+        on_render: Optional[Callable[["PomodoroEngine", float], None]] = None,
+        on_phase_change: Optional[Callable[["PomodoroEngine", str, str], None]] = None,
+    ) -> None:
+        self.work_seconds = work_seconds
+        self.break_seconds = break_seconds
+        self.cycles = cycles
+        self.clock = clock or SYSTEM_CLOCK
+        self.render_interval = render_interval
+        self.on_render = on_render
+        self.on_phase_change = on_phase_change
+        self.phase = IDLE if cycles > 0 and work_seconds > 0 else DONE
+        self.cycle = 0
+        self.deadline = 0.0
+        self._paused_phase: Optional[str] = None
+        self._paused_remaining = 0.0
+
+    # ------------------------------------------------------------ transitions
+
+    def _set_phase(self, phase: str) -> None:
+        old, self.phase = self.phase, phase
+        if self.on_phase_change and old != phase:
+            self.on_phase_change(self, old, phase)
+
+    def _enter(self, phase: str, duration: float) -> None:
+        self.deadline = self.clock.monotonic() + duration
+        self._set_phase(phase)
+
+    def start_work(self) -> None:
+        """Begin the next cycle's work phase."""
+        if self.phase != IDLE:
+            raise RuntimeError(f"cannot start work while {self.phase}")
+        self.cycle += 1
+        self._enter(WORK, self.work_seconds)
 
-def pomodoro_arg_func(work_min: int, break_min: int, mode_desc: str = "1 cycle") -> None:
+    def advance(self) -> None:
+        """Move past a finished phase: work -> break (or done), break -> idle."""
+        if self.phase == WORK:
+            if self.cycle < self.cycles:
+                self._enter(BREAK, self.break_seconds)
+            else:
+                self._set_phase(DONE)
+        elif self.phase == BREAK:
+            self._set_phase(IDLE)
+
+    def pause(self) -> None:
+        if self.phase not in (WORK, BREAK):
+            return
+        self._paused_remaining = self.remaining()
+        self._paused_phase = self.phase
+        self._set_phase(PAUSED)
+
+    def resume(self) -> None:
+        if self.phase != PAUSED:
+            return
+        self.deadline = self.clock.monotonic() + self._paused_remaining
+        self._set_phase(self._paused_phase)
+
+    def skip(self) -> None:
+        """End the running phase now (e.g. skip a break)."""
+        if self.phase in (WORK, BREAK):
+            self.deadline = self.clock.monotonic()
+
+    def cancel(self) -> None:
+        self._set_phase(DONE)
+
+    # ---------------------------------------------------------------- running
+
+    @property
+    def running_phase(self) -> Optional[str]:
+        """WORK/BREAK, or the phase that was interrupted while paused."""
+        return self._paused_phase if self.phase == PAUSED else (self.phase if self.phase in (WORK, BREAK) else None)
+
+    def remaining(self) -> float:
+        """Seconds left in the current (or paused) phase."""
+        if self.phase == PAUSED:
+            return self._paused_remaining
+        if self.phase in (WORK, BREAK):
+            return max(0.0, self.deadline - self.clock.monotonic())
+        return 0.0
+
+    def run_phase(self) -> None:
+        """Block until the running phase's deadline, rendering on a coalesced schedule.
+
+        Redraws happen at most once per `render_interval`; if the process
+        wakes late, missed ticks collapse into a single redraw.
+        """
+        if self.phase not in (WORK, BREAK):
+            return
+        next_render = self.clock.monotonic()
+        while True:
+            now = self.clock.monotonic()
+            left = self.deadline - now
+            if left <= 0:
+                # How late the process woke up past the deadline (scheduler/terminal lag).
+                metrics.observe("timer.phase_overrun", -left)
+                return
+            if self.on_render and now >= next_render:
+                metrics.incr("timer_renders")
+                self.on_render(self, left)
+                next_render = now + self.render_interval
+                # Realign to the interval so displayed whole seconds tick evenly.
+                next_render -= (next_render - self.deadline) % self.render_interval
+            wake = min(self.deadline, next_render) if self.on_render else self.deadline
+            self.clock.sleep(max(0.0, wake - self.clock.monotonic()))
+
+    def run(self) -> None:
+        """Run every remaining cycle unattended (no prompts)."""
+        while self.phase != DONE:
+            if self.phase == IDLE:
+                self.start_work()
+            elif self.phase == PAUSED:
+                self.resume()
+            self.run_phase()
+            self.advance()
+
+
+def format_remaining(seconds: float) -> str:
+    """MM:SS, rounding partial seconds up so 00:00 only shows at the deadline."""
+    mins, secs = divmod(int(math.ceil(seconds)), 60)
+    return f"{mins:02d}:{secs:02d}"
+
+
+def _render_line(engine: PomodoroEngine, seconds_left: float) -> None:
+    time_format = format_remaining(seconds_left)
+    if engine.phase == BREAK:
+        print(f"\rBREAK TIME: {time_format} Press Ctrl+C to skip break...", end="", flush=True)
+    else:
+        print(f"\rWORK TIME: {time_format} (Cycle {engine.cycle}) Press Ctrl+C to pause/quit...", end="", flush=True)
+
+
+def pomodoro_arg_func(
+    work_min: int,
+    break_min: int,
+    mode_desc: str = "1 cycle",
+    clock: Optional[Clock] = None,
+    render_interval: float = 1.0,
+    on_phase_change: Optional[Callable[[PomodoroEngine, str, str], None]] = None,
+    on_cycle_start: Optional[Callable[[PomodoroEngine], None]] = None,
+    on_work_start: Optional[Callable[[PomodoroEngine], None]] = None,
+) -> None:
     """Run a Pomodoro session using the supplied work/break minutes.
 
     The optional `mode_desc` is used to infer cycles when it contains
-    a 'N cycle(s)' fragment (e.g. '2 cycles').
+    a 'N cycle(s)' fragment (e.g. '2 cycles'). `clock`, `render_interval`
+    and `on_phase_change` are passed to the underlying `PomodoroEngine`;
+    `on_cycle_start(engine)` runs before each cycle after the first (e.g.
+    to show that cycle's study materials). `on_work_start(engine)` runs as
+    each work phase begins, while its deadline is already ticking (e.g. to
+    review flashcards until the phase ends); Ctrl+C inside it pauses as usual.
     """
 
     match = re.search(r"(\d+)\s*cycle", mode_desc, re.IGNORECASE)
@@ -33,70 +234,68 @@ def pomodoro_arg_func(work_min: int, break_min: int, mode_desc: str = "1 cycle")
     console.print(f"\n[bold yellow]*** Pomodoro Timer Session Started: {mode_desc} ***[/bold yellow]\n")
     console.print(f"[dim]Mode: {mode_desc}[/dim]")
 
-    work_sec = work_min * 60
-    break_sec = break_min * 60
+    engine = PomodoroEngine(
+        work_min * 60,
+        break_min * 60,
+        cycles,
+        clock=clock,
+        render_interval=render_interval,
+        on_render=_render_line,
+        on_phase_change=on_phase_change,
+    )
 
-    for cycle in range(1, cycles + 1):
-        console.print(f"\n[bold green]---- Cycle {cycle} of {cycles}: Work Time ({work_min}:00) ----[/bold green]")
+    while engine.phase != DONE:
+        started = False
+        if engine.phase == IDLE:
+            if on_cycle_start and engine.cycle > 0:
+                on_cycle_start(engine)
+            console.print(f"\n[bold green]---- Cycle {engine.cycle + 1} of {cycles}: Work Time ({work_min}:00) ----[/bold green]")
 
-        # Ask user to start or abort
-        choice = Prompt.ask(
-            "Ready for Work? Type 'p' to Pause, 'q' to Quit, or press Enter to Start/Resume",
-            choices=["p", "q", ""],
-            default="",
-        ).lower()
+            # Ask user to start or abort
+            choice = Prompt.ask(
+                "Ready for Work? Type 'p' to Pause, 'q' to Quit, or press Enter to Start/Resume",
+                choices=["p", "q", ""],
+                default="",
+            ).lower()
 
-        if choice == "q":
-            console.print("[bold red]Session Aborted by User![/bold red]")
-            return
+            if choice == "q":
+                engine.cancel()
+                console.print("[bold red]Session Aborted by User![/bold red]")
+                return
+            engine.start_work()
+            started = True
 
-        current_time = work_sec
         try:
-            while current_time > 0:
-                mins, secs = divmod(current_time, 60)
-                time_format = f"{mins:02d}:{secs:02d}"
-                print(f"\rWORK TIME: {time_format} (Cycle {cycle}) Press Ctrl+C to pause/quit...", end="")
-                time.sleep(1)
-                current_time -= 1
+            if started and on_work_start:
+                on_work_start(engine)
+            engine.run_phase()
         except KeyboardInterrupt:
             print("\n")
+            if engine.phase == BREAK:
+                engine.skip()
+                console.print("[dim]Break skipped.[/dim]")
+                continue
             # Pause loop
-            while True:
-                mins, secs = divmod(current_time, 60)
-                time_format = f"{mins:02d}:{secs:02d}"
-                console.print(f"\n[yellow]Timer Paused.[/yellow] Time Remaining: {time_format}")
-                resume_choice = Prompt.ask("Enter 'r' to Resume or 'q' to Quit:", choices=["r", "q"]).lower()
-                if resume_choice == "r":
-                    console.print("[bold cyan]Session Resumed.[/bold cyan]")
-                    try:
-                        while current_time > 0:
-                            mins, secs = divmod(current_time, 60)
-                            time_format = f"{mins:02d}:{secs:02d}"
-                            print(f"\rWORK TIME: {time_format} (Cycle {cycle}) Press Ctrl+C to pause/quit...", end="")
-                            time.sleep(1)
-                            current_time -= 1
-                        break
-                    except KeyboardInterrupt:
-                        continue
-                elif resume_choice == "q":
-                    console.print("[bold red]Session Aborted by User![/bold red]")
-                    return
+            engine.pause()
+            console.print(f"\n[yellow]Timer Paused.[/yellow] Time Remaining: {format_remaining(engine.remaining())}")
+            resume_choice = Prompt.ask("Enter 'r' to Resume or 'q' to Quit:", choices=["r", "q"]).lower()
+            if resume_choice == "q":
+                engine.cancel()
+                console.print("[bold red]Session Aborted by User![/bold red]")
+                return
+            engine.resume()
+            console.print("[bold cyan]Session Resumed.[/bold cyan]")
+            continue
 
+        finished = engine.phase
+        engine.advance()
         print("\n")
-        console.print("[bold green]Work Phase Complete! Good Job![/bold green]")
-
-        if cycle < cycles:
-            console.print(f"\n[bold blue]----- Cycle {cycle} Break Time ({break_min}:00) -----[/bold blue]")
-            console.print("[dim]Take a breath, stretch, and get ready for the next cycle.[/dim]")
-            break_time_left = break_sec
-            while break_time_left > 0:
-                mins, secs = divmod(break_time_left, 60)
-                time_format = f"{mins:02d}:{secs:02d}"
-                print(f"\rBREAK TIME: {time_format} Press Ctrl+C to skip break...", end="")
-                time.sleep(1)
-                break_time_left -= 1
-            print("\n")
+        if finished == WORK:
+            console.print("[bold green]Work Phase Complete! Good Job![/bold green]")
+            if engine.phase == BREAK:
+                console.print(f"\n[bold blue]----- Cycle {engine.cycle} Break Time ({break_min}:00) -----[/bold blue]")
+                console.print("[dim]Take a breath, stretch, and get ready for the next cycle.[/dim]")
+        else:
             console.print("[bold blue]Break Time Complete![/bold blue]")
 
     console.print("\n[bold magenta]Pomodoro session successfully completed! Great work![/bold magenta]")
-
@@ -0,0 +1,219 @@
+"""Many Pomodoro timers in one process.
+
+`TimerService` holds any number of timer sessions (one per student in a
+group study room) on a single asyncio event loop. Phase deadlines live in a
+min-heap, so the loop sleeps until exactly the next phase boundary (or the
+shared render tick, if one is configured) instead of polling every timer
+every second. With 1,000 long-running timers the loop wakes only when one
+of them actually changes phase.
+
+Each session reuses the `PomodoroEngine` state machine from `src.timer`;
+only its transitions are used here, never its blocking `run_phase`.
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.timer import BREAK, DONE, IDLE, PAUSED, WORK, Clock, PomodoroEngine, SYSTEM_CLOCK
+
+PhaseCallback = Callable[["TimerSession", str, str], None]
+
+
+class TimerSession:
+    """One student's timer inside a `TimerService`."""
+
+    __slots__ = ("session_id", "engine", "on_phase_change", "version")
+
+    def __init__(self, session_id: str, on_phase_change: Optional[PhaseCallback] = None) -> None:
+        self.session_id = session_id
+        self.engine: Optional[PomodoroEngine] = None
+        self.on_phase_change = on_phase_change
+        # Sequence number of its live heap entry; changed on pause/resume/cancel
+        # so stale entries can be skipped. Drawn from the service-wide counter,
+        # so a restarted id never matches its predecessor's entries.
+        self.version = -1
+
+    @property
+    def phase(self) -> str:
+        return self.engine.phase
+
+    def remaining(self) -> float:
+        return self.engine.remaining()
+
+    def snapshot(self) -> dict:
+        engine = self.engine
+        return {
+            "session_id": self.session_id,
+            "phase": engine.phase,
+            "cycle": engine.cycle,
+            "cycles": engine.cycles,
+            "remaining_seconds": round(engine.remaining(), 3),
+        }
+
+
+class TimerService:
+    """Schedules many timer sessions on one event loop using a deadline heap."""
+
+    def __init__(
+        self,
+        clock: Optional[Clock] = None,
+        on_phase_change: Optional[PhaseCallback] = None,
+        render_interval: Optional[float] = None,
+        on_render: Optional[Callable[["TimerService"], None]] = None,
+    ) -> None:
+        self.clock = clock or SYSTEM_CLOCK
+        self.on_phase_change = on_phase_change
+        self.render_interval = render_interval
+        self.on_render = on_render
+        self.sessions: Dict[str, TimerSession] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_render: Optional[float] = None
+        self.wakeups = 0
+
+    # --------------------------------------------------------------- control
+
+    def start(
+        self,
+        session_id: str,
+        work_seconds: float,
+        break_seconds: float,
+        cycles: int = 1,
+        on_phase_change: Optional[PhaseCallback] = None,
+    ) -> TimerSession:
+        """Create and start a session (replacing any session with the same id)."""
+        if session_id in self.sessions:
+            self.cancel(session_id)
+        session = TimerSession(session_id, on_phase_change)
+        session.engine = PomodoroEngine(
+            work_seconds,
+            break_seconds,
+            cycles,
+            clock=self.clock,
+            on_phase_change=lambda _engine, old, new: self._emit(session, old, new),
+        )
+        self.sessions[session_id] = session
+        if session.engine.phase == IDLE:
+            session.engine.start_work()
+            self._schedule(session)
+        return session
+
+    def pause(self, session_id: str) -> TimerSession:
+        session = self._get(session_id)
+        if session.engine.phase in (WORK, BREAK):
+            session.version = -1  # its heap entry is now stale
+            session.engine.pause()
+        return session
+
+    def resume(self, session_id: str) -> TimerSession:
+        session = self._get(session_id)
+        if session.engine.phase == PAUSED:
+            session.engine.resume()
+            self._schedule(session)
+        return session
+
+    def cancel(self, session_id: str) -> TimerSession:
+        session = self._get(session_id)
+        del self.sessions[session_id]
+        session.version = -1
+        session.engine.cancel()
+        return session
+
+    def get(self, session_id: str) -> Optional[TimerSession]:
+        return self.sessions.get(session_id)
+
+    def active_count(self) -> int:
+        return sum(1 for s in self.sessions.values() if s.engine.phase in (WORK, BREAK))
+
+    # ------------------------------------------------------------ scheduling
+
+    def _get(self, session_id: str) -> TimerSession:
+        try:
+            return self.sessions[session_id]
+        except KeyError:
+            raise KeyError(f"No timer session '{session_id}'") from None
+
+    def _emit(self, session: TimerSession, old: str, new: str) -> None:
+        for callback in (session.on_phase_change, self.on_phase_change):
+            if callback:
+                callback(session, old, new)
+
+    def _schedule(self, session: TimerSession) -> None:
+        session.version = next(self._seq)
+        heapq.heappush(self._heap, (session.engine.deadline, session.version, session.session_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def next_deadline(self) -> Optional[float]:
+        """The earliest live phase deadline, discarding stale heap entries."""
+        while self._heap:
+            deadline, seq, session_id = self._heap[0]
+            session = self.sessions.get(session_id)
+            if session is not None and session.version == seq:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def process_due(self) -> int:
+        """Advance every session whose phase deadline has passed. Returns how many."""
+        now = self.clock.monotonic()
+        advanced = 0
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _deadline, _seq, session_id = heapq.heappop(self._heap)
+            session = self.sessions[session_id]
+            engine = session.engine
+            engine.advance()
+            if engine.phase == IDLE:
+                engine.start_work()  # unattended sessions roll straight into the next cycle
+            if engine.phase == DONE:
+                del self.sessions[session_id]
+            else:
+                self._schedule(session)
+            advanced += 1
+        return advanced
+
+    def _sleep_for(self) -> Optional[float]:
+        now = self.clock.monotonic()
+        candidates = []
+        deadline = self.next_deadline()
+        if deadline is not None:
+            candidates.append(deadline)
+        if self.render_interval and self.on_render and self.sessions:
+            if self._next_render is None:
+                self._next_render = now
+            candidates.append(self._next_render)
+        if not candidates:
+            return None
+        return max(0.0, min(candidates) - now)
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Serve timers until `stop` is set (or forever).
+
+        The loop sleeps until the next phase boundary or render tick and is
+        woken early only when a session is started or resumed.
+        """
+        self._wakeup = asyncio.Event()
+        stop = stop or asyncio.Event()
+        stopper = asyncio.ensure_future(stop.wait())
+        try:
+            while not stop.is_set():
+                timeout = self._sleep_for()
+                self._wakeup.clear()
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                await asyncio.wait({waiter, stopper}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                self.wakeups += 1
+                self.process_due()
+                now = self.clock.monotonic()
+                if self._next_render is not None and now >= self._next_render and self.on_render:
+                    self.on_render(self)
+                    self._next_render = now + self.render_interval
+        finally:
+            stopper.cancel()
+            self._wakeup = None
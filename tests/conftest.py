@@ -0,0 +1,17 @@
+import pytest
+
+from src import history, stats, subjects
+
+
+@pytest.fixture(autouse=True)
+def isolated_workdir(tmp_path, monkeypatch):
+    """Run every test in a scratch directory so data files in the repo are never touched."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STUDY_BUDDY_RATELIMIT_FILE", str(tmp_path / "ratelimit.json"))
+    history.set_backend(None)
+    stats.set_stats(None)
+    subjects.set_subjects(None)
+    yield tmp_path
+    history.set_backend(None)
+    stats.set_stats(None)
+    subjects.set_subjects(None)
@@ -1,6 +1,6 @@
 import sys
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 import pytest
 
 # Add the root directory to sys.path so we can import src
@@ -35,7 +35,7 @@ def test_full_session_flow(mock_confirm, mock_int_prompt, mock_prompt, mock_clie
     # 2. Setup the mock AI Response
     mock_response = MagicMock()
     mock_response.text = "# Mocked Quiz\n1. What is a list?"
-    mock_client.models.generate_content.return_value = mock_response
+    mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
 
     # 3. Run the App
     with patch.object(sys, 'argv', ['app.py']): 
@@ -46,19 +46,22 @@ def test_full_session_flow(mock_confirm, mock_int_prompt, mock_prompt, mock_clie
 
     # 4. Assertions
     # ask the AI for the right thing? YES.
-    mock_client.models.generate_content.assert_called_once()
+    mock_client.aio.models.generate_content.assert_called_once()
     
     # ask the user for inputs? YES.
     assert mock_prompt.call_count == 5 
 
 def test_missing_api_key():
-    """Test that the app exits gracefully without an API key."""
+    """Test that the app imports without an API key and exits gracefully once AI is needed."""
     with patch.dict(os.environ, {"GEMINI_API_KEY": ""}):
         import importlib
         import src.app
-        
+
+        importlib.reload(src.app)
+        assert src.app.get_client() is None
+
         with pytest.raises(SystemExit) as pytest_wrapped_e:
-            importlib.reload(src.app)
+            src.app.ensure_api_key()
             
         assert pytest_wrapped_e.type == SystemExit
         assert pytest_wrapped_e.value.code == 1
@@ -0,0 +1,35 @@
+import json
+
+from src.batch import read_rows, run_batch
+from src.history import load_history
+
+METHODS = ["Quiz", "Flashcards", "Summary"]
+
+
+def test_batch_runs_rows_and_logs_successes(tmp_path):
+    roster = tmp_path / "roster.csv"
+    roster.write_text("name,method,subject\nAna,quiz,Math\nBo,Flashcards,Biology\nCy,Poem,Art\n")
+
+    def generate(prompt):
+        return f"materials for {prompt}"
+
+    report = run_batch(read_rows(str(roster)), lambda n, m, s, _minutes: f"{n}/{m}/{s}", generate, METHODS, output_path="out.ndjson", workers=2)
+
+    results = sorted((json.loads(line) for line in open("out.ndjson")), key=lambda r: r["row"])
+    assert [r["status"] for r in results] == ["ok", "ok", "error"]
+    assert results[0]["materials"] == "materials for Ana/Quiz/Math"
+    assert results[0]["mode"] == "basic check-in"
+    assert (report.total, report.succeeded, report.failed) == (3, 2, 1)
+    assert report.percentile(50) >= 0
+    assert len(load_history()) == 2
+
+
+def test_jsonl_rows_and_generation_failures(tmp_path):
+    roster = tmp_path / "roster.jsonl"
+    roster.write_text('{"name": "Ana", "method": "Summary", "subject": "Math"}\nnot json\n')
+
+    def generate(prompt):
+        raise RuntimeError("quota")
+
+    report = run_batch(read_rows(str(roster)), lambda n, m, s, _minutes: s, generate, METHODS, output_path="out.ndjson", log_results=False)
+    assert (report.total, report.failed) == (2, 2)
@@ -0,0 +1,27 @@
+from benchmarks import generators
+from benchmarks.__main__ import parse_size
+from benchmarks.suite import bench_timer, compare
+
+
+def test_generators_are_deterministic_and_ordered():
+    records = list(generators.history_records(50, seed=3))
+    assert records == list(generators.history_records(50, seed=3))
+    assert [r["timestamp"] for r in records] == sorted(r["timestamp"] for r in records)
+    assert len(generators.profiles(200)) == 200
+
+
+def test_compare_flags_regressions_past_threshold():
+    baseline = {"results": {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}, "gone": {"median_s": 1.0}}}
+    current = {"results": {"a": {"median_s": 1.2}, "b": {"median_s": 1.5}, "new": {"median_s": 9.0}}}
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.25)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regressed"] and rows["b"]["regressed"]
+
+
+def test_timer_benchmark_produces_a_result():
+    [(name, result)] = bench_timer().items()
+    assert name.startswith("timer_virtual_run") and result["samples"] == 20
+
+
+def test_parse_size():
+    assert [parse_size(s) for s in ("10k", "1m", "2500", "1_000")] == [10_000, 1_000_000, 2500, 1000]
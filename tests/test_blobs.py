@@ -0,0 +1,64 @@
+import json
+import os
+
+from src import history
+from src.blobs import BlobStore, content_hash, get_blobs
+from src.history import load_history, load_materials, log_session
+from src.history_browser import browse_history
+from src.storage import NdjsonBackend, migrate_legacy
+
+QUIZ = "# Quiz\n\n1. What is 2 + 2?\n" + "A) 3  B) 4  C) 5  D) 22\n" * 50
+
+
+def test_identical_materials_are_stored_once_and_compressed():
+    store = BlobStore()
+    digest = store.put(QUIZ)
+    assert store.put(QUIZ) == digest == content_hash(QUIZ)
+    assert store.get(digest) == QUIZ
+    count, size = store.usage()
+    assert count == 1 and size < len(QUIZ.encode("utf-8")) / 4
+    assert store.get("0" * 64) is None and store.get("../etc") is None
+
+
+def test_corrupted_blob_is_not_returned():
+    store = BlobStore()
+    digest = store.put(QUIZ)
+    other = store.put("something else")
+    os.replace(store._path(other), store._path(digest))
+    assert store.get(digest) is None
+
+
+def test_log_session_references_full_materials():
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI", response=QUIZ)
+    log_session("Ben", "Quiz", "Math", "tired", 10, "CLI", response=QUIZ)
+    log_session("Cy", "Quiz", "Math", "tired", 10, "CLI", response="I apologize, but the AI service is currently unavailable.")
+    records = load_history()
+    assert records[1]["material_hash"] == records[2]["material_hash"]
+    assert "material_hash" not in records[0]
+    assert load_materials(records[1]) == QUIZ
+    assert get_blobs().usage()[0] == 1
+
+
+def test_gc_keeps_referenced_blobs():
+    store = BlobStore()
+    keep, drop = store.put("keep me"), store.put("drop me")
+    assert store.gc([keep]) == 1
+    assert keep in store and drop not in store
+
+
+def test_legacy_study_log_content_is_imported_into_the_store():
+    with open("study_log.json", "w", encoding="utf-8") as f:
+        json.dump([{"timestamp": "2025-01-01 10:00:00", "name": "Ana", "method": "Quiz", "subject": "Math", "content": QUIZ}], f)
+    backend = NdjsonBackend()
+    assert migrate_legacy(backend) == 1
+    assert load_materials(backend.latest(1)[0]) == QUIZ
+
+
+def test_history_browser_reopens_materials_without_the_llm():
+    history.set_backend(NdjsonBackend())
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI", response=QUIZ)
+    log_session("Ben", "Quiz", "Biology", "focused", 25, "CLI")
+    shown = []
+    answers = iter(["o 2", "o 1", "q"])
+    browse_history(ask=lambda *_a, **_k: next(answers), show_materials=lambda text, subject: shown.append((subject, text)))
+    assert shown == [("Math", QUIZ)]
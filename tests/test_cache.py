@@ -0,0 +1,38 @@
+from src.cache import ResponseCache, cache_key
+
+FALLBACK = "I apologize, but the AI service is currently unavailable. Please try again later."
+
+
+def test_prompt_normalization_shares_key():
+    assert cache_key("Subject:  Math\n", "m") == cache_key("subject: math", "m")
+    assert cache_key("Subject: Math", "m") != cache_key("Subject: Math", "other-model")
+
+
+def test_disk_tier_survives_new_instance():
+    ResponseCache().put("quiz on math", "m", "# Quiz")
+    fresh = ResponseCache()
+    assert fresh.get("quiz on math", "m") == "# Quiz"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_fallback_text_is_never_cached():
+    cache = ResponseCache()
+    assert cache.put("quiz on math", "m", FALLBACK) is False
+    assert cache.get("quiz on math", "m") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry():
+    now = [1000.0]
+    cache = ResponseCache(ttl_seconds=60, clock=lambda: now[0])
+    cache.put("p", "m", "text")
+    now[0] += 61
+    assert cache.get("p", "m") is None
+
+
+def test_memory_lru_and_disk_budget_eviction():
+    cache = ResponseCache(max_memory_entries=2, max_disk_bytes=400)
+    for i in range(5):
+        cache.put(f"prompt {i}", "m", "x" * 100)
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.stats()["evictions"] > 0
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from src.generation import RetryPolicy, generate_async, generate_many, run_sync
+
+
+class FlakyError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def _client(side_effect):
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
+    return client
+
+
+async def _no_sleep(_delay):
+    return None
+
+
+def test_retries_retryable_errors_then_succeeds():
+    client = _client([FlakyError(503), FlakyError(429), SimpleNamespace(text="# Quiz")])
+    result = asyncio.run(generate_async(client, "p", "m", retry=RetryPolicy(max_attempts=3), sleep=_no_sleep))
+    assert result.ok and result.text == "# Quiz" and result.attempts == 3
+
+
+def test_non_retryable_error_fails_fast():
+    client = _client([FlakyError(400), SimpleNamespace(text="never")])
+    result = asyncio.run(generate_async(client, "p", "m", sleep=_no_sleep))
+    assert result.status == "error" and result.attempts == 1
+
+
+def test_timeout_is_reported_separately():
+    async def slow(**_kwargs):
+        await asyncio.sleep(1)
+
+    client = _client(slow)
+    result = run_sync(generate_async(client, "p", "m", timeout=0.01, retry=RetryPolicy(max_attempts=2, base_delay=0)))
+    assert result.status == "timeout" and result.attempts == 2
+
+
+def test_generate_many_preserves_order():
+    async def echo(model, contents):
+        await asyncio.sleep(0.01 if contents == "a" else 0)
+        return SimpleNamespace(text=contents.upper())
+
+    results = asyncio.run(generate_many(_client(echo), ["a", "b", "c"], "m", concurrency=2))
+    assert [r.text for r in results] == ["A", "B", "C"]
+
+
+def test_iter_sync_streams_chunks_in_order():
+    async def fake_stream(model, contents):
+        async def chunks():
+            for text in ["# Quiz", "", "\n1. Q?"]:
+                yield SimpleNamespace(text=text)
+        return chunks()
+
+    client = MagicMock()
+    client.aio.models.generate_content_stream = fake_stream
+    from src.generation import iter_sync, stream_async
+
+    assert list(iter_sync(lambda: stream_async(client, "p", "m"))) == ["# Quiz", "\n1. Q?"]
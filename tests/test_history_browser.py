@@ -0,0 +1,66 @@
+from src.history_browser import HistoryFilter, HistoryPager, browse_history
+from src.segments import SegmentedBackend
+from src.storage import NdjsonBackend
+
+
+def _records(count):
+    subjects = ["Math", "Biology", "World History"]
+    return [
+        {
+            "timestamp": f"2025-{1 + i // 100:02d}-{1 + (i % 100) // 4:02d} 10:{i % 60:02d}:00",
+            "name": "Ana" if i % 2 else "Ben",
+            "subject": subjects[i % 3],
+            "method": "Quiz",
+            "state": "focused",
+            "minutes": 25,
+            "material_preview": f"record {i}",
+        }
+        for i in range(count)
+    ]
+
+
+class CountingBackend(NdjsonBackend):
+    """Counts how many records the pager actually pulls from storage."""
+
+    pulled = 0
+
+    def iter_newest(self):
+        for record in super().iter_newest():
+            CountingBackend.pulled += 1
+            yield record
+
+
+def test_pages_are_newest_first_and_read_lazily():
+    backend = CountingBackend()
+    backend.extend(_records(500))
+    CountingBackend.pulled = 0
+    pager = HistoryPager(backend, page_size=10)
+    first = pager.page(0)
+    assert [r["material_preview"] for r in first[:2]] == ["record 499", "record 498"]
+    assert CountingBackend.pulled <= 10
+    pager.page(1)
+    pager.page(0)  # cached
+    assert CountingBackend.pulled <= 20
+    assert pager.total_pages() == 50
+
+
+def test_filters_by_name_subject_method_and_date():
+    backend = SegmentedBackend()
+    backend.extend(_records(300))
+    filters = HistoryFilter(name="ana", subject="hist", start="2025-02-01", end="2025-02-10")
+    pager = HistoryPager(backend, page_size=5, filters=filters)
+    rows = [r for i in range(20) for r in pager.page(i)]
+    assert rows and all(r["name"] == "Ana" and r["subject"] == "World History" for r in rows)
+    assert all("2025-02-01" <= r["timestamp"][:10] <= "2025-02-10" for r in rows)
+    assert pager.total_pages() == -(-len(rows) // 5)
+
+
+def test_browse_history_pages_views_and_quits(capsys):
+    backend = NdjsonBackend()
+    backend.extend(_records(25))
+    answers = iter(["n", "v 12", "p", "f", "Ben", "", "", "", "", "q"])
+    browse_history(backend, page_size=10, ask=lambda *_a, **_k: next(answers))
+    out = capsys.readouterr().out
+    assert "page 2 of 3" in out
+    assert "Session 12" in out and "record 13" in out
+    assert "name=Ben" in out
@@ -0,0 +1,144 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from src.history import get_backend, load_history, log_session, set_backend
+from src.history_browser import HistoryFilter
+from src.history_io import export_history, import_history, iter_json_array, main, oldest_first, read_records
+from src.stats import get_stats
+from src.storage import open_backend
+
+
+def _record(i, name="Ana", subject="Math"):
+    return {
+        "timestamp": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:{i % 60:02d}:00",
+        "name": name,
+        "subject": subject,
+        "method": "Quiz",
+        "state": "focused",
+        "minutes": 25,
+        "source": "CLI",
+        "material_preview": f"Q{i}, with a comma and \"quotes\"",
+    }
+
+
+def test_incremental_parser_handles_values_split_across_chunks():
+    text = ' [ {"a": 1, "s": "x,]}"} , 12345,\n{"b": [1, 2]}, "tail" ] '
+    assert list(iter_json_array(io.StringIO(text), chunk_chars=3)) == [{"a": 1, "s": "x,]}"}, 12345, {"b": [1, 2]}, "tail"]
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1} {"b": 2}]'), chunk_chars=4))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"a": 1}')))
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv", "json"])
+def test_export_then_import_round_trips(tmp_path, fmt):
+    records = [_record(i) for i in range(30)]
+    get_backend().extend(sorted(records, key=lambda r: r["timestamp"]))
+    path = str(tmp_path / f"out.{fmt}")
+    assert export_history(path) == 30
+
+    with open(path, encoding="utf-8", newline="") as f:
+        exported = list(read_records(f, fmt))
+    assert exported == load_history()
+
+    get_backend().replace_all([])
+    assert import_history(path) == 30
+    assert load_history() == sorted(records, key=lambda r: r["timestamp"], reverse=True)
+    assert get_stats().totals()["sessions"] == 30
+
+
+def test_filters_and_fields_are_pushed_down(tmp_path):
+    get_backend().extend(sorted([_record(i, name="Ana" if i % 2 else "Ben") for i in range(48)], key=lambda r: r["timestamp"]))
+    filters = HistoryFilter(name="ben", start="2024-03-01", end="2024-04-30")
+    path = str(tmp_path / "ben.ndjson")
+    count = export_history(path, filters=filters, fields=["timestamp", "minutes"])
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert count == len(rows) > 0
+    assert all(set(row) == {"timestamp", "minutes"} and "2024-03-01" <= row["timestamp"] <= "2024-04-30 23:59:59" for row in rows)
+
+    get_backend().replace_all([])
+    assert import_history(path, filters=HistoryFilter(start="2024-04-01")) == sum(r["timestamp"] >= "2024-04-01" for r in rows)
+
+
+def test_external_sort_orders_oldest_first_with_small_runs():
+    records = [{"timestamp": f"2024-01-01 00:00:{(i * 37) % 60:02d}", "i": i} for i in range(60)]
+    ordered = list(oldest_first(records, run_records=7))
+    assert [r["timestamp"] for r in ordered] == sorted(r["timestamp"] for r in records)
+    assert len(ordered) == 60
+
+
+def test_legacy_array_import_uses_constant_memory(tmp_path):
+    path = tmp_path / "session_history.json"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n" + ",\n".join(json.dumps(_record(i)) for i in range(20_000)) + "\n]")
+    size = path.stat().st_size
+
+    tracemalloc.start()
+    try:
+        with open(path, encoding="utf-8") as f:
+            count = sum(1 for _ in read_records(f, "json"))
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 20_000
+    assert peak < size / 10  # a few chunks, never the whole array
+
+
+def test_cli_exports_csv_with_selected_fields(tmp_path):
+    get_backend().extend([_record(1), _record(2, name="Cy")])
+    main(["export", str(tmp_path / "cy.csv"), "--name", "Cy", "--fields", "name,subject"])
+    assert (tmp_path / "cy.csv").read_text().splitlines() == ["name,subject", "Cy,Math"]
+
+
+@pytest.mark.parametrize("backend_name", ["segmented", "ndjson", "sqlite", "json"])
+def test_importing_older_sessions_keeps_the_newest_first(tmp_path, backend_name):
+    set_backend(open_backend(backend_name))
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI")
+    path = tmp_path / "old.ndjson"
+    path.write_text("".join(json.dumps({**_record(0), "timestamp": f"2022-01-0{d} 10:00:00"}) + "\n" for d in (1, 2, 3)))
+    assert import_history(str(path), chunk_records=2) == 3
+    latest = get_backend().latest(4)
+    assert latest[0]["source"] == "CLI"
+    assert [r["timestamp"][:10] for r in latest[1:]] == ["2022-01-03", "2022-01-02", "2022-01-01"]
+    assert [r["timestamp"] for r in load_history()] == sorted((r["timestamp"] for r in latest), reverse=True)
+
+
+def test_back_dated_import_rewrites_an_ndjson_history_once(tmp_path, monkeypatch):
+    from src.storage import NdjsonBackend
+
+    set_backend(open_backend("ndjson"))
+    get_backend().extend([{**_record(0), "timestamp": f"2022-01-0{d} 10:00:00", "source": "old"} for d in (2, 4)])
+    rewrites = []
+    original = NdjsonBackend._rewrite_merged
+    monkeypatch.setattr(NdjsonBackend, "_rewrite_merged", lambda self, entries: rewrites.append(1) or original(self, entries))
+    monkeypatch.setattr(NdjsonBackend, "replace_all", lambda self, entries: pytest.fail("history loaded into memory"))
+    path = tmp_path / "old.ndjson"
+    path.write_text("".join(json.dumps({**_record(0), "timestamp": f"2022-01-0{d} 10:00:00"}) + "\n" for d in (5, 1, 3, 4)))
+    assert import_history(str(path), chunk_records=2) == 4
+    assert rewrites == [1]
+    stored = [(r["timestamp"][8:10], r["source"]) for r in load_history()]
+    assert stored == [("05", "CLI"), ("04", "CLI"), ("04", "old"), ("03", "CLI"), ("02", "old"), ("01", "CLI")]
+    assert NdjsonBackend().latest(2) == load_history()[:2]  # the index was swapped in with the log
+    assert get_stats().totals()["sessions"] == 6
+
+
+def test_failed_import_leaves_history_and_statistics_consistent():
+    from src.history import import_sessions
+
+    set_backend(open_backend("ndjson"))
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI")
+
+    def broken():
+        for d in (1, 2, 3):
+            yield {**_record(0), "timestamp": f"2022-01-0{d} 10:00:00"}
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError):
+        import_sessions(broken(), chunk_size=2)
+    assert get_backend().count() == 1
+    assert get_stats().totals()["sessions"] == 1
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from src.generation import RetryPolicy, generate_async, stream_async
+from src.llm import (
+    ErrorModel,
+    LatencyModel,
+    RecordingBackend,
+    ReplayBackend,
+    entries_from_study_log,
+    load_cassette,
+    open_llm_backend,
+)
+
+FAST = LatencyModel(kind="fixed", median_ms=1)
+
+
+def _prompt(method, subject="Math"):
+    return f"Name: Ana\nMethod: {method}\nSubject: {subject}"
+
+
+def _replay(**kwargs):
+    entries = [
+        {"prompt": _prompt("Quiz"), "model": "m", "response": "quiz answer"},
+        {"prompt": _prompt("Summary"), "model": "m", "response": "summary answer " * 20},
+    ]
+    return ReplayBackend(entries, latency=FAST, seed=1, **kwargs)
+
+
+def test_replay_matches_exactly_then_falls_back_by_method():
+    backend = _replay()
+    assert asyncio.run(backend.generate(_prompt("Quiz"), "m")) == "quiz answer"
+    assert asyncio.run(backend.generate(_prompt("Summary", "Art"), "m")).startswith("summary answer")
+    assert asyncio.run(backend.generate("something else", "m")) in ("quiz answer", "summary answer " * 20)
+
+
+def test_replay_streams_in_chunks():
+    async def collect():
+        return [chunk async for chunk in stream_async(_replay(chunk_chars=50), _prompt("Summary"), "m")]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1 and "".join(chunks) == "summary answer " * 20
+
+
+def test_injected_errors_are_retried_by_generation():
+    backend = _replay(errors=ErrorModel(error_rate=1.0, codes={503: 1.0}))
+    result = asyncio.run(generate_async(backend, _prompt("Quiz"), "m", retry=RetryPolicy(max_attempts=3, base_delay=0)))
+    assert result.status == "error" and "503" in result.error
+    assert result.attempts == 3 and backend.calls == 3
+
+
+def test_injected_hangs_hit_the_timeout():
+    backend = _replay(errors=ErrorModel(timeout_rate=1.0))
+    result = asyncio.run(generate_async(backend, _prompt("Quiz"), "m", timeout=0.05, retry=RetryPolicy(max_attempts=1)))
+    assert result.status == "timeout"
+
+
+def test_record_then_replay_roundtrip():
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=MagicMock(text="live answer"))
+    recorder = open_llm_backend("record", client_factory=lambda: client)
+    assert isinstance(recorder, RecordingBackend)
+    assert asyncio.run(generate_async(recorder, _prompt("Quiz"), "gemini")).text == "live answer"
+    [entry] = load_cassette("llm_cassette.ndjson")
+    assert entry["prompt"] == _prompt("Quiz") and entry["latency_ms"] >= 0
+
+    replay = open_llm_backend("replay")
+    replay.latency = FAST
+    assert asyncio.run(replay.generate(_prompt("Quiz"), "gemini")) == "live answer"
+
+
+def test_study_log_seeding_skips_fallback_messages(tmp_path):
+    (tmp_path / "study_log.json").write_text(json.dumps([
+        {"name": "W", "method": "Quiz", "subject": "geo", "content": "Q1. Capital of France?"},
+        {"name": "W", "method": "Quiz", "subject": "bio", "content": "I apologize, but the AI service is currently unavailable."},
+    ]))
+    entries = entries_from_study_log(_prompt_builder)
+    assert [e["response"] for e in entries] == ["Q1. Capital of France?"]
+
+
+def _prompt_builder(name, method, subject):
+    return f"Name: {name}\nMethod: {method}\nSubject: {subject}"
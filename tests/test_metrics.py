@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src import metrics
+from src.cache import ResponseCache
+from src.metrics import METRICS, Metrics
+from src.timer import PomodoroEngine, VirtualClock
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def test_spans_counters_and_gauges():
+    registry = Metrics()
+    for seconds in (0.1, 0.3):
+        registry.observe("llm.generate", seconds)
+    with registry.span("history.load"):
+        pass
+    registry.incr("cache_hits")
+    registry.incr("bytes", 10)
+    registry.add_gauge("history_records", 1)  # ignored until set
+    registry.set_gauge("history_records", 5)
+    registry.add_gauge("history_records", 2)
+    snap = registry.snapshot()
+    assert snap["spans"]["llm.generate"]["count"] == 2
+    assert snap["spans"]["llm.generate"]["max_s"] == pytest.approx(0.3)
+    assert snap["spans"]["llm.generate"]["mean_s"] == pytest.approx(0.2)
+    assert snap["spans"]["history.load"]["count"] == 1
+    assert snap["counters"] == {"bytes": 10, "cache_hits": 1}
+    assert snap["gauges"] == {"history_records": 7}
+
+
+def test_prometheus_text_format():
+    registry = Metrics()
+    registry.observe('startup.import "x"', 0.5)
+    registry.incr("cache_hits", 3)
+    registry.set_gauge("history.records", 12)
+    text = registry.to_prometheus()
+    assert '# TYPE study_buddy_span_seconds_sum counter' in text
+    assert 'study_buddy_span_seconds_sum{span="startup.import \\"x\\""} 0.5' in text
+    assert "study_buddy_cache_hits_total 3" in text
+    assert "# TYPE study_buddy_history_records gauge\nstudy_buddy_history_records 12" in text
+    assert text.endswith("\n")
+
+
+def test_export_writes_both_files(tmp_path):
+    metrics.incr("llm_requests")
+    metrics.export("m.json", "m.prom")
+    assert json.loads((tmp_path / "m.json").read_text())["counters"] == {"llm_requests": 1}
+    assert "study_buddy_llm_requests_total 1" in (tmp_path / "m.prom").read_text()
+
+
+def test_hot_paths_record_metrics():
+    cache = ResponseCache()
+    cache.get("p", "m")
+    cache.put("p", "m", "answer")
+    cache.get("p", "m")
+    PomodoroEngine(60, 0, 1, clock=VirtualClock(), on_render=lambda _e, _l: None).run()
+    snap = METRICS.snapshot()
+    assert snap["counters"]["cache_hits"] == 1 and snap["counters"]["cache_misses"] == 1
+    assert snap["counters"]["cache_bytes_written"] > 0
+    assert snap["counters"]["timer_renders"] == 60
+    assert snap["spans"]["timer.phase_overrun"]["count"] == 1
@@ -0,0 +1,71 @@
+import asyncio
+from unittest.mock import patch
+
+from src.generation import GenerationResult
+from src.prefetch import Prefetcher
+from src.timer import VirtualClock, pomodoro_arg_func
+
+
+def _fetcher(calls, delay=0.0):
+    async def fetch(cycle):
+        calls.append(cycle)
+        await asyncio.sleep(delay)
+        return GenerationResult("ok", text=f"materials for cycle {cycle}")
+
+    return fetch
+
+
+@patch("src.timer.Prompt.ask", return_value="")
+def test_next_cycle_is_ready_when_it_starts(_prompt):
+    calls, shown = [], []
+    prefetcher = Prefetcher(_fetcher(calls))
+
+    def on_cycle_start(engine):
+        shown.append((engine.cycle + 1, prefetcher.result(engine.cycle + 1, timeout=1).text))
+
+    pomodoro_arg_func(
+        45, 15, "3 cycles", clock=VirtualClock(),
+        on_phase_change=prefetcher.on_phase_change, on_cycle_start=on_cycle_start,
+    )
+    assert calls == [2, 3]  # nothing is fetched past the last cycle
+    assert shown == [(2, "materials for cycle 2"), (3, "materials for cycle 3")]
+    assert prefetcher.closed
+
+
+@patch("src.timer.Prompt.ask", return_value="q")
+def test_quitting_cancels_the_prefetch(_prompt):
+    calls = []
+    prefetcher = Prefetcher(_fetcher(calls, delay=30))
+    prefetcher.start(2)
+    assert not prefetcher.ready(2)
+    pomodoro_arg_func(45, 15, "2 cycles", clock=VirtualClock(), on_phase_change=prefetcher.on_phase_change)
+    assert prefetcher.closed
+    assert prefetcher.result(2, timeout=1) is None
+    prefetcher.start(3)
+    assert not prefetcher.ready(3) and prefetcher.result(3) is None
+
+
+def test_fetch_errors_become_error_results():
+    async def boom(cycle):
+        raise RuntimeError("network down")
+
+    with Prefetcher(boom) as prefetcher:
+        prefetcher.start(2)
+        result = prefetcher.result(2, timeout=1)
+    assert result.status == "error" and "network down" in result.error
+
+
+def test_later_rounds_bypass_the_response_cache():
+    from src import app
+
+    calls = []
+
+    async def generate(prompt, use_cache=True, priority=None):
+        calls.append((prompt, use_cache))
+        return GenerationResult("ok", text="fresh")
+
+    with patch("src.app.generate_study_materials_async", generate):
+        with app.start_prefetcher("Ana", "Quiz", "Biology", minutes=25) as prefetcher:
+            prefetcher.start(2)
+            assert prefetcher.result(2, timeout=1).text == "fresh"
+    assert calls == [(app.build_followup_prompt("Ana", "Quiz", "Biology", 2, 25), False)]
@@ -0,0 +1,60 @@
+import json
+
+from src.profiles import ProfileStore
+
+
+def _profile(name, subject="Math"):
+    return {"name": name, "state": "tired", "method": "Quiz", "subject": subject, "source": "CLI/New", "minutes": 25}
+
+
+def test_loads_legacy_profiles_json(tmp_path):
+    (tmp_path / "profiles.json").write_text(json.dumps({"Patrick_Summary_Math": _profile("Patrick")}))
+    store = ProfileStore()
+    assert store["Patrick_Summary_Math"]["name"] == "Patrick"
+    assert "Patrick_Summary_Math" in store and len(store) == 1
+
+
+def test_updates_are_journaled_not_rewritten(tmp_path):
+    store = ProfileStore()
+    store.put("a", _profile("Ana"))
+    store.put("b", _profile("Bo"))
+    store.delete("a")
+    assert not (tmp_path / "profiles.json").exists()
+    assert len((tmp_path / "profiles.json.journal").read_text().splitlines()) == 3
+
+    reopened = ProfileStore()
+    assert list(reopened.keys()) == ["b"]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    store = ProfileStore(compact_min_ops=5)
+    store.put("a", _profile("Ana"))
+    for minutes in range(5):
+        store.put("b", dict(_profile("Bo"), minutes=minutes))
+    assert not (tmp_path / "profiles.json.journal").exists()
+    assert json.loads((tmp_path / "profiles.json").read_text())["b"]["minutes"] == 4
+
+
+def test_prefix_search_and_pagination():
+    store = ProfileStore(compact_min_ops=10_000)
+    for i in range(25):
+        store.put(f"ana{i}", _profile(f"Ana {i:02d}"))
+    store.put("bo", _profile("Bo"))
+
+    assert len(store.search("an")) == 25
+    assert store.search("BO") == ["bo"]
+    rows, total = store.page(2, 10, prefix="ana")
+    assert total == 25 and [p["name"] for _k, p in rows] == [f"Ana {i:02d}" for i in range(20, 25)]
+    rows, total = store.page(0, 10)
+    assert total == 26 and len(rows) == 10
+
+
+def test_two_stores_see_each_others_changes_through_compaction(tmp_path):
+    first = ProfileStore(compact_min_ops=10_000)
+    second = ProfileStore(compact_min_ops=10_000)
+    first.put("a", _profile("Ana"))
+    second.put("b", _profile("Bo"))
+    first.compact()
+    assert set(json.loads((tmp_path / "profiles.json").read_text())) == {"a", "b"}
+    second.put("c", _profile("Cy"))
+    assert set(ProfileStore().keys()) == {"a", "b", "c"}
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.durable import file_lock
+from src.generation import RetryPolicy, generate_async
+from src.metrics import METRICS
+from src.llm import LLMBackend, RecordingBackend, open_llm_backend
+from src.ratelimit import (
+    BATCH,
+    INTERACTIVE,
+    PREFETCH,
+    RateLimitedBackend,
+    RateLimiter,
+    limiter_from_env,
+    request_priority,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def _limiter(tmp_path, clock, rpm=2, tpm=0, **kwargs):
+    return RateLimiter(rpm, tpm, str(tmp_path / "rl.json"), clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_burst_then_throttle_at_the_configured_rate(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=2)
+
+    async def three():
+        return [await limiter.acquire() for _ in range(3)]
+
+    waits = asyncio.run(three())
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(30.0, abs=0.5)  # one request every 30s at 2 rpm
+
+
+def test_processes_sharing_the_state_file_share_the_budget(tmp_path):
+    clock = FakeClock()
+    first, second = _limiter(tmp_path, clock, rpm=1), _limiter(tmp_path, clock, rpm=1)
+    assert first.try_acquire("a", INTERACTIVE, 1, clock()) == 0
+    assert second.try_acquire("b", INTERACTIVE, 1, clock()) == pytest.approx(60.0)
+
+
+def test_token_bucket_limits_large_prompts_and_settles_estimates(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=0, tpm=1000)
+    assert limiter.try_acquire("a", INTERACTIVE, 800, clock()) == 0
+    assert limiter.try_acquire("b", INTERACTIVE, 800, clock()) > 0
+    limiter.settle(estimated=800, actual=200)  # the response was shorter than expected
+    assert limiter.levels()["tokens"] == pytest.approx(800)
+    assert limiter.try_acquire("b", INTERACTIVE, 800, clock()) == 0
+
+
+def test_interactive_requests_jump_the_queue(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=1, stale_after=300)
+    limiter.drain()
+    assert limiter.try_acquire("batch", BATCH, 1, since=clock()) > 0
+    clock.now += 1
+    assert limiter.try_acquire("prefetch", PREFETCH, 1, since=clock()) > 0
+    assert limiter.try_acquire("cli", INTERACTIVE, 1, since=clock()) > 0
+    clock.now += 60
+    assert limiter.try_acquire("batch", BATCH, 1, since=clock()) > 0  # not its turn, though a token is free
+    assert limiter.try_acquire("cli", INTERACTIVE, 1, since=clock()) == 0
+    clock.now += 60
+    assert limiter.try_acquire("batch", BATCH, 1, since=clock()) > 0
+    assert limiter.try_acquire("prefetch", PREFETCH, 1, since=clock()) == 0
+
+
+def test_concurrent_waiters_are_served_in_priority_order(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=1)
+    limiter.drain()
+    served = []
+
+    async def wait(name, priority):
+        await limiter.acquire(priority=priority)
+        served.append(name)
+
+    async def main():
+        await asyncio.gather(wait("batch", BATCH), wait("prefetch", PREFETCH), wait("cli", INTERACTIVE))
+
+    asyncio.run(main())
+    assert served == ["cli", "prefetch", "batch"]
+
+
+def test_waiters_that_stop_polling_expire(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=60, stale_after=5)
+    limiter.drain()
+    limiter.try_acquire("crashed", INTERACTIVE, 1, since=clock())
+    clock.now += 10
+    assert limiter.try_acquire("batch", BATCH, 1, since=clock()) == 0
+
+
+def test_waiting_for_the_state_file_lock_does_not_block_the_event_loop(tmp_path):
+    limiter = RateLimiter(60, 0, str(tmp_path / "rl.json"))
+    held, release = threading.Event(), threading.Event()
+
+    def hold():  # another process busy with the shared state file
+        with file_lock(limiter.path):
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+
+    async def main():
+        acquire = asyncio.ensure_future(limiter.acquire())
+        for _ in range(5):
+            await asyncio.sleep(0.01)  # the loop keeps running meanwhile
+        assert not acquire.done()
+        release.set()
+        return await acquire
+
+    try:
+        assert asyncio.run(main()) >= 0
+    finally:
+        release.set()
+        holder.join()
+
+
+class QuotaBackend(LLMBackend):
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.priorities = []
+
+    async def admit(self, prompt):
+        self.priorities.append(request_priority.get())
+
+    async def generate(self, prompt, model, config=None):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+async def _no_sleep(_delay):
+    return None
+
+
+def test_priority_reaches_the_backend_and_is_restored():
+    backend = QuotaBackend(["ok"])
+    result = asyncio.run(generate_async(backend, "p", "m", priority=BATCH))
+    assert result.ok and backend.priorities == [BATCH]
+    assert request_priority.get() == INTERACTIVE
+
+
+class SlowQueueBackend(LLMBackend):
+    async def admit(self, prompt):
+        await asyncio.sleep(0.2)
+
+    async def generate(self, prompt, model, config=None):
+        return "ok"
+
+
+def test_queue_time_counts_against_the_deadline_not_the_attempt_timeout():
+    result = asyncio.run(generate_async(SlowQueueBackend(), "p", "m", timeout=0.1, deadline=5))
+    assert result.ok and result.attempts == 1
+    result = asyncio.run(generate_async(SlowQueueBackend(), "p", "m", timeout=5, deadline=0.1))
+    assert result.status == "timeout" and "queued" in result.error
+
+
+def test_quota_error_drains_the_shared_bucket(tmp_path):
+    clock = FakeClock()
+    limiter = _limiter(tmp_path, clock, rpm=60)
+    error = Exception("HTTP 429")
+    error.code = 429
+    backend = RateLimitedBackend(QuotaBackend([error, "ok"]), limiter)
+    METRICS.reset()
+    result = asyncio.run(generate_async(backend, "p", "m", retry=RetryPolicy(max_attempts=2), sleep=_no_sleep))
+    assert result.ok and result.attempts == 2
+    assert METRICS.snapshot()["counters"]["ratelimit_quota_errors"] == 1
+    assert METRICS.snapshot()["counters"]["ratelimit_throttled"] == 1  # the retry waited for a refill
+
+
+def test_live_backends_are_rate_limited_only_when_configured(monkeypatch):
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=SimpleNamespace(text="hi"))
+    monkeypatch.delenv("STUDY_BUDDY_RPM", raising=False)
+    monkeypatch.delenv("STUDY_BUDDY_TPM", raising=False)
+    assert limiter_from_env() is None
+    assert not isinstance(open_llm_backend("gemini", client_factory=lambda: client), RateLimitedBackend)
+
+    monkeypatch.setenv("STUDY_BUDDY_RPM", "10")
+    assert limiter_from_env().limits == {"requests": 10.0, "tokens": 0.0}
+    assert isinstance(open_llm_backend("gemini", client_factory=lambda: client), RateLimitedBackend)
+    recorder = open_llm_backend("record", client_factory=lambda: client)
+    assert isinstance(recorder, RecordingBackend) and isinstance(recorder.inner, RateLimitedBackend)
+    assert asyncio.run(generate_async(recorder, "p", "m")).text == "hi"
@@ -0,0 +1,120 @@
+import json
+from unittest.mock import patch
+
+from src.history import get_backend, log_session
+from src.review import DAY_SECONDS, RELEARN_SECONDS, ReviewDeck, backfill, card_id, main, run_review
+from src.timer import WORK, VirtualClock, pomodoro_arg_func
+
+NOW = 1_700_000_000
+
+QUIZ = json.dumps({
+    "greeting": "Hi Ana!",
+    "questions": [
+        {"question": "Which gas is released?", "options": ["CO2", "Oxygen"], "answer": 1, "explanation": "Water is split."},
+        {"question": "No answer given", "options": ["A", "B"]},
+    ],
+})
+CARDS = json.dumps({"greeting": "Hi", "cards": [{"front": "ATP", "back": "Energy currency."}, {"front": "NADPH", "back": "Carrier."}]})
+
+
+def _deck(tmp_path, name="Ana"):
+    return ReviewDeck(name, directory=str(tmp_path / "reviews"), clock=lambda: NOW)
+
+
+def test_cards_come_from_flashcards_and_answered_quiz_questions_once(tmp_path):
+    deck = _deck(tmp_path)
+    assert deck.add_materials(QUIZ, "Biology") == 1
+    assert deck.add_materials(CARDS, "Biology") == 2
+    assert deck.add_materials(CARDS, " biology ") == 0  # same cards, same subject
+    assert deck.add_materials("# Free-form notes", "Biology") == 0
+    card = deck.get(card_id("Biology", "ATP"))
+    assert (card.front, card.back, card.method) == ("ATP", "Energy currency.", "Flashcards")
+    [quiz] = [c for c in deck.iter_due() if c.method == "Quiz"]
+    assert "B) Oxygen" in quiz.front and quiz.back == "B) Oxygen\n\nWater is split."
+
+
+def test_sm2_intervals_grow_and_lapses_relearn(tmp_path):
+    deck = _deck(tmp_path)
+    deck.add([("ATP", "Energy.")], "Biology", "Flashcards")
+    cid = card_id("Biology", "ATP")
+    assert [deck.review(cid, 4, NOW).interval for _ in range(3)] == [1, 6, 15]
+    card = deck.review(cid, 1, NOW)
+    assert (card.reps, card.lapses, card.due) == (0, 1, NOW + RELEARN_SECONDS)
+    assert card.ease < 2.5
+    for _ in range(10):
+        deck.review(cid, 0, NOW)
+    assert deck.get(cid).ease == 1.3
+
+
+def test_due_cards_come_out_most_overdue_first(tmp_path):
+    deck = _deck(tmp_path)
+    deck.add([(f"q{i}", "a") for i in range(5)], "Math", "Flashcards", now=NOW)
+    deck.add([("late", "a")], "Math", "Flashcards", now=NOW - 100)
+    assert deck.next_due().front == "late"
+    for card in list(deck.iter_due(limit=3)):
+        deck.review(card.id, 5)
+    assert deck.due_count() == 3
+    assert deck.due_count(now=NOW + 2 * DAY_SECONDS) == 6
+    assert len(deck._heap) >= 6  # stale entries are skipped, not searched for
+
+
+def test_reviews_append_small_records_and_replay_after_reopening(tmp_path):
+    deck = _deck(tmp_path)
+    deck.add_materials(CARDS, "Biology")
+    cid = card_id("Biology", "ATP")
+    deck.review(cid, 5)
+    with open(deck.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 3 and set(lines[-1]) == {"id", "ease", "interval", "reps", "lapses", "due"}
+
+    reopened = _deck(tmp_path)
+    assert len(reopened) == 2 and reopened.get(cid).interval == 1
+    assert reopened.next_due().front == "NADPH"
+    assert _deck(tmp_path, "Ben").next_due() is None  # decks are per user
+
+
+def test_log_is_compacted_when_mostly_superseded(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.review.COMPACT_MIN_LINES", 4)
+    deck = _deck(tmp_path)
+    deck.add([("ATP", "Energy.")], "Biology", "Flashcards")
+    cid = card_id("Biology", "ATP")
+    for _ in range(5):
+        deck.review(cid, 4)
+    with open(deck.path, encoding="utf-8") as f:
+        assert len(f.readlines()) < 4
+    assert _deck(tmp_path).get(cid).reps == 5
+
+
+@patch("src.review.Prompt.ask", side_effect=["", "g", "", "q"])
+def test_interactive_review_grades_until_stopped(mock_prompt, tmp_path):
+    deck = _deck(tmp_path)
+    deck.add_materials(CARDS, "Biology")
+    assert run_review(deck) == 1
+    assert deck.due_count() == 1
+
+
+def test_work_phase_hook_reviews_while_the_timer_runs(tmp_path):
+    deck = _deck(tmp_path)
+    deck.add_materials(CARDS, "Biology")
+    clock = VirtualClock()
+    seen = []
+
+    def review(engine):
+        seen.append(engine.phase)
+        run_review(deck, until=lambda: engine.remaining() > 0)
+
+    # One Prompt class: "Ready for work?", then reveal + grade for each card.
+    with patch("src.timer.Prompt.ask", side_effect=["", "", "e", "", "e"]):
+        pomodoro_arg_func(25, 5, "Focus (1 cycle)", clock=clock, on_work_start=review)
+    assert seen == [WORK] and deck.due_count() == 0
+    assert clock.now == 25 * 60
+
+
+def test_backfill_from_stored_history_and_cli(tmp_path, capsys):
+    log_session("Ana", "Flashcards", "Biology", "focused", 25, "CLI", response=CARDS)
+    log_session("Ben", "Quiz", "Biology", "focused", 25, "CLI", response=QUIZ)
+    deck = _deck(tmp_path)
+    assert backfill(deck, get_backend().iter_newest()) == 2
+    main(["backfill", "Ben"])
+    main(["due", "Ben"])
+    assert "1 of 1 card(s) due for Ben" in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from src import rules
+from src.rules import RuleSet, classify, classify_many, get_rules, score_history, set_rules, study_mode
+
+
+@pytest.fixture(autouse=True)
+def fresh_rules():
+    set_rules(None)
+    yield
+    set_rules(None)
+
+
+def test_bundled_rules_cover_every_state():
+    assert classify("focused", 120).description == "Deep study (45 min work / 15 min break, 2 cycles)"
+    assert classify("focused", 60).cycles == 1
+    assert classify("focused", 30).label == "basic check-in"
+    assert classify("tired", 10).description == "Light review (10 min work / 2 min break, 1 cycle)"
+    assert classify("Overwhelmed", 40).label == "small steps"
+    nap = classify("exhausted", 90)
+    assert (nap.label, nap.work, nap.cycles) == ("nap time", 0, 0)
+
+
+def test_late_night_hours_override_state_but_not_exhaustion():
+    assert study_mode("focused", 120, hour=2) == "light review"
+    assert study_mode("focused", 120, hour=14) == "deep study"
+    assert study_mode("exhausted", 120, hour=2) == "nap time"
+
+
+def test_compiled_table_agrees_with_rule_by_rule_evaluation():
+    ruleset = get_rules()
+    for state in ("focused", "tired", "overwhelmed", "exhausted", "bored", 7):
+        for minutes in (None, 0, 1, 29, 59, 60, 61, 500):
+            for hour in (None, 0, 5, 6, 23):
+                expected = ruleset._evaluate(rules._normalize_state(state), rules._normalize_minutes(minutes), hour)
+                assert ruleset.mode_for(state, minutes, hour).label == expected
+
+
+def test_custom_rules_file_with_minute_bounds_and_wrapping_hours(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "modes": {
+            "sprint": {"work": 20, "break": 5, "max_cycles": 3},
+            "rest": {"work": 0},
+        },
+        "rules": [
+            {"hours": [22, 3], "mode": "rest"},
+            {"state": ["tired", "focused"], "max_minutes": 20, "mode": "rest"},
+        ],
+        "default": "sprint",
+    }))
+    monkeypatch.setenv(rules.RULES_ENV_VAR, str(path))
+    assert study_mode("focused", 15) == "rest"
+    assert study_mode("focused", 21) == "sprint"
+    assert classify("focused", 60).cycles == 2
+    assert study_mode("anything", 60, hour=23) == "rest"
+    assert study_mode("anything", 60, hour=4) == "sprint"
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="unknown mode"):
+        RuleSet.from_dict({"modes": {"a": {"work": 10}}, "rules": [{"mode": "b"}], "default": "a"})
+
+
+def test_classify_many_uses_each_records_timestamp():
+    records = [
+        {"state": "focused", "minutes": 90, "timestamp": "2025-03-01 14:00:00"},
+        {"state": "focused", "minutes": 90, "timestamp": "2025-03-01 02:30:00"},
+        {"state": "tired", "minutes": 0},
+    ]
+    assert [p.label for p in classify_many(records)] == ["deep study", "light review", "light review"]
+    scores = score_history(records)
+    assert scores["all"] == {"deep study": 1, "light review": 2}
+    assert scores["focused"] == {"deep study": 1, "light review": 1}
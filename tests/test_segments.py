@@ -0,0 +1,108 @@
+import gzip
+import json
+
+from src import segments
+from src.segments import RetentionPolicy, SegmentedBackend, period_of
+from src.storage import NdjsonBackend, migrate_legacy, open_backend
+
+
+def _entry(month, day=1, name="Ana"):
+    return {"timestamp": f"2025-{month:02d}-{day:02d} 10:00:00", "name": name, "subject": "Math", "method": "Quiz"}
+
+
+def test_period_of_rotations():
+    assert period_of("2025-03-09 10:00:00") == "2025-03"
+    assert period_of("2025-03-09 10:00:00", "daily") == "2025-03-09"
+    assert period_of("2025-03-09 10:00:00", "weekly") == "2025-W10"
+
+
+def test_rotation_compresses_closed_segments(tmp_path):
+    backend = SegmentedBackend()
+    backend.extend([_entry(1, 1), _entry(1, 2), _entry(2, 1), _entry(3, 1)])
+    closed = backend.segments
+    assert [s["period"] for s in closed] == ["2025-01", "2025-02"]
+    assert closed[0]["count"] == 2
+    assert closed[0]["start"] == "2025-01-01 10:00:00" and closed[0]["end"] == "2025-01-02 10:00:00"
+    with gzip.open(tmp_path / "session_history.segments" / closed[0]["file"], "rb") as f:
+        assert len(f.read().splitlines()) == 2
+    assert backend.count() == 4
+    assert [e["timestamp"][:10] for e in backend.iter_newest()] == [
+        "2025-03-01", "2025-02-01", "2025-01-02", "2025-01-01"
+    ]
+
+
+def test_latest_reads_only_the_open_segment(monkeypatch):
+    backend = SegmentedBackend()
+    backend.extend([_entry(1), _entry(2, 1), _entry(2, 2), _entry(2, 3)])
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("closed segment opened")
+
+    monkeypatch.setattr(segments.gzip, "open", fail)
+    assert [e["timestamp"][:10] for e in SegmentedBackend().latest(2)] == ["2025-02-03", "2025-02-02"]
+
+
+def test_iter_between_skips_segments_outside_range(monkeypatch):
+    backend = SegmentedBackend()
+    backend.extend([_entry(m) for m in range(1, 6)])
+    opened = []
+    real_open = segments._open_segment
+    monkeypatch.setattr(segments, "_open_segment", lambda path: opened.append(path) or real_open(path))
+    found = list(backend.iter_between("2025-02-01 00:00:00", "2025-03-31 23:59:59"))
+    assert [e["timestamp"][:7] for e in found] == ["2025-03", "2025-02"]
+    assert len(opened) == 2
+
+
+def test_retention_drops_old_segments(tmp_path):
+    backend = SegmentedBackend(retention=RetentionPolicy(max_segments=2))
+    backend.extend([_entry(m) for m in range(1, 6)])
+    assert [s["period"] for s in backend.segments] == ["2025-03", "2025-04"]
+    files = sorted(p.name for p in (tmp_path / "session_history.segments").glob("seg-*.gz"))
+    assert len(files) == 2
+    assert backend.count() == 3
+
+
+def test_manifest_is_shared_between_instances():
+    first = SegmentedBackend()
+    second = SegmentedBackend()
+    first.extend([_entry(1)])
+    second.extend([_entry(2)])
+    first.extend([_entry(2, 5)])
+    assert first.count() == second.count() == 3
+    assert len(second.segments) == 1
+
+
+def test_default_backend_imports_existing_ndjson_log(tmp_path):
+    NdjsonBackend().extend([_entry(1), _entry(2)])
+    backend = open_backend()
+    assert isinstance(backend, SegmentedBackend)
+    assert migrate_legacy(backend) == 2
+    manifest = json.loads((tmp_path / "session_history.segments" / "manifest.json").read_text())
+    assert manifest["segments"][0]["period"] == "2025-01"
+
+
+def test_undated_records_get_their_own_segment():
+    assert period_of("not a date") == period_of(None) == segments.UNDATED_PERIOD
+    backend = SegmentedBackend()
+    backend.extend([_entry(1), {"timestamp": "yesterday", "name": "Ana"}, _entry(2)])
+    backend.extend([{"name": "Ben"}])
+    closed = backend.segments
+    assert [s["period"] for s in closed] == [segments.UNDATED_PERIOD, "2025-01"]
+    assert closed[0]["count"] == 2 and closed[1]["start"] == "2025-01-01 10:00:00"
+    assert [e["timestamp"][:10] for e in backend.latest(2)] == ["2025-02-01", "2025-01-01"]
+    assert backend.count() == 4
+
+
+def test_older_records_are_merged_into_their_own_periods():
+    backend = SegmentedBackend()
+    backend.extend([_entry(1, 5), _entry(3, 1), _entry(5, 10)])
+    backend.extend([_entry(1, 2), _entry(4, 1), _entry(5, 3), _entry(1, 9)])
+    closed = backend.segments
+    assert [s["period"] for s in closed] == ["2025-01", "2025-03", "2025-04"]
+    assert (closed[0]["count"], closed[0]["start"], closed[0]["end"]) == (3, "2025-01-02 10:00:00", "2025-01-09 10:00:00")
+    assert [e["timestamp"][5:10] for e in backend.iter_newest()] == [
+        "05-10", "05-03", "04-01", "03-01", "01-09", "01-05", "01-02"
+    ]
+    assert backend.latest(1)[0]["timestamp"].startswith("2025-05-10")
+    backend.extend([_entry(6)])  # logging resumes in order
+    assert [s["period"] for s in backend.segments][-1] == "2025-05" and backend.count() == 8
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+
+from src.generation import GenerationResult, SingleFlight
+from src.history import load_history
+from src.server import StudyBuddyService, parse_address, run_server, start_server
+from src.timer import VirtualClock
+from src.timer_service import TimerService
+
+
+def _service(calls, delay=0.05, timers=None):
+    async def generate(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(delay)
+        return GenerationResult("ok", text=f"# Quiz\n{prompt}")
+
+    return StudyBuddyService(generate=generate, build_prompt=lambda n, m, s, _minutes: f"{n}/{m}/{s}", timers=timers)
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(payload) if b"application/json" in head else payload.decode()
+
+
+def _run(coro_fn, service):
+    async def main():
+        server, service_, timers = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await coro_fn(port)
+        finally:
+            timers.cancel()
+            server.close()
+            await server.wait_closed()
+            service_.close()
+
+    return asyncio.run(main())
+
+
+def test_singleflight_shares_one_call_and_forgets_it_afterwards():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        assert "k" not in flight
+        again = await flight.do("k", work)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert [r for r, _shared in results] == ["done"] * 5
+    assert sorted(shared for _r, shared in results) == [False, True, True, True, True]
+    assert again == ("done", False) and len(calls) == 2
+
+
+def test_class_wide_burst_is_one_llm_call():
+    calls = []
+    body = {"method": "quiz", "subject": "Photosynthesis", "state": "focused", "minutes": 60}
+
+    async def burst(port):
+        return await asyncio.gather(*(_request(port, "POST", "/generate", {**body, "name": f"S{i}"}) for i in range(10)))
+
+    responses = _run(burst, _service(calls))
+    assert len(calls) == 1 and calls[0] == "Student/Quiz/Photosynthesis"
+    assert all(status == 200 and r["text"] == "# Quiz\nStudent/Quiz/Photosynthesis" for status, r in responses)
+    assert sum(r["shared"] for _s, r in responses) == 9
+    assert responses[0][1]["mode"] == "deep study"
+    assert len(load_history()) == 10
+
+
+def test_profiles_history_and_materials_round_trip():
+    async def flow(port):
+        out = {}
+        out["put"] = await _request(port, "PUT", "/profiles/ana", {"name": "Ana", "method": "Flashcards", "subject": "Bio"})
+        out["get"] = await _request(port, "GET", "/profiles/ana")
+        out["list"] = await _request(port, "GET", "/profiles?prefix=an")
+        out["gen"] = await _request(port, "POST", "/generate", {"name": "Ana", "method": "Flashcards", "subject": "Bio", "personalize": True})
+        out["history"] = await _request(port, "GET", "/history?name=ana")
+        out["materials"] = await _request(port, "GET", f"/materials/{out['gen'][1]['material_hash']}")
+        out["delete"] = await _request(port, "DELETE", "/profiles/ana")
+        out["missing"] = await _request(port, "GET", "/profiles/ana")
+        out["bad"] = await _request(port, "POST", "/generate", {"name": "Ana", "method": "Poem", "subject": "Bio"})
+        out["wrong_method"] = await _request(port, "PATCH", "/profiles/ana")
+        out["metrics"] = await _request(port, "GET", "/metrics")
+        return out
+
+    out = _run(flow, _service([], delay=0))
+    assert out["put"][0] == 201 and out["get"][1]["subject"] == "Bio"
+    assert [p["key"] for p in out["list"][1]["profiles"]] == ["ana"]
+    assert out["history"][1]["sessions"][0]["source"] == "Service"
+    assert out["materials"][1]["text"] == "# Quiz\nAna/Flashcards/Bio"
+    assert out["delete"][0] == 200 and out["missing"][0] == 404
+    assert out["bad"][0] == 400 and out["wrong_method"][0] == 405
+    assert "study_buddy_http_requests_total" in out["metrics"][1]
+
+
+def test_timer_endpoints_follow_the_rules_plan():
+    clock = VirtualClock()
+
+    async def flow(port):
+        started = await _request(port, "POST", "/timers", {"session_id": "ana", "state": "focused", "minutes": 120})
+        paused = await _request(port, "POST", "/timers/ana/pause")
+        nap = await _request(port, "POST", "/timers", {"session_id": "bo", "state": "exhausted"})
+        listed = await _request(port, "GET", "/timers")
+        cancelled = await _request(port, "DELETE", "/timers/ana")
+        gone = await _request(port, "GET", "/timers/ana")
+        invalid = [
+            await _request(port, "POST", "/timers", {"session_id": "cy", "work_minutes": value})
+            for value in (None, [25], "soon")
+        ]
+        return started, paused, nap, listed, cancelled, gone, invalid
+
+    started, paused, nap, listed, cancelled, gone, invalid = _run(flow, _service([], timers=TimerService(clock=clock)))
+    assert started[0] == 201 and started[1]["cycles"] == 2 and started[1]["remaining_seconds"] == 45 * 60
+    assert paused[1]["phase"] == "paused"
+    assert nap[0] == 400
+    assert [t["session_id"] for t in listed[1]["timers"]] == ["ana"]
+    assert cancelled[0] == 200 and gone[0] == 404
+    assert [status for status, _body in invalid] == [400, 400, 400]
+
+
+def test_parse_address():
+    assert parse_address(None) == ("127.0.0.1", 8765)
+    assert parse_address(":9000") == ("127.0.0.1", 9000)
+    assert parse_address("0.0.0.0:80") == ("0.0.0.0", 80)
+    for bad in ("localhost", "host:99999", "host:"):
+        with pytest.raises(ValueError, match="Invalid address"):
+            parse_address(bad)
+    with pytest.raises(SystemExit):
+        run_server("localhost")
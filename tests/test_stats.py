@@ -0,0 +1,77 @@
+from datetime import date
+
+from src import history, stats
+from src.stats import StudyStats, get_stats
+
+
+def _record(day, name="Ana", subject="Math", method="Quiz", state="focused", minutes=25):
+    return {
+        "timestamp": f"2025-03-{day:02d} 10:00:00",
+        "name": name,
+        "subject": subject,
+        "method": method,
+        "state": state,
+        "minutes": minutes,
+    }
+
+
+def test_rollups_are_updated_incrementally():
+    rollups = StudyStats()
+    rollups.record(_record(1))
+    rollups.record_many([_record(1, name="Ben", subject="Bio", minutes=10), _record(2, state="tired")])
+    assert rollups.totals() == {"sessions": 3, "minutes": 60}
+    assert rollups.breakdown("user")["Ana"] == {"sessions": 2, "minutes": 50}
+    assert rollups.breakdown("subject")["Bio"] == {"sessions": 1, "minutes": 10}
+    assert rollups.sessions_per_day() == {"2025-03-01": 2, "2025-03-02": 1}
+    assert rollups.state_distribution() == {"focused": 2, "tired": 1}
+    assert StudyStats().totals()["sessions"] == 3  # persisted
+
+
+def test_current_streak_resets_after_a_missed_day():
+    rollups = StudyStats()
+    rollups.record_many([_record(1), _record(2), _record(3), _record(3, name="Ben")])
+    assert rollups.current_streak(today=date(2025, 3, 4)) == 3
+    assert rollups.current_streak("Ben", today=date(2025, 3, 3)) == 1
+    assert rollups.current_streak(today=date(2025, 3, 6)) == 0
+    rollups.record(_record(5))
+    assert rollups.current_streak(today=date(2025, 3, 5)) == 1
+
+
+def test_rebuild_matches_incremental_updates():
+    records = [_record(d, name=n) for d in (1, 2, 4) for n in ("Ana", "Ben")]
+    incremental = StudyStats("a.json")
+    incremental.record_many(records)
+    rebuilt = StudyStats("b.json")
+    assert rebuilt.rebuild(reversed(records)) == 6
+    for query in ("totals", "sessions_per_day", "state_distribution"):
+        assert getattr(rebuilt, query)() == getattr(incremental, query)()
+    assert rebuilt.breakdown("user") == incremental.breakdown("user")
+    assert rebuilt.current_streak("Ana", today=date(2025, 3, 4)) == 1
+
+
+def test_log_session_updates_stats_without_double_counting(tmp_path):
+    history.get_backend().append(_record(1))
+    history.log_session("Ana", "Quiz", "Math", "focused", 30, "CLI/New")
+    assert get_stats().totals() == {"sessions": 2, "minutes": 55}
+    (tmp_path / "study_stats.json").unlink()
+    stats.set_stats(None)
+    assert get_stats().totals()["sessions"] == 2  # rebuilt from history
+
+
+def test_group_commit_updates_stats_once_per_batch():
+    with history.group_commit(max_delay=0.01):
+        for _ in range(5):
+            history.log_session("Ana", "Quiz", "Math", "focused", 10, "Batch")
+    assert get_stats().totals() == {"sessions": 5, "minutes": 50}
+
+
+def test_corrupt_rollups_are_rebuilt_not_reset(tmp_path):
+    history.get_backend().extend([_record(1), _record(2)])
+    get_stats().rebuild(history.get_backend().iter_newest())
+    (tmp_path / "study_stats.json").write_text('{"sessions": 2, "min')
+    stats.set_stats(None)
+    assert get_stats().totals() == {"sessions": 2, "minutes": 50}
+
+    (tmp_path / "study_stats.json").write_text("[]")  # corrupted while the process runs
+    history.log_session("Ana", "Quiz", "Math", "focused", 30, "CLI/New")
+    assert get_stats().totals() == {"sessions": 3, "minutes": 80}
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from src import history
+from src.storage import NdjsonBackend, SqliteBackend, migrate_legacy
+
+
+def _entry(i):
+    return {"timestamp": f"2025-01-01 00:00:{i:02d}", "name": "Ana", "subject": "Math", "method": "Quiz"}
+
+
+@pytest.mark.parametrize("backend_cls", [NdjsonBackend, SqliteBackend])
+def test_append_and_latest_newest_first(backend_cls):
+    backend = backend_cls()
+    for i in range(10):
+        backend.append(_entry(i))
+    assert backend.count() == 10
+    assert [e["timestamp"][-2:] for e in backend.latest(3)] == ["09", "08", "07"]
+    assert len(list(backend.iter_newest())) == 10
+    backend.close()
+
+
+def test_sqlite_reads_page_through_ties_lazily():
+    backend = SqliteBackend()
+    backend.extend([_entry(i // 3) for i in range(10)])  # several records share a timestamp
+    pages = backend.iter_newest(chunk_size=4)
+    assert next(pages)["timestamp"].endswith("03")
+    backend.append(_entry(59))  # the first page is fetched, the lock is free
+    rest = list(pages)
+    assert len(rest) == 9 and [e["timestamp"][-2:] for e in rest[-3:]] == ["00"] * 3
+    assert len(list(backend.iter_between("2025-01-01 00:00:01", "2025-01-01 00:00:02", chunk_size=2))) == 6
+    backend.close()
+
+
+def test_ndjson_index_is_rebuilt_when_missing(tmp_path):
+    backend = NdjsonBackend()
+    backend.extend([_entry(i) for i in range(5)])
+    (tmp_path / "session_history.ndjson.idx").unlink()
+    assert NdjsonBackend().latest(1)[0]["timestamp"].endswith("04")
+
+
+def test_migrate_legacy_merges_both_files(tmp_path):
+    (tmp_path / "session_history.json").write_text(json.dumps([_entry(3), _entry(1)]))
+    (tmp_path / "study_log.json").write_text(json.dumps([
+        {"timestamp": "2025-01-01 00:00:02", "name": "W", "subject": "geo", "method": "Quiz", "content": "text"}
+    ]))
+    backend = SqliteBackend()
+    assert migrate_legacy(backend) == 3
+    assert [e["timestamp"][-2:] for e in backend.latest(3)] == ["03", "02", "01"]
+    assert migrate_legacy(backend) == 0
+    backend.close()
+
+
+def test_log_session_appends_without_rewriting(tmp_path):
+    history.log_session("Ana", "Quiz", "Math", "focused", 25, "CLI/New", response="# Quiz")
+    history.log_session("Ana", "Quiz", "Bio", "tired", 10, "CLI/New")
+    assert [s["subject"] for s in history.load_history()] == ["Bio", "Math"]
+    [active] = (tmp_path / "session_history.segments").glob("seg-*.ndjson")
+    assert len(active.read_text().splitlines()) == 2
@@ -0,0 +1,77 @@
+import time
+from unittest.mock import patch
+
+from src import app
+from src.batch import normalize_row
+from src.history import log_session
+from src.profiles import ProfileStore
+from src.subjects import SubjectIndex, canonical_subject, get_subjects, normalize_subject
+
+
+def test_normalization_ignores_case_whitespace_and_accents():
+    assert normalize_subject("  World   History ") == normalize_subject("world history") == "world history"
+    assert normalize_subject("Física") == normalize_subject("FISICA") == "fisica"
+    assert normalize_subject("Ｍａｔｈ") == "math"  # full-width letters (NFKC)
+
+
+def test_canonical_spelling_is_the_most_used_one():
+    index = SubjectIndex()
+    index.add_many([("math", 1), ("Math", 3), ("Geography", 2)])
+    assert index.canonical(" MATH ") == "Math"
+    assert index.canonical("geography") == "Geography"
+    assert index.canonical("Chemistry") is None
+    assert len(index) == 2
+
+
+def test_prefix_completion_ranks_by_use():
+    index = SubjectIndex()
+    index.add_many([("Biology", 5), ("Biochemistry", 2), ("Bio Lab", 9), ("Botany", 1)])
+    assert index.complete("bi") == ["Bio Lab", "Biology", "Biochemistry"]
+    assert index.complete("b", limit=2) == ["Bio Lab", "Biology"]
+    index.add("Biochemistry", 10)
+    assert index.complete("bio")[0] == "Biochemistry"
+    assert index.complete("x") == []
+
+
+def test_fuzzy_suggestions_catch_typos():
+    index = SubjectIndex()
+    index.add_many([("Biology", 3), ("Geography", 2), ("Photosynthesis", 1)])
+    assert index.suggest("biolgy")[0] == "Biology"
+    assert index.suggest("photosinthesis") == ["Photosynthesis"]
+    assert index.suggest("astronomy") == []
+    assert index.resolve("Geografy") == ("Geografy", ["Geography"])
+
+
+def test_lookups_stay_sub_millisecond_with_many_subjects():
+    index = SubjectIndex()
+    index.add_many((f"Subject {i} {chr(97 + i % 26)}topic", i % 7 + 1) for i in range(5_000))
+    started = time.perf_counter()
+    for _ in range(100):
+        index.complete("subject 1")
+    assert (time.perf_counter() - started) / 100 < 1e-3
+    assert len(index.complete("subject 1", limit=8)) == 8
+
+
+def test_shared_index_builds_from_history_and_profiles_and_updates_incrementally():
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI")
+    ProfileStore().put("Ben_Quiz_geography", {"name": "Ben", "method": "Quiz", "subject": "geography"})
+    assert canonical_subject("math ") == "Math"
+    assert canonical_subject("GEOGRAPHY") == "geography"
+    log_session("Cy", "Quiz", "Chemistry", "focused", 25, "CLI")
+    assert get_subjects().complete("ch") == ["Chemistry"]
+
+
+def test_batch_rows_use_the_canonical_subject():
+    log_session("Ana", "Quiz", "Math", "focused", 25, "CLI")
+    row = normalize_row({"name": "Bo", "method": "quiz", "subject": "  MATH"}, ["Quiz"])
+    assert row["subject"] == "Math"
+
+
+def test_resolve_subject_offers_close_matches():
+    index = SubjectIndex()
+    index.add("Biology", 3)
+    with patch("src.app.Confirm.ask", return_value=True) as confirm:
+        assert app.resolve_subject("biolgy", index) == "Biology"
+        assert app.resolve_subject("BIOLOGY", index) == "Biology"
+    assert confirm.call_count == 1
+    assert app.resolve_subject("biolgy", index, ask=False) == "biolgy"
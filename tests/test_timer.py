@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from src.timer import BREAK, DONE, IDLE, PAUSED, WORK, PomodoroEngine, VirtualClock, pomodoro_arg_func
+
+
+def test_two_cycle_session_runs_on_virtual_clock_without_drift():
+    clock = VirtualClock()
+    transitions = []
+    renders = []
+    engine = PomodoroEngine(
+        45 * 60, 15 * 60, cycles=2, clock=clock,
+        on_render=lambda e, left: renders.append(left),
+        on_phase_change=lambda e, old, new: transitions.append(new),
+    )
+    engine.run()
+
+    assert transitions == [WORK, BREAK, IDLE, WORK, DONE]
+    assert clock.now == (45 + 15 + 45) * 60
+    assert len(renders) == (45 + 15 + 45) * 60
+
+
+def test_render_interval_coalesces_redraws():
+    clock = VirtualClock()
+    renders = []
+    PomodoroEngine(60, 0, clock=clock, render_interval=10, on_render=lambda e, left: renders.append(left)).run()
+    assert renders == [60, 50, 40, 30, 20, 10]
+
+
+def test_pause_and_resume_preserve_remaining_time():
+    clock = VirtualClock()
+    engine = PomodoroEngine(100, 10, clock=clock)
+    engine.start_work()
+    clock.sleep(30)
+    engine.pause()
+    assert engine.phase == PAUSED
+    clock.sleep(500)  # time spent paused does not count
+    engine.resume()
+    assert engine.phase == WORK and engine.remaining() == 70
+    engine.run_phase()
+    assert clock.now == 600
+
+
+@patch("src.timer.Prompt.ask", return_value="")
+def test_pomodoro_arg_func_completes_with_virtual_clock(mock_prompt, capsys):
+    clock = VirtualClock()
+    pomodoro_arg_func(45, 15, "Deep study (2 cycles)", clock=clock)
+    assert mock_prompt.call_count == 2
+    assert clock.now == (45 + 15 + 45) * 60
+    assert "successfully completed" in capsys.readouterr().out
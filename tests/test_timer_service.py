@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+from src.timer import BREAK, DONE, IDLE, WORK, VirtualClock
+from src.timer_service import TimerService
+
+
+def test_heap_advances_only_due_sessions():
+    clock = VirtualClock()
+    events = []
+    service = TimerService(clock=clock, on_phase_change=lambda s, old, new: events.append((s.session_id, new)))
+    service.start("ana", 60, 30, cycles=2)
+    service.start("bo", 120, 30, cycles=1)
+    events.clear()
+
+    clock.now = 60
+    assert service.process_due() == 1
+    assert events == [("ana", BREAK)]
+    assert service.next_deadline() == 90
+
+    clock.now = 120
+    service.process_due()
+    assert ("ana", IDLE) in events and ("ana", WORK) in events and ("bo", DONE) in events
+    assert "bo" not in service.sessions
+
+
+def test_pause_resume_and_cancel_skip_stale_deadlines():
+    clock = VirtualClock()
+    service = TimerService(clock=clock)
+    service.start("ana", 60, 0)
+    service.pause("ana")
+    assert service.next_deadline() is None
+    clock.now = 500
+    service.resume("ana")
+    assert service.next_deadline() == 560
+    service.cancel("ana")
+    assert service.next_deadline() is None and service.process_due() == 0
+    with pytest.raises(KeyError, match="No timer session 'ana'"):
+        service.cancel("ana")
+
+
+def test_restarting_an_id_ignores_the_old_sessions_deadline():
+    clock = VirtualClock()
+    service = TimerService(clock=clock)
+    service.start("ana", 10, 5, cycles=2)
+    clock.now = 1
+    session = service.start("ana", 100, 5, cycles=2)
+    clock.now = 11
+    assert service.process_due() == 0
+    assert session.phase == WORK and service.next_deadline() == 101
+
+
+def test_event_loop_sleeps_between_boundaries_with_many_timers():
+    service = TimerService()
+    for i in range(1000):
+        service.start(f"student-{i}", 3600, 300, cycles=2)
+    finished = []
+    service.start("quick", 0.05, 0, on_phase_change=lambda s, old, new: finished.append(new))
+
+    async def scenario():
+        stop = asyncio.Event()
+        task = asyncio.create_task(service.run(stop))
+        await asyncio.sleep(0.3)
+        stop.set()
+        await task
+
+    started = time.process_time()
+    asyncio.run(scenario())
+    assert DONE in finished
+    assert service.wakeups <= 3
+    assert time.process_time() - started < 0.25